@@ -1,55 +1,113 @@
-import os
-import pandas as pd
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-from youtube_transcript_api.formatters import TextFormatter
-import time
-import random
+import sys
+import threading
+from concurrent_fetch import TokenBucket, FetchStopped, fetch_concurrently
+from response_cache import ResponseCache, CachedSession, CacheMiss
+from checkpoint_journal import Journal, replay, reset, is_empty
+from columnar_store import load_table, save_table, storage_paths
+from catalog import Catalog
+from segments import Segments
+from run_stamps import write_stamp
 
 # --- Config ---
 input_csv = "final_output.csv"
 output_csv = "final_merged_output.csv"
 failed_csv = "failed_videos.csv"
+journal_path = "final_merged_output_journal.jsonl"  # append-only progress log, folded in by compact()
 
-MIN_DELAY = 5
-MAX_DELAY = 15
+WORKERS = 4                 # parallel fetch threads (1 = sequential)
+REQUESTS_PER_SECOND = 0.5   # total network budget shared by all workers (~3 requests per uncached video)
+BURST = 4                   # requests allowed back-to-back before the budget kicks in
+cache_path = "api_cache.sqlite"    # on-disk response cache shared with the metadata crawler
+OFFLINE = "--offline" in sys.argv  # serve transcripts only from the cache
+catalog_path = "catalog.sqlite"    # transcripts / failures shared with fetch_transcripts.py
+transcript_store_path = "transcript_store"   # compressed transcript text shared with fetch_transcripts.py
 
 # --- Load metadata file ---
-df = pd.read_csv(input_csv)
+df = load_table(input_csv)
 all_video_ids = df["id"].astype(str).tolist()
 print(f"Found {len(all_video_ids)} videos in file")
 
-# --- Resume support ---
-transcript_map = {}
-failed_list = []
-
-if os.path.exists(output_csv):
-    old = pd.read_csv(output_csv)
-    if "id" in old.columns and "transcript" in old.columns:
-        # Convert all transcripts to strings to avoid AttributeError
-        transcript_map = {str(k): str(v) if not pd.isna(v) else "" for k, v in zip(old["id"], old["transcript"])}
-        print(f"Loaded {len(transcript_map)} existing transcripts")
-
-if os.path.exists(failed_csv):
-    ff = pd.read_csv(failed_csv)
-    failed_list = ff["id"].astype(str).tolist()
-    print(f"Loaded {len(failed_list)} failed videos")
-
-# --- Filter videos: only missing transcripts ---
-remaining = [
-    vid for vid in all_video_ids
-    if (vid not in transcript_map or str(transcript_map.get(vid, "")).strip() == "")
-    and vid not in failed_list
-]
-print(f"Remaining to process: {len(remaining)}")
+# --- Resume support: transcripts and failures live in the catalog ---
+catalog = Catalog(catalog_path, transcript_store_path)
+
+# Files written by an older version (or edited by hand) are imported once
+migrated = False
+for path, kind in [(output_csv, "transcripts"), (failed_csv, "failures")]:
+    imported = catalog.sync_table(path, kind)
+    if imported:
+        migrated = True
+        print(f"Imported {imported} rows from {path} into the catalog")
+
+def compact(force=False):
+    """Fold the journal into the catalog, rewrite final_merged_output.csv / failed_videos.csv, then truncate it."""
+    if is_empty(journal_path) and not force:
+        return
+    transcripts = {}
+    failures = {}
+    for rec in replay(journal_path):
+        if "transcript" in rec:
+            transcripts[rec["id"]] = rec
+            failures.pop(rec["id"], None)
+        else:
+            failures[rec["id"]] = rec["failed"]
+    catalog.upsert_transcripts({"video_id": k, "transcript": v["transcript"]} for k, v in transcripts.items())
+    catalog.upsert_segments({"video_id": k, "segments": Segments.from_record(v["segments"])}
+                            for k, v in transcripts.items() if "segments" in v)
+    catalog.record_failures({"video_id": k, "reason": v} for k, v in failures.items())
 
-# --- Initialize ---
-ytt = YouTubeTranscriptApi()
-formatter = TextFormatter()
+    merged = df.copy()
+    merged["transcript"] = merged["id"].astype(str).map(catalog.transcripts_for(all_video_ids)).fillna("")
+    save_table(merged, output_csv)
+    catalog.mark_synced(output_csv, "transcripts")
+    catalog.export_failures(failed_csv)
+    reset(journal_path)
+    print(f"Compacted journal into {output_csv}")
+
+if "--compact" in sys.argv:
+    compact()
+    exit()
+
+# Progress that has not been compacted yet
+compact()
+
+# --- Filter videos: only missing transcripts (index lookups in the catalog) ---
+transcript_map = catalog.transcripts_for(all_video_ids)
+failed_ids = catalog.failed_ids()
+remaining = [vid for vid in all_video_ids if vid not in transcript_map and vid not in failed_ids]
+failed_list = [vid for vid in all_video_ids if vid in failed_ids]
+print(f"Loaded {len(transcript_map)} existing transcripts, {len(failed_list)} failed videos")
+print(f"Remaining to process: {len(remaining)}")
 
-# --- Process each video ---
-for i, vid in enumerate(remaining, start=1):
-    print(f"[{i}/{len(remaining)}] {vid}")
+if not remaining:
+    # Transcripts fetch_transcripts.py stored since the last write still need to reach the CSV
+    compact(force=migrated or not catalog.is_current(output_csv))
+    # Closing checkpoints the WAL first, so the stamp sees the catalog's settled size / mtime
+    catalog.close()
+    # Lets `querytube.py merge-transcripts` skip this whole script until an input or the catalog changes
+    write_stamp("merged_transcripts", storage_paths(input_csv, output_csv, failed_csv) + [journal_path] + catalog.state_paths())
+    exit()
 
+# --- Initialize ---
+limiter = TokenBucket(REQUESTS_PER_SECOND, BURST)
+stop_event = threading.Event()
+cache = ResponseCache(cache_path, offline=OFFLINE)
+thread_state = threading.local()
+
+def throttle():
+    """Runs before every network request; cache hits skip it and cost no budget."""
+    if not limiter.acquire(stop_event=stop_event):
+        raise FetchStopped()
+
+def get_api():
+    """YouTubeTranscriptApi is not thread-safe, so every worker gets its own instance."""
+    if not hasattr(thread_state, "api"):
+        thread_state.api = YouTubeTranscriptApi(http_client=CachedSession(cache, before_request=throttle))
+    return thread_state.api
+
+def fetch_one(vid):
+    """Fetch one transcript. Returns (status, payload) where payload is (text, Segments) or an error."""
+    ytt = get_api()
     try:
         transcript_list = ytt.list(vid)
 
@@ -58,44 +116,72 @@ for i, vid in enumerate(remaining, start=1):
         except:
             transcript = transcript_list.find_generated_transcript(['en'])
 
-        text = formatter.format_transcript(transcript.fetch().snippets)
-        transcript_map[vid] = text
+        # Same text TextFormatter produced, plus every snippet's start / duration
+        return "ok", Segments.from_snippets(transcript.fetch().snippets)
 
-        print(f"   Success ({len(text)} chars)")
+    except (CacheMiss, FetchStopped):
+        return "stopped", None
 
     except TranscriptsDisabled:
+        return "disabled", None
+
+    except NoTranscriptFound:
+        return "not_found", None
+
+    except VideoUnavailable:
+        return "unavailable", None
+
+    except Exception as e:
+        msg = str(e).lower()
+        if any(x in msg for x in ["block", "429", "forbidden", "too many"]):
+            return "blocked", e
+        return "error", e
+
+# --- Process videos concurrently ---
+# Each result is one O(1) journal append instead of rewriting the whole merged CSV
+journal = Journal(journal_path)
+results = fetch_concurrently(remaining, fetch_one, workers=WORKERS, stop_event=stop_event)
+
+for i, (vid, (status, payload)) in enumerate(results, start=1):
+    print(f"[{i}/{len(remaining)}] {vid}")
+
+    if status == "stopped":
+        continue
+
+    if status == "ok":
+        text, segments = payload
+        transcript_map[vid] = text
+        journal.append({"id": vid, "transcript": text, "segments": segments.to_record()})
+        print(f"   Success ({len(text)} chars, {len(segments)} segments)")
+        continue
+
+    if status == "disabled":
         print("   Transcripts disabled")
         failed_list.append(vid)
 
-    except NoTranscriptFound:
+    elif status == "not_found":
         print("   No transcript found")
         failed_list.append(vid)
 
-    except VideoUnavailable:
+    elif status == "unavailable":
         print("   Video unavailable")
         failed_list.append(vid)
 
-    except Exception as e:
-        msg = str(e).lower()
-        if any(x in msg for x in ["block", "429", "forbidden", "too many"]):
-            print("   IP blocked — STOP NOW")
-            failed_list.append(vid)
-            break
-        else:
-            print("   Error:", e)
-            failed_list.append(vid)
+    elif status == "blocked":
+        print("   IP blocked — STOP NOW")
+        failed_list.append(vid)
+        stop_event.set()
 
-    # --- Save progress safely using temporary file ---
-    merged = df.copy()
-    merged["transcript"] = merged["id"].astype(str).map(lambda x: str(transcript_map.get(x, "")))
+    else:
+        print("   Error:", payload)
+        failed_list.append(vid)
 
-    temp_output = output_csv + "_temp"
-    merged.to_csv(temp_output, index=False, encoding="utf-8")
-    os.replace(temp_output, output_csv)  # Atomically replace the original file
+    journal.append({"id": vid, "failed": status})
 
-    pd.DataFrame({"id": failed_list}).to_csv(failed_csv, index=False)
+journal.close()
 
-    time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
+# --- Fold the journal into the merged CSV (one full write per run) ---
+compact()
 
 # --- Final Summary ---
 print("\nDONE!")
@@ -0,0 +1,178 @@
+"""
+Approximate nearest-neighbour search over a vector index (IVF).
+
+k-means splits the embeddings into `nlist` clusters; a query is scored only
+against the `nprobe` clusters whose centroids it is closest to, so the work
+per query is roughly nprobe / nlist of a full scan. Raising nprobe trades
+latency for recall (bench_ann.py measures both).
+
+The inverted lists live in an `ivf/` directory inside the vector index (each
+segment of a segmented index has its own), so rebuilding the vectors drops a
+stale IVF with them:
+
+    meta.json       nlist, count, dtype, embedder version it was trained on
+    centroids.npy   nlist x dim float32, L2-normalized
+    offsets.npy     nlist + 1 int64: list i is rows offsets[i]:offsets[i+1]
+    rows.npy        vector index row of every list entry
+    vectors.bin     the vectors reordered list by list (same dtype as the index)
+    scales.bin      matching int8 scales
+
+Keeping a list-ordered copy of the vectors makes every probe one contiguous
+read of the memory map instead of scattered row lookups.
+"""
+import json
+import os
+import shutil
+import numpy as np
+from vector_index import ROWS_PER_BLOCK, VectorIndex
+
+# -----------------------------
+# Config
+# -----------------------------
+DEFAULT_NPROBE = 16
+KMEANS_ITERATIONS = 15
+TRAIN_POINTS_PER_LIST = 64     # k-means sample size = nlist * this (capped at the corpus)
+FORMAT_VERSION = 1
+IVF_DIR = "ivf"
+
+
+def default_nlist(count):
+    """About 4 * sqrt(n) lists, the usual IVF sizing; at least 1."""
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+def _nearest(vectors, centroids):
+    """Index of the most similar centroid (inner product) for each row."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), 16_384):
+        out[start:start + 16_384] = np.argmax(vectors[start:start + 16_384] @ centroids.T, axis=1)
+    return out
+
+
+def train_kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on float32 rows: unit-length centroids maximizing inner product."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):   # restart empty clusters on random points
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def build_ivf(index_path, nlist=None, iterations=KMEANS_ITERATIONS, seed=0):
+    """Train centroids on a sample of `index_path` and write its inverted lists. Returns nlist."""
+    index = VectorIndex(index_path)
+    if len(index) == 0:
+        raise ValueError(f"{index_path} is empty")
+    nlist = min(nlist or default_nlist(len(index)), len(index))
+
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(index), min(len(index), nlist * TRAIN_POINTS_PER_LIST), replace=False))
+    sample = index.vectors[sample_rows].astype(np.float32)
+    if index.scales is not None:
+        sample *= index.scales[sample_rows, None]
+    centroids = train_kmeans(sample, nlist, iterations, seed)
+
+    # Assign every row, block by block, then counting-sort rows into lists
+    assign = np.empty(len(index), dtype=np.int64)
+    for start in range(0, len(index), ROWS_PER_BLOCK):
+        end = min(start + ROWS_PER_BLOCK, len(index))
+        assign[start:end] = _nearest(index.vectors_float32(start, end), centroids)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+    final = os.path.join(index_path, IVF_DIR)
+    temp = final + "_temp"
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    np.save(os.path.join(temp, "centroids.npy"), centroids)
+    np.save(os.path.join(temp, "offsets.npy"), offsets)
+    np.save(os.path.join(temp, "rows.npy"), order.astype(np.uint32 if len(index) < 2**32 else np.int64))
+    with open(os.path.join(temp, "vectors.bin"), "wb") as f:
+        for start in range(0, len(order), ROWS_PER_BLOCK):
+            f.write(np.ascontiguousarray(index.vectors[order[start:start + ROWS_PER_BLOCK]]).tobytes())
+    if index.scales is not None:
+        np.asarray(index.scales)[order].tofile(os.path.join(temp, "scales.bin"))
+    with open(os.path.join(temp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "nlist": nlist, "count": len(index), "dtype": index.meta["dtype"],
+                   "embedder_version": index.meta["embedder_version"]}, f, indent=2)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(temp, final)
+    return nlist
+
+
+class IVFIndex:
+    """
+    A VectorIndex plus its IVF lists; search() has the same results format as
+    VectorIndex.search, with `nprobe` lists scanned per query.
+    """
+
+    def __init__(self, index_path, nprobe=DEFAULT_NPROBE, embedder=None):
+        self.index = VectorIndex(index_path, embedder)
+        path = os.path.join(index_path, IVF_DIR)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION or self.meta["count"] != len(self.index) \
+                or self.meta["embedder_version"] != self.index.meta["embedder_version"]:
+            raise ValueError(f"{path} does not match {index_path}; rebuild it with build_ann_index.py")
+        self.nlist = self.meta["nlist"]
+        self.nprobe = nprobe
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        count, dim = len(self.index), self.index.dim
+        self.vectors = np.memmap(os.path.join(path, "vectors.bin"), dtype=self.meta["dtype"], mode="r", shape=(count, dim))
+        self.scales = (np.memmap(os.path.join(path, "scales.bin"), dtype=np.float32, mode="r", shape=(count,))
+                       if self.meta["dtype"] == "int8" else None)
+
+    def __len__(self):
+        return len(self.index)
+
+    @staticmethod
+    def exists(index_path):
+        return os.path.exists(os.path.join(index_path, IVF_DIR, "meta.json"))
+
+    def _probe(self, query, k, nprobe, deleted=None):
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe] if nprobe < self.nlist \
+            else np.arange(self.nlist)
+        ranges = [(self.offsets[i], self.offsets[i + 1]) for i in np.sort(lists) if self.offsets[i + 1] > self.offsets[i]]
+        if not ranges:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        positions = np.concatenate([np.arange(a, b) for a, b in ranges])
+        scores = np.concatenate([self.vectors[a:b] for a, b in ranges]).astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= np.concatenate([self.scales[a:b] for a, b in ranges])
+        if deleted is not None:
+            live = ~deleted[self.rows[positions]]
+            positions, scores = positions[live], scores[live]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            positions, scores = positions[top], scores[top]
+        rows = np.asarray(self.rows[positions], dtype=np.int64)
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def search_vectors(self, queries, k=10, nprobe=None, deleted=None):
+        """Approximate top `k` per query row: a list of (rows, scores) arrays, best first.
+        Rows flagged in the boolean array `deleted` are skipped."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        return [self._probe(q, k, nprobe, deleted) for q in queries]
+
+    def search(self, queries, k=10, nprobe=None):
+        single = isinstance(queries, str)
+        texts = [queries] if single else list(queries)
+        if not texts:
+            return []
+        results = [[dict(self.index.item(r), score=float(s)) for r, s in zip(rows.tolist(), scores.tolist())]
+                   for rows, scores in self.search_vectors(self.index.embedder.embed(texts), k, nprobe)]
+        return results[0] if single else results
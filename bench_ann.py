@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+import numpy as np
+from ann_index import IVFIndex
+from segmented_index import SegmentedVectorIndex
+from vector_index import VectorIndex
+
+# --- Config ---
+index_path = "vector_index"   # with IVF lists from build_ann_index.py
+
+parser = argparse.ArgumentParser(description="Recall@k and latency of IVF search against exact search")
+parser.add_argument("--queries", type=int, default=200, help="indexed vectors sampled as queries")
+parser.add_argument("--nprobe", default="1,4,16,64", help="comma-separated nprobe values to try")
+parser.add_argument("-k", type=int, default=10, help="neighbours compared per query")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+def percentiles(times_ms):
+    return np.percentile(times_ms, 50), np.percentile(times_ms, 99)
+
+
+# The largest segment with IVF lists; the small ones are always scanned exactly
+segments = [seg for seg in SegmentedVectorIndex(index_path).segments if IVFIndex.exists(os.path.join(index_path, seg.name))]
+if not segments:
+    raise SystemExit(f"❌ No IVF lists in {index_path} - run `querytube.py ann` first")
+segment_path = os.path.join(index_path, max(segments, key=lambda seg: seg.rows).name)
+exact_index = VectorIndex(segment_path)
+ivf = IVFIndex(segment_path)
+rng = np.random.default_rng(args.seed)
+sample = np.sort(rng.choice(len(exact_index), min(args.queries, len(exact_index)), replace=False))
+queries = exact_index.vectors[sample].astype(np.float32)
+if exact_index.scales is not None:
+    queries *= exact_index.scales[sample, None]
+queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+# Ground truth in one batched scan; latency timed one query at a time, as a server would see it
+truth, _ = exact_index.search_vectors(queries, args.k)
+exact_ms = []
+for q in queries[:min(len(queries), 20)]:
+    started = time.perf_counter()
+    exact_index.search_vectors(q, args.k)
+    exact_ms.append((time.perf_counter() - started) * 1000)
+
+print(f"📏 {len(exact_index)} vectors, {ivf.nlist} lists, {len(queries)} queries, recall@{args.k}")
+print(f"{'nprobe':>8} {'recall':>8} {'p50 ms':>9} {'p99 ms':>9}")
+print(f"{'exact':>8} {1.0:>8.3f} {percentiles(exact_ms)[0]:>9.2f} {percentiles(exact_ms)[1]:>9.2f}")
+for nprobe in [int(n) for n in args.nprobe.split(",")]:
+    times_ms, hits = [], 0
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        (rows, _), = ivf.search_vectors(q, args.k, nprobe=nprobe)
+        times_ms.append((time.perf_counter() - started) * 1000)
+        hits += len(np.intersect1d(rows, expected))
+    p50, p99 = percentiles(times_ms)
+    print(f"{nprobe:>8} {hits / truth.size:>8.3f} {p50:>9.2f} {p99:>9.2f}")
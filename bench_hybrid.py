@@ -0,0 +1,83 @@
+import argparse
+import time
+import numpy as np
+from columnar_store import iter_table_chunks
+from hybrid_search import ALPHA, HybridSearcher
+from search_index import tokenize
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex
+
+# --- Config ---
+input_csv = "final_merged_output.csv"   # where the known-item queries are cut from
+index_path = "search_index"
+vector_index_path = "vector_index"
+
+parser = argparse.ArgumentParser(description="Known-item MRR / recall of BM25, dense and hybrid search")
+parser.add_argument("input", nargs="?", default=input_csv)
+parser.add_argument("--queries", type=int, default=200, help="videos sampled as query targets")
+parser.add_argument("--words", type=int, default=8, help="words per query")
+parser.add_argument("--dropout", type=float, default=0.3, help="fraction of a query's words replaced by words of other videos")
+parser.add_argument("-k", type=int, default=10)
+parser.add_argument("--rerank", type=int, default=50, help="fused top N re-scored in the rerank row")
+parser.add_argument("--alpha", type=float, default=ALPHA, help="BM25 weight in weighted fusion")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+# Queries: a transcript window of the target video, with some words swapped for
+# words of other videos, so neither exact keywords nor one embedding wins for free
+rng = np.random.default_rng(args.seed)
+texts = {}
+for chunk in iter_table_chunks(args.input, columns=["id", "transcript"], dtype=str):
+    for vid, transcript in zip(chunk["id"], chunk["transcript"]):
+        words = tokenize(transcript) if isinstance(transcript, str) else []
+        if isinstance(vid, str) and len(words) >= args.words * 4:
+            texts.setdefault(vid, words)
+lexical = SegmentedSearchIndex(index_path)
+live = set(lexical.live_fingerprints())
+ids = sorted(v for v in texts if v in live)
+if not ids:
+    raise SystemExit(f"❌ No indexed videos with transcripts in {args.input}")
+pool = [w for vid in ids for w in texts[vid][::50]]
+queries = []
+for vid in rng.choice(ids, min(args.queries, len(ids)), replace=False):
+    words = texts[vid]
+    start = int(rng.integers(0, len(words) - args.words))
+    window = words[start:start + args.words]
+    swap = rng.random(len(window)) < args.dropout
+    queries.append((" ".join(pool[rng.integers(len(pool))] if s else w for w, s in zip(window, swap)), vid))
+
+vectors = SegmentedVectorIndex(vector_index_path)
+hybrid = HybridSearcher(lexical, vectors, alpha=args.alpha)
+embedded = vectors.embedder.embed([q for q, _ in queries])
+
+
+def dense_videos(i, k):
+    seen = []
+    for hit in vectors.search_embedded(embedded[i:i + 1], k * 8)[0]:
+        if hit["video_id"] not in seen:
+            seen.append(hit["video_id"])
+    return seen[:k]
+
+
+runs = {
+    "bm25": lambda q, i: [vid for vid, _ in lexical.search(q, args.k)],
+    "dense": lambda q, i: dense_videos(i, args.k),
+    "hybrid rrf": lambda q, i: [r["video_id"] for r in hybrid.search(q, args.k, embedded=embedded[i])],
+    "hybrid weighted": lambda q, i: [r["video_id"] for r in hybrid.search(q, args.k, "weighted", embedded=embedded[i])],
+    f"weighted + rerank {args.rerank}": lambda q, i: [r["video_id"] for r in hybrid.search(
+        q, args.k, "weighted", args.rerank, embedded=embedded[i])],
+}
+print(f"📊 {len(queries)} known-item queries over {len(lexical)} videos ({args.words} words, {args.dropout:.0%} swapped)")
+print(f"   {'':24} MRR@{args.k}  recall@{args.k}   p50 ms   p99 ms  rounds")
+for name, run in runs.items():
+    ranks, times, rounds = [], [], []
+    for i, (query, target) in enumerate(queries):
+        started = time.perf_counter()
+        found = run(query, i)
+        times.append((time.perf_counter() - started) * 1000)
+        ranks.append(found.index(target) + 1 if target in found else None)
+        rounds.append(hybrid.stats.get("rounds", 1) if name.startswith(("hybrid", "weighted")) else 1)
+    mrr = np.mean([1 / r if r else 0.0 for r in ranks])
+    recall = np.mean([r is not None for r in ranks])
+    print(f"   {name:24} {mrr:7.3f}  {recall:9.3f}  {np.percentile(times, 50):7.1f}  {np.percentile(times, 99):7.1f}"
+          f"  {np.mean(rounds):6.2f}")
+hybrid.close()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+import numpy as np
+
+# --- Config ---
+QUERIES = [
+    "binary search tree", "linked list insertion", "stack and queue", "sorting algorithms", "merge sort",
+    "quick sort pivot", "time complexity", "dynamic programming", "graph traversal", "breadth first search",
+    "depth first search", "hash table collision", "heap sort", "recursion basics", "pointers in c",
+    "arrays in c", "operating system scheduling", "deadlock", "virtual memory paging", "computer networks",
+    "tcp handshake", "digital electronics flip flop", "logic gates", "boolean algebra", "number systems",
+]
+
+parser = argparse.ArgumentParser(description="Load-test query_server.py: QPS and p50/p99 latency")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--mode", default="bm25", choices=["bm25", "dense", "hybrid"])
+parser.add_argument("--clients", type=int, default=32, help="concurrent keep-alive connections")
+parser.add_argument("--requests", type=int, default=5000, help="total requests")
+parser.add_argument("--unique", type=float, default=0.5,
+                    help="fraction of requests with a never-seen query (cache misses); the rest repeat QUERIES")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+def make_targets():
+    rng = random.Random(args.seed)
+    words = " ".join(QUERIES).split()
+    targets = []
+    for i in range(args.requests):
+        if rng.random() < args.unique:
+            query = " ".join(rng.sample(words, 3)) + f" {i}"   # unique text, realistic terms
+        else:
+            query = rng.choice(QUERIES)
+        page = 1 if rng.random() < 0.8 else 2
+        targets.append("/search?" + urlencode({"q": query, "mode": args.mode, "page": page}))
+    return targets
+
+
+async def client(targets, latencies, errors):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while targets:
+            target = targets.pop()
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {args.host}\r\n\r\n".encode("latin-1"))
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+            body = await reader.readexactly(length)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(json.loads(body).get("error"))
+    finally:
+        writer.close()
+
+
+async def main():
+    targets = make_targets()
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(targets, latencies, errors) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    writer.write(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+    health = json.loads((await reader.read()).split(b"\r\n\r\n", 1)[1])
+    writer.close()
+
+    p50, p99 = np.percentile(latencies, 50), np.percentile(latencies, 99)
+    print(f"📊 {len(latencies)} requests, {args.clients} clients, {args.mode}: "
+          f"{len(latencies) / elapsed:.0f} QPS, p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"   mean batch {health['mean_batch']}, result cache {health['result_cache']}")
+    if errors:
+        print(f"⚠️  {len(errors)} errors, e.g. {errors[0]}")
+
+
+asyncio.run(main())
@@ -0,0 +1,27 @@
+import argparse
+import os
+import time
+from ann_index import KMEANS_ITERATIONS, build_ivf
+from segmented_index import IVF_MIN_ROWS, SegmentedVectorIndex
+
+# --- Config ---
+index_path = "vector_index"   # built by build_vector_index.py; IVF lists go in each large segment's ivf/
+
+parser = argparse.ArgumentParser(description="Cluster the large vector index segments into IVF lists for approximate search")
+parser.add_argument("--nlist", type=int, default=None, help="k-means lists per segment (default ~4 * sqrt(vectors))")
+parser.add_argument("--iterations", type=int, default=KMEANS_ITERATIONS, help="k-means iterations")
+parser.add_argument("--min-rows", type=int, default=IVF_MIN_ROWS, help="smaller segments are scanned exactly")
+args = parser.parse_args()
+
+index = SegmentedVectorIndex(index_path)
+started = time.perf_counter()
+built = 0
+for seg in index.segments:
+    if seg.rows < args.min_rows:
+        continue
+    nlist = build_ivf(os.path.join(index_path, seg.name), nlist=args.nlist, iterations=args.iterations)
+    print(f"   {seg.name}: {seg.rows} vectors -> {nlist} lists")
+    built += 1
+
+print(f"✅ Clustered {built} of {len(index.segments)} segments in {time.perf_counter() - started:.1f}s")
+print(f"👉 Run bench_ann.py to choose --nprobe; lists saved in: {index_path}/<segment>/ivf/")
@@ -0,0 +1,15 @@
+import sys
+import time
+from filter_index import build_filter_index
+
+# --- Config ---
+input_csv = "final_merged_output.csv"   # has channel_id, publishedAt, duration, viewCount, ... (update_indexes.py rebuilds it too)
+index_path = "filter_index"
+
+if len(sys.argv) > 1 and not sys.argv[1].startswith("--"):
+    input_csv = sys.argv[1]
+
+started = time.perf_counter()
+rows = build_filter_index(input_csv, index_path)
+print(f"✅ Indexed the facets of {rows} videos from {input_csv} in {time.perf_counter() - started:.1f}s")
+print(f"👉 Filter index saved in: {index_path}/")
@@ -1,12 +1,82 @@
+import os
+import sys
 import pandas as pd
-import re
-import isodate
+from columnar_store import TableWriter, iter_table_chunks, load_table, save_table, table_columns
+from normalize import clean_text_alnum, iso_duration_to_seconds
+from sharded_clean import clean_columns
+from streaming import CHUNK_ROWS, SeenHashes, row_hashes
+from transcript_store import TranscriptStore
+
+input_files = ["cleaned_youtube_data.csv", "merged_youtube_videos_with_transcripts.csv"]  # mentor dataset, your videos + transcripts
+output_csv = "final_output.csv"
+text_columns = ["title", "description", "transcript"]
+transcript_store_path = "transcript_store"         # raw transcripts the fetchers stored
+clean_store_path = "clean_transcript_store"        # cleaned transcripts by video id, for random access
+
+raw_store = TranscriptStore(transcript_store_path) if os.path.isdir(transcript_store_path) else None
+clean_store = TranscriptStore(clean_store_path)
+
+
+def fill_transcripts(df):
+    """Rows without transcript text take the one the fetchers stored for their video id, if any."""
+    if raw_store is None or "id" not in df.columns:
+        return
+    missing = df["transcript"].isna() | (df["transcript"].astype(str).str.strip() == "")
+    ids = df.loc[missing, "id"].dropna().astype(str)
+    found = ids.map(raw_store.get_many(ids.tolist())).dropna()
+    if len(found):
+        df["transcript"] = df["transcript"].astype(object)   # an all-empty column reads as float
+        df.loc[found.index, "transcript"] = found
+
+
+def store_transcripts(df):
+    """Write the cleaned transcripts to the clean store (only new or changed text)."""
+    if "id" not in df.columns:
+        return 0
+    rows = df[df["id"].notna() & df["transcript"].notna() & (df["transcript"] != "")]
+    latest = dict(zip(rows["id"].astype(str), rows["transcript"]))   # a repeated id keeps its last row
+    changed = [(vid, text) for vid, text in latest.items() if clean_store.get(vid) != text]
+    clean_store.put_many(changed)
+    clean_store.flush()
+    return len(changed)
+
+
+# -------------------------------
+# Streaming mode (--stream): same steps chunk by chunk, memory stays flat
+# -------------------------------
+if "--stream" in sys.argv:
+    columns = list(dict.fromkeys(c for path in input_files for c in table_columns(path)))
+    if "transcript" not in columns:
+        columns.append("transcript")
+    has_duration = "duration" in columns
+    seen = SeenHashes()   # hashes of rows already written, instead of drop_duplicates()
+    stored = 0
+
+    with TableWriter(output_csv, columns + ["duration_seconds"]) as writer:
+        for path in input_files:
+            # Read as text so equal values hash the same in every chunk
+            for chunk in iter_table_chunks(path, CHUNK_ROWS, dtype=str):
+                chunk = chunk.reindex(columns=columns)
+                fill_transcripts(chunk)
+                for col, values in clean_columns(chunk, text_columns, clean_text_alnum).items():
+                    chunk[col] = values
+                chunk = chunk[seen.add_new(row_hashes(chunk))]
+                # duration_seconds only depends on duration, so it can be left out of the hash
+                chunk["duration_seconds"] = iso_duration_to_seconds(chunk["duration"]) if has_duration else None
+                stored += store_transcripts(chunk)
+                writer.write_frame(chunk)
+    clean_store.close()
+
+    print(f"🗜️  {stored} cleaned transcripts written to {clean_store_path}/")
+    print(f"✅ Done! {output_csv} created successfully (streaming).")
+    print("Final shape:", (writer.rows_written, len(columns) + 1))
+    sys.exit(0)
 
 # -------------------------------
 # 1️⃣ Load both CSV files
 # -------------------------------
-mentor_df = pd.read_csv("cleaned_youtube_data.csv")  # mentor dataset
-your_df   = pd.read_csv("merged_youtube_videos_with_transcripts.csv")  # your 50 videos + transcripts
+mentor_df = load_table(input_files[0])  # mentor dataset
+your_df   = load_table(input_files[1])  # your 50 videos + transcripts
 
 print("Mentor DF shape:", mentor_df.shape)
 print("Your DF shape:", your_df.shape)
@@ -17,40 +87,23 @@ print("Your DF shape:", your_df.shape)
 combined_df = pd.concat([mentor_df, your_df], axis=0, ignore_index=True)
 print("Combined shape:", combined_df.shape)
 
+# Ensure transcript column exists; missing text comes from the transcript store
+if "transcript" not in combined_df.columns:
+    combined_df["transcript"] = ""
+fill_transcripts(combined_df)
+
 # -------------------------------
 # 3️⃣ Clean text columns (if exist)
 # -------------------------------
-def clean_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).lower()
-    text = re.sub(r'[^a-z0-9\s]', " ", text)
-    text = re.sub(r'\s+', " ", text).strip()
-    return text
-
-text_columns = ["title", "description", "transcript"]
-
-for col in text_columns:
-    if col in combined_df.columns:
-        combined_df[col] = combined_df[col].apply(clean_text)
-
-# Ensure transcript column exists
-if "transcript" not in combined_df.columns:
-    combined_df["transcript"] = ""
+# Sharded across CPU cores for large inputs (QUERYTUBE_WORKERS=1 keeps it in-process)
+for col, values in clean_columns(combined_df, text_columns, clean_text_alnum).items():
+    combined_df[col] = values
 
 # -------------------------------
 # 4️⃣ Convert duration to seconds
 # -------------------------------
-def convert_duration_to_seconds(d):
-    if pd.isna(d):
-        return None
-    try:
-        return int(isodate.parse_duration(str(d)).total_seconds())
-    except:
-        return None
-
 if "duration" in combined_df.columns:
-    combined_df["duration_seconds"] = combined_df["duration"].apply(convert_duration_to_seconds)
+    combined_df["duration_seconds"] = iso_duration_to_seconds(combined_df["duration"])
 else:
     combined_df["duration_seconds"] = None
 
@@ -62,7 +115,9 @@ combined_df = combined_df.drop_duplicates()
 # -------------------------------
 # 6️⃣ Save output
 # -------------------------------
-combined_df.to_csv("final_output.csv", index=False, encoding="utf-8")
-print("✅ Done! final_output.csv created successfully.")
+save_table(combined_df, output_csv)
+print(f"🗜️  {store_transcripts(combined_df)} cleaned transcripts written to {clean_store_path}/")
+clean_store.close()
+print(f"✅ Done! {output_csv} created successfully.")
 print("Final shape:", combined_df.shape)
 
@@ -0,0 +1,44 @@
+import argparse
+import os
+from catalog import Catalog
+from columnar_store import TableWriter
+from segments import PASSAGE_OVERLAP, PASSAGE_TOKENS, chunk_passages
+
+# --- Config ---
+catalog_path = "catalog.sqlite"   # transcripts + snippet timings stored by the fetchers
+output_path = "passages.csv"
+PASSAGE_COLUMNS = ["passage_id", "video_id", "passage", "start", "end", "text"]
+
+parser = argparse.ArgumentParser(description="Cut every catalog transcript into overlapping, time-anchored passages")
+parser.add_argument("--tokens", type=int, default=PASSAGE_TOKENS, help="whitespace tokens per passage")
+parser.add_argument("--overlap", type=int, default=PASSAGE_OVERLAP, help="tokens shared by consecutive passages")
+args = parser.parse_args()
+
+if not os.path.exists(catalog_path):
+    raise SystemExit(f"❌ {catalog_path} not found - run `querytube.py transcripts` first")
+
+videos = passages = untimed = 0
+with Catalog(catalog_path) as catalog, TableWriter(output_path, PASSAGE_COLUMNS) as writer:
+    # One video at a time: memory holds a single transcript, whatever the catalog size
+    for video_id, transcript, segments in catalog.iter_transcripts():
+        chunks = chunk_passages(transcript, segments, args.tokens, args.overlap)
+        if segments is None or not segments.matches(transcript):
+            untimed += 1   # fetched before timings were kept; passages get no start / end
+        writer.write_rows([
+            {
+                "passage_id": f"{video_id}:{i}",
+                "video_id": video_id,
+                "passage": i,
+                "start": None if start != start else round(start, 3),   # NaN -> empty cell
+                "end": None if end != end else round(end, 3),
+                "text": text,
+            }
+            for i, (start, end, text) in enumerate(zip(chunks["start"].tolist(), chunks["end"].tolist(), chunks["text"]))
+        ])
+        videos += 1
+        passages += len(chunks["text"])
+
+print(f"✅ {passages} passages from {videos} transcripts ({args.tokens} tokens, {args.overlap} overlap)")
+if untimed:
+    print(f"⚠️  {untimed} transcripts have no snippet timings; refetch them to anchor their passages")
+print(f"👉 Output saved as: {output_path}")
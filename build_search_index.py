@@ -0,0 +1,16 @@
+import sys
+import time
+from search_index import iter_documents
+from segmented_index import SegmentedSearchIndex
+
+# --- Config ---
+input_csv = "final_output.csv"   # cleaned title / description / transcript from build_final_dataset.py
+index_path = "search_index"      # directory of segments (update_indexes.py adds to it incrementally)
+
+if len(sys.argv) > 1 and not sys.argv[1].startswith("--"):
+    input_csv = sys.argv[1]
+
+started = time.perf_counter()
+index = SegmentedSearchIndex.rebuild(index_path, iter_documents(input_csv))
+print(f"✅ Indexed {len(index)} videos from {input_csv} in {time.perf_counter() - started:.1f}s")
+print(f"👉 Index saved in: {index_path}/")
@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+from columnar_store import iter_table_chunks
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from embedders import DEFAULT_EMBEDDER, load_embedder
+from segmented_index import SegmentedVectorIndex
+from vector_index import DTYPES
+
+# --- Config ---
+passages_path = "passages.csv"          # time-anchored transcript passages from build_passages.py
+videos_path = "final_output.csv"        # cleaned titles from build_final_dataset.py
+index_path = "vector_index"             # directory of segments (update_indexes.py adds to it incrementally)
+cache_path = "embedding_cache.sqlite"   # vectors of every text embedded before, by text + embedder version
+
+parser = argparse.ArgumentParser(description="Embed transcript passages and video titles into a dense vector index")
+parser.add_argument("--dtype", choices=DTYPES, default="float16", help="stored precision (int8 is half the size)")
+parser.add_argument("--embedder", default=DEFAULT_EMBEDDER, help='"hashing", "hashing:<dim>" or "st:<model name>"')
+parser.add_argument("--no-cache", action="store_true", help="re-embed every text instead of reusing cached vectors")
+args = parser.parse_args()
+
+
+def iter_titles(path):
+    seen = set()
+    for chunk in iter_table_chunks(path, columns=["id", "title"], dtype=str):
+        for vid, title in zip(chunk["id"], chunk["title"]):
+            if isinstance(vid, str) and isinstance(title, str) and vid not in seen:
+                seen.add(vid)
+                yield vid, title
+
+
+def iter_passages(path):
+    for chunk in iter_table_chunks(path, columns=["passage_id", "video_id", "start", "text"],
+                                   dtype={"passage_id": str, "video_id": str, "text": str}):
+        for pid, vid, start, text in zip(chunk["passage_id"], chunk["video_id"], chunk["start"], chunk["text"]):
+            if isinstance(text, str):
+                yield pid, vid, (None if start != start else float(start)), text
+
+
+def iter_items():
+    global titles, passages
+    if os.path.exists(videos_path):
+        for vid, title in iter_titles(videos_path):
+            titles += 1
+            yield f"{vid}:title", vid, None, title
+    if os.path.exists(passages_path):
+        for item in iter_passages(passages_path):
+            passages += 1
+            yield item
+
+
+if not os.path.exists(passages_path) and not os.path.exists(videos_path):
+    raise SystemExit(f"❌ Neither {passages_path} nor {videos_path} found - run `querytube.py passages` / `build` first")
+
+started = time.perf_counter()
+titles = passages = 0
+embedder = load_embedder(args.embedder)
+cache = None
+if not args.no_cache:
+    # Unchanged passages come from the cache, so a refresh only embeds new or edited text
+    cache = EmbeddingCache(cache_path)
+    embedder = CachedEmbedder(embedder, cache)
+
+SegmentedVectorIndex.rebuild(index_path, iter_items(), embedder=embedder, dtype=args.dtype)
+if cache is not None:
+    cache.close()
+
+print(f"✅ Indexed {titles} titles and {passages} passages with {embedder.name} "
+      f"({embedder.dim} dims, {args.dtype}) in {time.perf_counter() - started:.1f}s")
+if cache is not None:
+    print(f"♻️  {embedder.hits} reused from {cache_path}, {embedder.misses} newly embedded")
+print(f"👉 Index saved in: {index_path}/")
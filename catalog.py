@@ -0,0 +1,393 @@
+"""
+Local catalog: one SQLite (WAL) database with every video, channel,
+transcript (with its snippet timings) and fetch failure, keyed and indexed by id.
+The transcript text itself lives in a compressed TranscriptStore next to it
+(the transcripts table only records which videos have one); catalogs that
+still hold the text in SQLite are moved over when opened.
+
+Scripts upsert what they fetch as they go, so resuming ("which videos still
+need a transcript?") and joining metadata to transcripts are index lookups
+instead of re-reading whole CSVs. The CSV / Parquet files stay the interface
+for existing consumers: export_*() writes them, and sync_table() imports a
+file only when it changed since the catalog last wrote or imported it.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+import pandas as pd
+from channel_crawler import VIDEO_COLUMNS, CHANNEL_COLUMNS
+from columnar_store import TableWriter, iter_table_chunks, storage_paths, table_columns, table_exists
+from segments import Segments
+from transcript_store import STORE_PATH, TranscriptStore
+
+# -----------------------------
+# Config
+# -----------------------------
+CATALOG_PATH = "catalog.sqlite"
+BATCH_ROWS = 500        # rows per executemany / ids per IN (...) lookup
+
+VIDEO_FIELDS = [c for c in VIDEO_COLUMNS if c not in CHANNEL_COLUMNS] + ["channel_id"]
+TRANSCRIPT_FIELDS = ["video_id", "transcript"]
+FAILURE_FIELDS = ["video_id", "reason"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS channels (
+    {", ".join(f'"{c}"' + (" TEXT PRIMARY KEY" if c == "channel_id" else "") for c in CHANNEL_COLUMNS)},
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    {", ".join(f'"{c}"' + (" TEXT PRIMARY KEY" if c == "id" else "") for c in VIDEO_FIELDS)},
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS videos_by_channel ON videos (channel_id, publishedAt);
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT PRIMARY KEY,
+    transcript TEXT,  -- NULL: the text is in the transcript store
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS fetch_failures (
+    video_id TEXT PRIMARY KEY,
+    reason TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS transcript_segments (
+    video_id TEXT PRIMARY KEY,
+    start_ms BLOB,
+    duration_ms BLOB,
+    offsets BLOB,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS failures_by_reason ON fetch_failures (reason);
+CREATE INDEX IF NOT EXISTS transcripts_by_time ON transcripts (updated_at);
+CREATE INDEX IF NOT EXISTS failures_by_time ON fetch_failures (updated_at);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    kind TEXT,
+    signature TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _value(v):
+    """pandas / numpy cell -> SQLite value (NaN and NA become NULL)."""
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if hasattr(v, "item"):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+def _names(cols):
+    return ", ".join(f'"{c}"' for c in cols)
+
+
+def _placeholders(n):
+    return ", ".join("?" * n)
+
+
+def _video_select():
+    """VIDEO_COLUMNS from videos v + channels c (channel_id always from the video row)."""
+    return ", ".join(f'c."{c}"' if c in CHANNEL_COLUMNS and c != "channel_id" else f'v."{c}"' for c in VIDEO_COLUMNS)
+
+
+def _signature(path):
+    """Size + mtime of every file backing a table (CSV or Parquet dataset)."""
+    sig = []
+    for candidate in storage_paths(path):
+        if os.path.isdir(candidate):
+            files = [os.path.join(candidate, n) for n in sorted(os.listdir(candidate))]
+        elif os.path.exists(candidate):
+            files = [candidate]
+        else:
+            files = []
+        for file in files:
+            st = os.stat(file)
+            sig.append([file, st.st_size, st.st_mtime_ns])
+    return json.dumps(sig)
+
+
+class Catalog:
+    def __init__(self, path=CATALOG_PATH, store_path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.store = TranscriptStore(store_path)
+        self._move_transcripts()
+
+    def _move_transcripts(self):
+        """Move transcript text still stored in SQLite (older catalogs) into the transcript store."""
+        cursor = self.conn.execute("SELECT video_id, transcript FROM transcripts WHERE transcript IS NOT NULL")
+        moved = 0
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS * 20)
+            if not rows:
+                break
+            self.store.put_many((video_id, text) for video_id, text in rows)
+            self.store.flush()
+            moved += len(rows)
+        if not moved:
+            return
+        with self.conn:
+            self.conn.execute("UPDATE transcripts SET transcript = NULL WHERE transcript IS NOT NULL")
+        self.conn.execute("VACUUM")
+        print(f"Moved {moved} transcripts from {self.path} into {self.store.path}/")
+
+    def close(self):
+        self.store.close()
+        self.conn.close()
+
+    def state_paths(self):
+        """Files whose size / mtime change whenever the catalog or its transcript store does (for run stamps)."""
+        return [self.path, self.path + "-wal"] + [os.path.join(self.store.path, n) for n in ("meta.json", "index.npy", "blobs.bin")]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------
+    # Upserts
+    # -----------------------------
+    def _upsert(self, table, key, fields, rows):
+        """INSERT ... ON CONFLICT(key) DO UPDATE for the `fields` each row has; other columns keep their values."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        cols = [key] + [c for c in fields if c != key and c in rows[0]]
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in cols[1:] + ["updated_at"])
+        sql = (f"INSERT INTO {table} ({_names(cols)}, updated_at) VALUES ({_placeholders(len(cols) + 1)}) "
+               f'ON CONFLICT("{key}") DO UPDATE SET {updates}')
+        now = time.time()
+        with self.conn:
+            for start in range(0, len(rows), BATCH_ROWS):
+                self.conn.executemany(sql, [
+                    tuple(_value(r.get(c)) for c in cols) + (now,) for r in rows[start:start + BATCH_ROWS]
+                ])
+        return len(rows)
+
+    def upsert_channels(self, rows):
+        return self._upsert("channels", "channel_id", CHANNEL_COLUMNS, rows)
+
+    def upsert_videos(self, rows):
+        """Video rows as produced by the crawler; channel_* columns go to the channels table."""
+        rows = [r for r in rows if _value(r.get("id")) is not None]
+        if rows and any(c in rows[0] for c in CHANNEL_COLUMNS[1:]):
+            channels = {r["channel_id"]: r for r in rows if _value(r.get("channel_id")) is not None}
+            self.upsert_channels(channels.values())
+        return self._upsert("videos", "id", VIDEO_FIELDS, rows)
+
+    def upsert_transcripts(self, rows):
+        """
+        {video_id, transcript} rows. Empty transcripts are ignored; a stored
+        transcript clears the video's failure, and its segments if the text changed.
+        """
+        rows = [r for r in rows if _value(r.get("transcript")) not in (None, "")]
+        # Only new or edited text is written; re-imports of an unchanged file leave the store alone
+        changed, edited = [], []
+        self.store.refresh()   # compare against what other processes stored since
+        for r in rows:
+            text = str(_value(r["transcript"]))
+            stored = self.store.get(str(r["video_id"]))
+            if stored != text:
+                changed.append((str(r["video_id"]), text))
+                if stored is not None:
+                    edited.append((str(r["video_id"]),))
+        with self.conn:
+            self.conn.executemany("DELETE FROM transcript_segments WHERE video_id = ?", edited)
+        self.store.put_many(changed)
+        self.store.flush()
+        self._upsert("transcripts", "video_id", ["video_id"], [{"video_id": r["video_id"]} for r in rows])
+        ids = [r["video_id"] for r in rows]
+        with self.conn:
+            for start in range(0, len(ids), BATCH_ROWS):
+                chunk = ids[start:start + BATCH_ROWS]
+                self.conn.execute(f"DELETE FROM fetch_failures WHERE video_id IN ({_placeholders(len(chunk))})", chunk)
+        return len(rows)
+
+    def upsert_segments(self, rows):
+        """{video_id, segments} rows, segments being segments.Segments for the stored transcript text."""
+        rows = [{"video_id": r["video_id"], **dict(zip(Segments.FIELDS, r["segments"].to_blobs()))}
+                for r in rows if r.get("segments") is not None]
+        return self._upsert("transcript_segments", "video_id", ["video_id", *Segments.FIELDS], rows)
+
+    def record_failures(self, rows):
+        """{video_id, reason} rows."""
+        return self._upsert("fetch_failures", "video_id", FAILURE_FIELDS, rows)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def missing_transcripts(self, skip_reasons=()):
+        """Video ids (catalog order) with no stored transcript and no failure in `skip_reasons`."""
+        skip_reasons = list(skip_reasons)
+        sql = """
+            SELECT v.id FROM videos v
+            WHERE NOT EXISTS (SELECT 1 FROM transcripts t WHERE t.video_id = v.id)
+        """
+        if skip_reasons:
+            sql += f"""
+              AND NOT EXISTS (SELECT 1 FROM fetch_failures f
+                              WHERE f.video_id = v.id AND f.reason IN ({_placeholders(len(skip_reasons))}))
+            """
+        sql += " ORDER BY v.rowid"
+        return [row[0] for row in self.conn.execute(sql, skip_reasons)]
+
+    def transcripts_for(self, video_ids):
+        """{video_id: transcript} for the ids that have one."""
+        found = {}
+        video_ids = [str(v) for v in video_ids]
+        self.store.refresh()
+        for start in range(0, len(video_ids), BATCH_ROWS):
+            chunk = video_ids[start:start + BATCH_ROWS]
+            stored = [row[0] for row in self.conn.execute(
+                f"SELECT video_id FROM transcripts WHERE video_id IN ({_placeholders(len(chunk))})", chunk
+            )]
+            found.update(self.store.get_many(stored))
+        return found
+
+    def segments_for(self, video_ids):
+        """{video_id: Segments} for the ids that have them."""
+        found = {}
+        video_ids = [str(v) for v in video_ids]
+        for start in range(0, len(video_ids), BATCH_ROWS):
+            chunk = video_ids[start:start + BATCH_ROWS]
+            for row in self.conn.execute(
+                f"SELECT video_id, {_names(Segments.FIELDS)} FROM transcript_segments "
+                f"WHERE video_id IN ({_placeholders(len(chunk))})", chunk
+            ):
+                found[row[0]] = Segments.from_blobs(*row[1:])
+        return found
+
+    def iter_transcripts(self):
+        """(video_id, transcript, Segments or None) for every stored transcript, in catalog order."""
+        self.store.refresh()
+        cursor = self.conn.execute(
+            f"""SELECT t.video_id, {", ".join(f's."{f}"' for f in Segments.FIELDS)}
+                FROM transcripts t LEFT JOIN transcript_segments s ON s.video_id = t.video_id
+                ORDER BY t.rowid"""
+        )
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            for video_id, *blobs in rows:
+                yield video_id, self.store.get(video_id), (Segments.from_blobs(*blobs) if blobs[0] is not None else None)
+
+    def failed_ids(self, reasons=None):
+        if reasons is None:
+            return {row[0] for row in self.conn.execute("SELECT video_id FROM fetch_failures")}
+        reasons = list(reasons)
+        return {row[0] for row in self.conn.execute(
+            f"SELECT video_id FROM fetch_failures WHERE reason IN ({_placeholders(len(reasons))})", reasons
+        )}
+
+    def counts(self):
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("videos", "channels", "transcripts", "transcript_segments", "fetch_failures")}
+
+    # -----------------------------
+    # CSV / Parquet interchange
+    # -----------------------------
+    def mark_synced(self, path, kind):
+        """Record that `path` matches the catalog, so sync_table() will not re-import it."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sources (path, kind, signature, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET kind = excluded.kind, signature = excluded.signature, "
+                "synced_at = excluded.synced_at",
+                (os.path.abspath(path), kind, _signature(path), time.time())
+            )
+
+    def is_current(self, path):
+        """True if `path` is unchanged since mark_synced() and no transcript or failure changed after that."""
+        row = self.conn.execute("SELECT signature, synced_at FROM sources WHERE path = ?",
+                                (os.path.abspath(path),)).fetchone()
+        if row is None or row[0] != _signature(path):
+            return False
+        latest = self.conn.execute(
+            "SELECT MAX(t) FROM (SELECT MAX(updated_at) AS t FROM transcripts "
+            "UNION ALL SELECT MAX(updated_at) FROM fetch_failures)"
+        ).fetchone()[0]
+        return latest is None or latest <= row[1]
+
+    def sync_table(self, path, kind):
+        """
+        Import `path` ("videos", "transcripts" or "failures") if it changed since
+        the catalog last wrote or imported it. Returns the number of rows imported.
+        """
+        if not table_exists(path):
+            return 0
+        row = self.conn.execute("SELECT signature FROM sources WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        if row is not None and row[0] == _signature(path):
+            return 0
+
+        columns = table_columns(path)
+        key = "video_id" if "video_id" in columns else "id"
+        if kind == "videos":
+            wanted, upsert = None, self.upsert_videos
+        elif kind == "transcripts":
+            wanted, upsert = [key, "transcript"], self.upsert_transcripts
+        elif kind == "failures":
+            wanted, upsert = [key] + (["reason"] if "reason" in columns else []), self.record_failures
+        else:
+            raise ValueError(f"Unknown table kind: {kind}")
+
+        imported = 0
+        for chunk in iter_table_chunks(path, columns=wanted, dtype=str):
+            if kind != "videos":
+                chunk = chunk.rename(columns={key: "video_id"})
+            imported += upsert(chunk.to_dict("records"))
+        self.mark_synced(path, kind)
+        return imported
+
+    def _export(self, sql, columns, path, kind=None, params=()):
+        """Write the rows of `sql` as `columns`; a "transcript" column is filled from the store by video_id."""
+        cursor = self.conn.execute(sql, params)
+        self.store.refresh()
+        with TableWriter(path, columns) as writer:
+            while True:
+                rows = cursor.fetchmany(BATCH_ROWS * 20)
+                if not rows:
+                    break
+                rows = [dict(zip(columns, row)) for row in rows]
+                if "transcript" in columns:
+                    for r in rows:
+                        r["transcript"] = self.store.get(r["video_id"]) if r["video_id"] is not None else None
+                writer.write_rows(rows)
+        if kind:
+            self.mark_synced(path, kind)
+        return writer.rows_written
+
+    def export_transcripts(self, path):
+        return self._export("SELECT video_id, NULL FROM transcripts ORDER BY rowid",
+                            TRANSCRIPT_FIELDS, path, kind="transcripts")
+
+    def export_failures(self, path):
+        return self._export("SELECT video_id, reason FROM fetch_failures ORDER BY rowid",
+                            FAILURE_FIELDS, path, kind="failures")
+
+    def export_videos(self, path):
+        """Video rows with their channel columns, in the crawler's VIDEO_COLUMNS layout."""
+        return self._export(
+            f"SELECT {_video_select()} FROM videos v LEFT JOIN channels c ON c.channel_id = v.channel_id ORDER BY v.rowid",
+            VIDEO_COLUMNS, path, kind="videos"
+        )
+
+    def export_merged(self, path):
+        """Videos LEFT JOIN transcripts, laid out like merge_videos_and_transcripts.py's pd.merge output."""
+        return self._export(
+            f"""SELECT {_video_select()}, t.video_id, NULL FROM videos v
+                LEFT JOIN channels c ON c.channel_id = v.channel_id
+                LEFT JOIN transcripts t ON t.video_id = v.id
+                ORDER BY v.rowid""",
+            VIDEO_COLUMNS + TRANSCRIPT_FIELDS, path
+        )
@@ -0,0 +1,390 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from concurrent_fetch import fetch_concurrently
+
+# pandas, isodate and googleapiclient are imported inside the functions that
+# need them, so a no-op incremental sync never pays for loading them
+
+# -----------------------------
+# Config
+# -----------------------------
+BATCH_SIZE = 50   # videos().list accepts at most 50 ids per call
+DISCOVERY_PATH = "youtube_v3_discovery.json"  # local copy of the Data API discovery document
+VIDEO_PARTS = "snippet,contentDetails,statistics,status"
+STATS_COLUMNS = ["viewCount", "likeCount", "commentCount"]
+
+CHANNEL_COLUMNS = [
+    "channel_id", "channel_title", "channel_description", "channel_country",
+    "channel_thumbnail", "channel_subscriber", "channel_videoCount",
+]
+
+VIDEO_COLUMNS = [
+    "id", "title", "description", "publishedAt", "tags", "categoryId",
+    "defaultLanguage", "defaultAudioLanguage", "thumbnail_default", "thumbnail_high",
+    "duration", "privacyStatus", "viewCount", "likeCount", "commentCount",
+] + CHANNEL_COLUMNS
+
+
+# -----------------------------
+# API client
+# -----------------------------
+@lru_cache(maxsize=1)
+def load_discovery_document(path=DISCOVERY_PATH):
+    """
+    Parse the discovery document once per process. It is read from `path`, or
+    copied there from the static copy bundled with googleapiclient, so building
+    a client never touches the network.
+    """
+    if not os.path.exists(path):
+        import googleapiclient
+        bundled = os.path.join(os.path.dirname(googleapiclient.__file__), "discovery_cache", "documents", "youtube.v3.json")
+        with open(bundled, encoding="utf-8") as src, open(path + "_temp", "w", encoding="utf-8") as dst:
+            dst.write(src.read())
+        os.replace(path + "_temp", path)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_client(api_key, cache=None):
+    """YouTube Data API client; with a ResponseCache, identical requests are answered from disk."""
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.http import HttpRequest
+    from response_cache import cached_request_builder
+
+    request_builder = HttpRequest if cache is None else cached_request_builder(cache)
+    return build_from_document(load_discovery_document(), developerKey=api_key, requestBuilder=request_builder)
+
+
+# -----------------------------
+# Channel details
+# -----------------------------
+def parse_channel(channel_data):
+    """Return (channel_info, uploads_playlist_id) from a channels().list item."""
+    channel_info = {
+        "channel_id": channel_data["id"],
+        "channel_title": channel_data["snippet"]["title"],
+        "channel_description": channel_data["snippet"].get("description"),
+        "channel_country": channel_data["snippet"].get("country"),
+        "channel_thumbnail": channel_data["snippet"]["thumbnails"]["default"]["url"],
+        "channel_subscriber": channel_data["statistics"].get("subscriberCount"),
+        "channel_videoCount": channel_data["statistics"].get("videoCount")
+    }
+    return channel_info, channel_data["contentDetails"]["relatedPlaylists"]["uploads"]
+
+
+def get_channel_info(youtube, channel_id):
+    """Return (channel_info, uploads_playlist_id), or (None, raw_response) if the channel does not exist."""
+    channel_res = youtube.channels().list(
+        part="snippet,statistics,contentDetails",
+        id=channel_id
+    ).execute()
+
+    if "items" not in channel_res or len(channel_res["items"]) == 0:
+        return None, channel_res
+
+    channel_info, playlist_id = parse_channel(channel_res["items"][0])
+    channel_info["channel_id"] = channel_id
+    return channel_info, playlist_id
+
+
+def get_channels_info(youtube, channel_ids):
+    """Look up many channels with one channels().list call per 50 ids. Returns {channel_id: (channel_info, uploads_playlist_id)}."""
+    found = {}
+    for i in range(0, len(channel_ids), BATCH_SIZE):
+        channel_res = youtube.channels().list(
+            part="snippet,statistics,contentDetails",
+            id=",".join(channel_ids[i:i + BATCH_SIZE]),
+            maxResults=BATCH_SIZE
+        ).execute()
+        for item in channel_res.get("items", []):
+            found[item["id"]] = parse_channel(item)
+    return found
+
+
+# -----------------------------
+# Uploads playlist pagination
+# -----------------------------
+def iter_upload_batches(youtube, playlist_id, batch_size=BATCH_SIZE, max_videos=None):
+    """Follow nextPageToken through the uploads playlist, yielding lists of up to `batch_size` video ids."""
+    page_token = None
+    seen = 0
+    while True:
+        playlist_res = youtube.playlistItems().list(
+            part="contentDetails",
+            playlistId=playlist_id,
+            maxResults=batch_size,
+            pageToken=page_token
+        ).execute()
+
+        batch = [item["contentDetails"]["videoId"] for item in playlist_res.get("items", [])]
+        if max_videos is not None:
+            batch = batch[:max_videos - seen]
+        if batch:
+            seen += len(batch)
+            yield batch
+
+        page_token = playlist_res.get("nextPageToken")
+        if not page_token or (max_videos is not None and seen >= max_videos):
+            return
+
+
+# -----------------------------
+# Video details
+# -----------------------------
+def build_video_record(v, channel_info):
+    import isodate
+
+    snippet = v["snippet"]
+    stats = v.get("statistics", {})
+    content = v["contentDetails"]
+    status = v.get("status", {})
+
+    # Parse duration (ISO → seconds)
+    duration_iso = content.get("duration")
+    duration_seconds = None
+    if duration_iso:
+        try:
+            duration_seconds = int(isodate.parse_duration(duration_iso).total_seconds())
+        except Exception:
+            duration_seconds = None
+
+    video_record = {
+        "id": v["id"],
+        "title": snippet.get("title"),
+        "description": snippet.get("description"),
+        "publishedAt": snippet.get("publishedAt"),
+        "tags": ",".join(snippet.get("tags", [])),
+        "categoryId": snippet.get("categoryId"),
+        "defaultLanguage": snippet.get("defaultLanguage"),
+        "defaultAudioLanguage": snippet.get("defaultAudioLanguage"),
+
+        "thumbnail_default": snippet["thumbnails"]["default"]["url"],
+        "thumbnail_high": snippet["thumbnails"]["high"]["url"],
+
+        "duration": duration_seconds,
+        "privacyStatus": status.get("privacyStatus"),
+
+        "viewCount": stats.get("viewCount"),
+        "likeCount": stats.get("likeCount"),
+        "commentCount": stats.get("commentCount"),
+    }
+    # Add channel info (duplicated per row for convenience)
+    video_record.update({col: channel_info[col] for col in CHANNEL_COLUMNS})
+    return video_record
+
+
+def make_batch_fetcher(api_key, part=VIDEO_PARTS, cache=None):
+    """Return fetch(batch) -> list of raw video items. Each worker thread builds its own client (httplib2 is not thread-safe)."""
+    thread_state = threading.local()
+
+    def fetch(batch):
+        if not hasattr(thread_state, "youtube"):
+            thread_state.youtube = build_client(api_key, cache)
+        videos_res = thread_state.youtube.videos().list(
+            part=part,
+            id=",".join(batch)
+        ).execute()
+        return videos_res.get("items", [])
+
+    return fetch
+
+
+# -----------------------------
+# Streaming crawl
+# -----------------------------
+def crawl_channel(youtube, api_key, channel_info, playlist_id, output_csv, workers=4, max_videos=None, cache=None,
+                  catalog=None, progress=None):
+    """
+    Crawl the whole uploads playlist into `output_csv`. Playlist pages are read
+    in this thread while videos().list batches run on `workers` threads; rows are
+    written as each batch returns, so memory stays bounded by the in-flight batches.
+    Rows are also upserted into `catalog` when one is given, and the running row
+    count is kept in progress["written"] (so a caller knows how far a failed crawl got).
+    Returns (rows written, newest publishedAt seen).
+    """
+    batches = iter_upload_batches(youtube, playlist_id, max_videos=max_videos)
+    fetch_batch = make_batch_fetcher(api_key, cache=cache)
+
+    from columnar_store import TableWriter
+
+    written = 0
+    newest = None
+    with TableWriter(output_csv, VIDEO_COLUMNS) as writer:
+        for batch, items in fetch_concurrently(batches, fetch_batch, workers=workers):
+            records = [build_video_record(v, channel_info) for v in items]
+            writer.write_rows(records)
+            if catalog is not None:
+                catalog.upsert_videos(records)
+            for record in records:
+                newest = max(newest or "", record["publishedAt"] or "") or None
+            written += len(items)
+            if progress is not None:
+                progress["written"] = written
+            print(f"   +{len(items)} videos (total {written})")
+
+    return written, newest
+
+
+# -----------------------------
+# Incremental sync state (per-channel high-water mark)
+# -----------------------------
+def load_sync_state(state_path):
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_sync_state(state, state_path):
+    temp_path = state_path + "_temp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+
+def record_watermark(state, channel_id, playlist_id, newest_published_at, playlist_etag=None):
+    entry = state.setdefault(channel_id, {})
+    entry["uploads_playlist_id"] = playlist_id
+    if newest_published_at and newest_published_at > (entry.get("last_published_at") or ""):
+        entry["last_published_at"] = newest_published_at
+    if playlist_etag:
+        entry["playlist_etag"] = playlist_etag
+    entry["last_sync"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def list_new_uploads(youtube, playlist_id, since, etag=None, batch_size=BATCH_SIZE):
+    """
+    Walk the uploads playlist (newest first) only until an already-known video.
+    The first page is requested with If-None-Match, so an unchanged playlist costs
+    one call and returns no body. Returns (new_video_ids, first_page_etag, newest_published_at).
+    """
+    from googleapiclient.errors import HttpError
+
+    new_ids = []
+    first_etag = etag
+    newest = None
+    page_token = None
+
+    while True:
+        request = youtube.playlistItems().list(
+            part="contentDetails",
+            playlistId=playlist_id,
+            maxResults=batch_size,
+            pageToken=page_token
+        )
+        if page_token is None and etag:
+            request.headers["If-None-Match"] = etag
+        try:
+            playlist_res = request.execute()
+        except HttpError as e:
+            if e.resp.status == 304:
+                return [], etag, None
+            raise
+
+        if page_token is None:
+            first_etag = playlist_res.get("etag", etag)
+
+        for item in playlist_res.get("items", []):
+            published = item["contentDetails"].get("videoPublishedAt") or ""
+            if since and published and published <= since:
+                return new_ids, first_etag, newest
+            new_ids.append(item["contentDetails"]["videoId"])
+            newest = max(newest or "", published) or None
+
+        page_token = playlist_res.get("nextPageToken")
+        if not page_token:
+            return new_ids, first_etag, newest
+
+
+def refresh_statistics(fetch_batch_stats, video_ids, workers=4):
+    """Return {video_id: {viewCount, likeCount, commentCount}} for `video_ids` (statistics part only)."""
+    batches = [video_ids[i:i + BATCH_SIZE] for i in range(0, len(video_ids), BATCH_SIZE)]
+    stats = {}
+    for batch, items in fetch_concurrently(batches, fetch_batch_stats, workers=workers):
+        for v in items:
+            s = v.get("statistics", {})
+            stats[v["id"]] = {col: s.get(col) for col in STATS_COLUMNS}
+    return stats
+
+
+def sync_channel(youtube, api_key, channel_info, playlist_id, output_csv, state,
+                 stats_window_days=7, workers=4, cache=None, catalog=None):
+    """
+    Incremental sync: fetch details only for uploads newer than the stored
+    watermark, refresh statistics only for videos published in the last
+    `stats_window_days`, then upsert both into `output_csv` (and `catalog`, if
+    given, with just the changed rows). Updates `state` in place.
+    Returns (new videos, refreshed videos).
+    """
+    channel_id = channel_info["channel_id"]
+    entry = state.get(channel_id, {})
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=stats_window_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    new_ids, etag, newest = list_new_uploads(
+        youtube, playlist_id, entry.get("last_published_at"), entry.get("playlist_etag")
+    )
+
+    # Fast path: no new uploads and nothing inside the stats window, answered
+    # from the state file alone, without loading pandas or the CSV
+    recent_known = entry.get("recent")
+    if not new_ids and recent_known is not None and not any(p >= cutoff for p in recent_known.values()):
+        record_watermark(state, channel_id, playlist_id, newest, etag)
+        state[channel_id]["recent"] = {}
+        return 0, 0
+
+    import pandas as pd
+    from columnar_store import load_table, save_table, table_exists
+
+    existing = load_table(output_csv, dtype={"id": str}) if table_exists(output_csv) else pd.DataFrame(columns=VIDEO_COLUMNS)
+    known_ids = set(existing["id"])
+    new_ids = [vid for vid in new_ids if vid not in known_ids]
+
+    # Details for brand-new uploads
+    new_rows = []
+    if new_ids:
+        fetch_batch = make_batch_fetcher(api_key, cache=cache)
+        batches = [new_ids[i:i + BATCH_SIZE] for i in range(0, len(new_ids), BATCH_SIZE)]
+        for batch, items in fetch_concurrently(batches, fetch_batch, workers=workers):
+            new_rows.extend(build_video_record(v, channel_info) for v in items)
+
+    # Statistics for recently published videos only
+    published = existing["publishedAt"].fillna("").astype(str)
+    recent = existing[(existing["channel_id"] == channel_id) & (published >= cutoff)]
+    recent_ids = recent["id"].tolist()
+    stats = refresh_statistics(make_batch_fetcher(api_key, part="statistics", cache=cache), recent_ids, workers) if recent_ids else {}
+
+    if stats:
+        idx = existing["id"].isin(stats.keys())
+        for col in STATS_COLUMNS:
+            existing[col] = existing[col].astype(object)
+            existing.loc[idx, col] = existing.loc[idx, "id"].map(lambda vid: stats[vid][col])
+
+    table = existing
+    if new_rows or stats:
+        # Channel columns are refreshed on every row of this channel
+        channel_rows = existing["channel_id"] == channel_id
+        for col in CHANNEL_COLUMNS:
+            existing[col] = existing[col].astype(object)
+            existing.loc[channel_rows, col] = channel_info[col]
+
+        table = pd.concat([pd.DataFrame(new_rows, columns=VIDEO_COLUMNS), existing], ignore_index=True)
+        table = table.drop_duplicates(subset="id", keep="first")
+        save_table(table, output_csv)
+
+        if catalog is not None:
+            catalog.upsert_videos(new_rows)
+            catalog.upsert_videos([{"id": vid, **values} for vid, values in stats.items()])
+            catalog.upsert_channels([channel_info])
+
+    if new_rows:
+        newest = max(newest or "", max(r["publishedAt"] or "" for r in new_rows)) or None
+    record_watermark(state, channel_id, playlist_id, newest, etag)
+
+    # Remember which videos are still inside the stats window for the fast path above
+    published = table["publishedAt"].fillna("").astype(str)
+    in_window = (table["channel_id"] == channel_id) & (published >= cutoff)
+    state[channel_id]["recent"] = dict(zip(table.loc[in_window, "id"], published[in_window]))
+    return len(new_rows), len(stats)
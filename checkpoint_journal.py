@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+
+# -----------------------------
+# Append-only JSONL checkpoint journal
+# -----------------------------
+class Journal:
+    """
+    Append-only JSONL journal. Every append is flushed to the OS right away,
+    so a crashed process loses nothing; fsync (survives power loss) is batched
+    every `fsync_every` records or `fsync_interval` seconds, whichever comes first.
+    Opening it cuts off a line torn by a crash, so appends never join onto one.
+    """
+
+    def __init__(self, path, fsync_every=25, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        _drop_torn_tail(path)
+        self._file = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _drop_torn_tail(path, block=4096):
+    """Cut off a partial last line (crash mid-write), so the next append starts on a line of its own."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        keep = end
+        while keep > 0:
+            start = max(0, keep - block)
+            f.seek(start)
+            chunk = f.read(keep - start)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            keep = start
+        if keep < end:
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def replay(path):
+    """Yield journal records in write order. A torn last line (crash mid-write) is skipped."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line; Journal() cuts a torn tail off before appending, so records may follow it
+                continue
+
+
+def is_empty(path):
+    return not os.path.exists(path) or os.path.getsize(path) == 0
+
+
+def reset(path):
+    """Truncate the journal once its records have been compacted into the output table."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.flush()
+        os.fsync(f.fileno())
+
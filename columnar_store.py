@@ -0,0 +1,320 @@
+"""
+Table storage shared by every pipeline stage.
+
+Scripts keep their familiar "*.csv" names and call load_table / save_table.
+With QUERYTUBE_STORAGE=parquet the same name maps to a dataset directory
+("final_output.parquet/") holding two zstd-compressed Parquet files with the
+same row order:
+
+    metadata.parquet     every column except the transcript text
+    transcripts.parquet  id + transcript
+
+Metadata-only reads (columns=[...] without "transcript") never open the
+transcript file. Reads fall back to an existing CSV, so switching formats
+needs no migration step: the next write produces the dataset.
+"""
+import os
+import shutil
+import pandas as pd
+
+# -----------------------------
+# Config
+# -----------------------------
+STORAGE_FORMAT = os.getenv("QUERYTUBE_STORAGE", "csv").lower()   # "csv" or "parquet"
+COMPRESSION = "zstd"
+TRANSCRIPT_COLUMNS = ["transcript"]
+KEY_COLUMNS = ["id", "video_id"]
+METADATA_FILE = "metadata.parquet"
+TRANSCRIPTS_FILE = "transcripts.parquet"
+
+
+def _pa():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("QUERYTUBE_STORAGE=parquet needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def dataset_path(path):
+    root, ext = os.path.splitext(path)
+    if ext == ".parquet":
+        return path
+    return (root if ext == ".csv" else path) + ".parquet"
+
+
+def resolve_path(path, fmt=None):
+    """Path the table lives at in the configured (or given) format."""
+    return dataset_path(path) if (fmt or STORAGE_FORMAT) == "parquet" else path
+
+
+def _existing_path(path):
+    """Where to read `path` from: the configured format first, then the other one."""
+    for candidate in (resolve_path(path), path, dataset_path(path)):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def storage_paths(*paths):
+    """Every location each table may live at (CSV and dataset), e.g. for change detection."""
+    return [p for path in paths for p in (path, dataset_path(path))]
+
+
+def table_exists(path):
+    found = _existing_path(path)
+    return found is not None and (os.path.isdir(found) or os.path.getsize(found) > 0)
+
+
+def table_columns(path):
+    """Column names of a table, in load_table order, without reading any rows."""
+    found = _existing_path(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    if not os.path.isdir(found):
+        return pd.read_csv(found, nrows=0).columns.tolist()
+    pq = _pa().parquet
+    names = pq.ParquetFile(os.path.join(found, METADATA_FILE)).schema_arrow.names
+    if os.path.exists(os.path.join(found, TRANSCRIPTS_FILE)):
+        names += [c for c in pq.ParquetFile(os.path.join(found, TRANSCRIPTS_FILE)).schema_arrow.names
+                  if c in TRANSCRIPT_COLUMNS]
+    return names
+
+
+def table_size(path):
+    """Bytes the table takes on disk (0 if it does not exist)."""
+    found = _existing_path(path)
+    if found is None:
+        return 0
+    if not os.path.isdir(found):
+        return os.path.getsize(found)
+    return sum(os.path.getsize(os.path.join(found, name)) for name in os.listdir(found))
+
+
+# -----------------------------
+# Arrow conversion
+# -----------------------------
+def _to_arrow(df):
+    """pandas -> Arrow. Object columns become strings, so mixed str/number cells cannot break the schema."""
+    pa = _pa()
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _split(table):
+    text_cols = [c for c in TRANSCRIPT_COLUMNS if c in table.column_names]
+    key_cols = [c for c in KEY_COLUMNS if c in table.column_names][:1]
+    meta = table.drop(text_cols)
+    text = table.select(key_cols + text_cols) if text_cols else None
+    return meta, text
+
+
+# -----------------------------
+# Whole-table read / write
+# -----------------------------
+def load_table(path, columns=None, **csv_kwargs):
+    """
+    Read a table, optionally only `columns`. Missing tables raise FileNotFoundError.
+    `csv_kwargs` (e.g. dtype=) apply to CSV reads only.
+    """
+    found = _existing_path(path)
+    if found is None:
+        raise FileNotFoundError(path)
+
+    if not os.path.isdir(found):
+        if columns is not None:
+            wanted = set(columns)
+            csv_kwargs["usecols"] = lambda c: c in wanted
+        return pd.read_csv(found, **csv_kwargs)
+
+    pq = _pa().parquet
+    meta_file = pq.ParquetFile(os.path.join(found, METADATA_FILE))
+    meta_cols = meta_file.schema_arrow.names
+    text_file = os.path.join(found, TRANSCRIPTS_FILE)
+
+    wanted_meta = meta_cols if columns is None else [c for c in meta_cols if c in columns]
+    wanted_text = [c for c in TRANSCRIPT_COLUMNS if columns is None or c in columns]
+
+    df = meta_file.read(columns=wanted_meta).to_pandas()
+    if wanted_text and os.path.exists(text_file):
+        text_df = pq.read_table(text_file, columns=wanted_text).to_pandas()
+        for col in text_df.columns:
+            df[col] = text_df[col].values   # same row order as the metadata file
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def save_table(df, path):
+    """Atomically write `df` in the configured format. Returns the path written."""
+    target = resolve_path(path)
+    if STORAGE_FORMAT != "parquet":
+        temp_path = target + "_temp"
+        df.to_csv(temp_path, index=False, encoding="utf-8")
+        os.replace(temp_path, target)
+        return target
+
+    pq = _pa().parquet
+    meta, text = _split(_to_arrow(df))
+    temp_dir = target + "_temp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    pq.write_table(meta, os.path.join(temp_dir, METADATA_FILE), compression=COMPRESSION)
+    if text is not None:
+        pq.write_table(text, os.path.join(temp_dir, TRANSCRIPTS_FILE), compression=COMPRESSION)
+    _swap_dir(temp_dir, target)
+    return target
+
+
+def _swap_dir(temp_dir, target):
+    old_dir = target + "_old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, old_dir)
+    os.replace(temp_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# -----------------------------
+# Streaming read / write
+# -----------------------------
+def iter_table_chunks(path, chunksize=10_000, columns=None, **csv_kwargs):
+    """Yield DataFrames of at most `chunksize` rows without loading the whole table."""
+    found = _existing_path(path)
+    if found is None:
+        raise FileNotFoundError(path)
+
+    if not os.path.isdir(found):
+        if columns is not None:
+            wanted = set(columns)
+            csv_kwargs["usecols"] = lambda c: c in wanted
+        yield from pd.read_csv(found, chunksize=chunksize, **csv_kwargs)
+        return
+
+    pa = _pa()
+    meta_file = pa.parquet.ParquetFile(os.path.join(found, METADATA_FILE))
+    meta_cols = [c for c in meta_file.schema_arrow.names if columns is None or c in columns]
+    wanted_text = [c for c in TRANSCRIPT_COLUMNS if columns is None or c in columns]
+    text_path = os.path.join(found, TRANSCRIPTS_FILE)
+    text_batches = None
+    if wanted_text and os.path.exists(text_path):
+        text_batches = pa.parquet.ParquetFile(text_path).iter_batches(batch_size=chunksize, columns=wanted_text)
+    pending = None
+
+    for batch in meta_file.iter_batches(batch_size=chunksize, columns=meta_cols):
+        df = batch.to_pandas()
+        if text_batches is not None:
+            # Row groups of the two files need not line up, so slice the
+            # transcript stream to exactly this batch's rows
+            parts, have = [], 0
+            while have < batch.num_rows:
+                if pending is None or pending.num_rows == 0:
+                    pending = next(text_batches)
+                take = min(batch.num_rows - have, pending.num_rows)
+                parts.append(pending.slice(0, take))
+                pending = pending.slice(take)
+                have += take
+            text_df = pa.Table.from_batches(parts).to_pandas()
+            for col in text_df.columns:
+                df[col] = text_df[col].values
+        yield df
+
+
+class TableWriter:
+    """
+    Append rows (lists of dicts) to a table as they arrive; the finished table
+    replaces `path` atomically on close(). CSV streams through the csv module,
+    Parquet writes one row group per write_rows() call. If the `with` block
+    raises, the partial table is discarded and `path` keeps its previous contents.
+    """
+
+    def __init__(self, path, columns):
+        self.columns = list(columns)
+        self.target = resolve_path(path)
+        self.rows_written = 0
+        self._temp = self.target + "_temp"
+        self._schema = None
+
+        if STORAGE_FORMAT != "parquet":
+            import csv
+            self._file = open(self._temp, "w", newline="", encoding="utf-8")
+            self._csv = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore", lineterminator=os.linesep)
+            self._csv.writeheader()
+        else:
+            shutil.rmtree(self._temp, ignore_errors=True)
+            os.makedirs(self._temp)
+            self._meta_writer = None
+            self._text_writer = None
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        self.rows_written += len(rows)
+        if STORAGE_FORMAT != "parquet":
+            self._csv.writerows(rows)
+            self._file.flush()
+            return
+
+        pa = _pa()
+        table = pa.Table.from_pylist([{c: r.get(c) for c in self.columns} for r in rows])
+        if self._schema is None:
+            # Columns that are all-null in the first batch are typed as strings
+            self._schema = pa.schema([
+                pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type) for f in table.schema
+            ])
+        table = table.cast(self._schema)
+        meta, text = _split(table)
+        pq = pa.parquet
+        if self._meta_writer is None:
+            self._meta_writer = pq.ParquetWriter(os.path.join(self._temp, METADATA_FILE), meta.schema, compression=COMPRESSION)
+            if text is not None:
+                self._text_writer = pq.ParquetWriter(os.path.join(self._temp, TRANSCRIPTS_FILE), text.schema, compression=COMPRESSION)
+        self._meta_writer.write_table(meta)
+        if self._text_writer is not None:
+            self._text_writer.write_table(text)
+
+    def write_frame(self, df):
+        """write_rows() for a DataFrame chunk; NaN cells are written as empty / null."""
+        self.write_rows(df.astype(object).where(df.notna(), None).to_dict("records"))
+
+    def close(self):
+        if STORAGE_FORMAT != "parquet":
+            self._file.close()
+            os.replace(self._temp, self.target)
+            return self.target
+
+        if self._meta_writer is None:
+            # No rows: still produce a valid (empty) dataset with the declared columns
+            save_table(pd.DataFrame(columns=self.columns), self.target)
+            shutil.rmtree(self._temp, ignore_errors=True)
+            return self.target
+        self._meta_writer.close()
+        if self._text_writer is not None:
+            self._text_writer.close()
+        _swap_dir(self._temp, self.target)
+        return self.target
+
+    def abort(self):
+        """Drop everything written so far; `path` is left untouched."""
+        if STORAGE_FORMAT != "parquet":
+            self._file.close()
+            if os.path.exists(self._temp):
+                os.remove(self._temp)
+            return
+        for parquet_writer in (self._meta_writer, self._text_writer):
+            if parquet_writer is not None:
+                parquet_writer.close()
+        shutil.rmtree(self._temp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:   # keep the previous table if writing failed
+            self.abort()
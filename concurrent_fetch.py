@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class FetchStopped(Exception):
+    """Raised inside a worker when the run is stopping and no more requests may start."""
+
+
+# -----------------------------
+# Shared token-bucket rate limiter
+# -----------------------------
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be > 0 requests per second")
+        self.rate = float(rate)
+        self.capacity = float(max(1, capacity))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, stop_event=None):
+        """Block until `tokens` are available. Returns False if `stop_event` fires first."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_for = (tokens - self._tokens) / self.rate
+
+            if stop_event is None:
+                time.sleep(wait_for)
+            elif stop_event.wait(wait_for):
+                return False
+
+
+# -----------------------------
+# Thread pool runner
+# -----------------------------
+_DONE = object()
+
+
+def fetch_concurrently(items, fetch_one, workers=4, stop_event=None):
+    """
+    Run fetch_one(item) on a pool of `workers` threads and yield (item, result)
+    as each call finishes. At most 2 * workers calls are queued at a time, so
+    large backlogs do not create thousands of pending futures.
+
+    Setting `stop_event` (or closing the generator) stops new submissions;
+    calls already running are allowed to finish.
+    """
+    stop_event = stop_event or threading.Event()
+    items = iter(items)
+    max_pending = max(1, workers) * 2
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    pending = {}
+    try:
+        while True:
+            while not stop_event.is_set() and len(pending) < max_pending:
+                item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                pending[executor.submit(fetch_one, item)] = item
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,185 @@
+"""
+Crawl many channels in parallel into one de-duplicated dataset.
+
+    python crawl_channels.py UCxxxx UCyyyy ...
+    python crawl_channels.py --file channels.txt
+
+API keys come from API_KEYS (comma-separated) in .env, falling back to API_KEY.
+Each channel is assigned to the key with the most quota left for the day;
+channels that no key can afford today are written to deferred_channels.txt.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+from quota_scheduler import QuotaScheduler, estimate_channel_cost, UNIT_COSTS
+
+# -----------------------------
+# Config
+# -----------------------------
+output_csv = "all_channels_videos.csv"
+parts_dir = "channel_parts"          # one CSV per crawled channel, merged at the end
+deferred_path = "deferred_channels.txt"
+usage_path = "quota_usage.json"
+cache_path = "api_cache.sqlite"
+PROCESSES = 4           # channels crawled at the same time
+THREADS_PER_CHANNEL = 4  # concurrent videos().list batches inside each channel
+
+
+def read_channel_ids(args):
+    ids = list(args.channel_ids)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            ids += [line.split("#")[0].strip() for line in f]
+    return list(dict.fromkeys(i for i in ids if i))
+
+
+class CrawlFailed(Exception):
+    """A channel crawl that raised, with the units it had spent by then."""
+
+    def __init__(self, error, units):
+        super().__init__(error, units)
+        self.error, self.units = error, units
+
+    def __str__(self):
+        return self.error
+
+
+def crawl_one(channel_info, playlist_id, api_key, part_path):
+    """Process-pool worker: full crawl of one channel into its own part file."""
+    from response_cache import ResponseCache
+    from channel_crawler import build_client, crawl_channel
+
+    cache = ResponseCache(cache_path)
+    progress = {"written": 0}
+    try:
+        youtube = build_client(api_key, cache)
+        written, newest = crawl_channel(
+            youtube, api_key, channel_info, playlist_id, part_path,
+            workers=THREADS_PER_CHANNEL, cache=cache, progress=progress
+        )
+    except Exception as e:
+        # Pages up to the failure were billed: at least one playlist page and one batch
+        raise CrawlFailed(str(e), estimate_channel_cost(progress["written"]))
+    finally:
+        cache.close()
+    return channel_info["channel_id"], written, estimate_channel_cost(written)
+
+
+def merge_parts(part_paths, output_csv):
+    """
+    Stream the part files (newest crawl wins) and then the previous combined
+    table into a new combined table, keeping the first row seen for each video id.
+    """
+    from columnar_store import TableWriter, iter_table_chunks, table_exists
+    from channel_crawler import VIDEO_COLUMNS
+    from streaming import SeenHashes, row_hashes
+
+    seen = SeenHashes()   # 8 bytes per video id
+    sources = list(part_paths) + ([output_csv] if table_exists(output_csv) else [])
+    with TableWriter(output_csv, VIDEO_COLUMNS) as writer:
+        for path in sources:
+            for chunk in iter_table_chunks(path, dtype={"id": str}):
+                writer.write_frame(chunk[seen.add_new(row_hashes(chunk[["id"]]))])
+    return len(seen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl many YouTube channels into one dataset")
+    parser.add_argument("channel_ids", nargs="*", help="channel ids (UC...)")
+    parser.add_argument("--file", help="text file with one channel id per line")
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_keys = [k.strip() for k in (os.getenv("API_KEYS") or os.getenv("API_KEY") or "").split(",") if k.strip()]
+    if not api_keys:
+        raise ValueError("❌ No API key. Add API_KEYS=key1,key2 (or API_KEY=key) to your .env file")
+
+    channel_ids = read_channel_ids(args)
+    if not channel_ids:
+        raise SystemExit("❌ No channel ids given.")
+    print(f"Channels: {len(channel_ids)}, API keys: {len(api_keys)}")
+
+    from response_cache import ResponseCache
+    from channel_crawler import build_client, get_channels_info
+
+    scheduler = QuotaScheduler(api_keys, usage_path)
+
+    # -----------------------------
+    # 1. Channel lookup: 50 channels per call
+    # -----------------------------
+    lookup_units = -(-len(channel_ids) // 50) * UNIT_COSTS["channels.list"]
+    lookup_key = scheduler.reserve(lookup_units)
+    if lookup_key is None:
+        raise SystemExit("❌ All API keys are out of quota for today.")
+    cache = ResponseCache(cache_path)
+    channels = get_channels_info(build_client(lookup_key, cache), channel_ids)
+    cache.close()
+
+    missing = [cid for cid in channel_ids if cid not in channels]
+    for cid in missing:
+        print(f"❌ Channel not found: {cid}")
+
+    # -----------------------------
+    # 2. Schedule: biggest channels first, each on the key with most quota left
+    # -----------------------------
+    os.makedirs(parts_dir, exist_ok=True)
+    jobs, deferred = [], []
+    for cid in sorted(channels, key=lambda c: -int(channels[c][0]["channel_videoCount"] or 0)):
+        channel_info, playlist_id = channels[cid]
+        estimate = estimate_channel_cost(channel_info["channel_videoCount"])
+        api_key = scheduler.reserve(estimate)
+        if api_key is None:
+            deferred.append(cid)
+            continue
+        jobs.append((channel_info, playlist_id, api_key, estimate, os.path.join(parts_dir, f"{cid}.csv")))
+    scheduler.save()
+
+    # -----------------------------
+    # 3. Crawl in a process pool
+    # -----------------------------
+    part_paths = []
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = {
+            pool.submit(crawl_one, channel_info, playlist_id, api_key, part_path): (api_key, estimate, part_path)
+            for channel_info, playlist_id, api_key, estimate, part_path in jobs
+        }
+        for future in as_completed(futures):
+            api_key, estimate, part_path = futures[future]
+            units, ok = estimate, False   # a worker that died without a report keeps its reservation
+            try:
+                cid, written, units = future.result()
+                ok = True
+            except CrawlFailed as e:
+                units = e.units
+                print(f"❌ Crawl failed ({part_path}): {e} (~{units} units spent)")
+            except Exception as e:
+                print(f"❌ Crawl failed ({part_path}): {e}")
+            finally:
+                scheduler.charge(api_key, units - estimate)   # settle the reservation with actual use
+                scheduler.save()
+            if not ok:
+                continue
+            part_paths.append(part_path)
+            print(f"✅ {cid}: {written} videos, ~{units} units")
+
+    # -----------------------------
+    # 4. Combine into one de-duplicated dataset
+    # -----------------------------
+    total = merge_parts(part_paths, output_csv) if part_paths else 0
+
+    with open(deferred_path, "w", encoding="utf-8") as f:
+        f.writelines(cid + "\n" for cid in deferred)
+
+    print(f"\n🎉 {output_csv}: {total} unique videos from {len(part_paths)} channels")
+    if deferred:
+        print(f"⏳ {len(deferred)} channels deferred (quota exhausted), listed in {deferred_path}")
+    for fp, usage in scheduler.summary().items():
+        print(f"   key {fp}: {usage['used']} used, {usage['remaining']} remaining")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
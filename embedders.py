@@ -0,0 +1,119 @@
+"""
+Text embedders for the vector index.
+
+An embedder has a `name` (stored in the index, so queries are embedded the
+same way as the passages), a `version` that changes whenever its output
+would, a `dim`, and embed(texts) -> float32 array (len(texts), dim) with
+L2-normalized rows.
+
+    hashing            offline default: signed feature hashing of unigrams and
+                       bigrams with sublinear tf, no model download
+    st:<model name>    a local sentence-transformers model (optional dependency)
+
+load_embedder(name) turns either spec back into an embedder.
+"""
+import re
+import zlib
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+DEFAULT_EMBEDDER = "hashing"
+HASHING_DIM = 256
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Frequent English words carry little meaning and would dominate hashed vectors
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+um uh yeah like okay oh so gonna going know get got really right
+""".split())
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedding: every unigram and bigram (stopwords
+    dropped) adds +-1 to one of `dim` buckets chosen by crc32, counts are
+    damped with sign(x) * log1p(|x|), rows are L2-normalized. Texts sharing
+    words get high cosine similarity; no training data or network needed.
+    """
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = int(dim)
+        self.name = "hashing" if self.dim == HASHING_DIM else f"hashing:{self.dim}"
+        self.version = f"hashing-v1:{self.dim}"
+        self._codes = {}
+
+    def _code(self, feature):
+        code = self._codes.get(feature)
+        if code is None:
+            h = zlib.crc32(feature.encode("utf-8"))
+            bucket = (h >> 1) % self.dim
+            code = self._codes[feature] = bucket if h & 1 else ~bucket   # ~bucket: same bucket, sign -1
+            if len(self._codes) > 1_000_000:   # bound the memo on huge vocabularies
+                self._codes.clear()
+        return code
+
+    def _features(self, text):
+        words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOPWORDS] if isinstance(text, str) else []
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        rows, codes = [], []
+        for i, text in enumerate(texts):
+            feats = [self._code(f) for f in self._features(text)]
+            codes.extend(feats)
+            rows.extend([i] * len(feats))
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        buckets = np.where(codes >= 0, codes, ~codes)
+        signs = np.where(codes >= 0, 1.0, -1.0)
+        counts = np.bincount(rows * self.dim + buckets, weights=signs,
+                             minlength=len(texts) * self.dim).reshape(len(texts), self.dim)
+        return _normalize_rows(np.sign(counts) * np.log1p(np.abs(counts)))
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model, e.g. "st:all-MiniLM-L6-v2" (loaded when created)."""
+
+    def __init__(self, model_name, batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.name = f"st:{model_name}"
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name)
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+        self.version = f"{self.name}:{self.dim}"
+
+    def embed(self, texts):
+        texts = [t if isinstance(t, str) else "" for t in texts]
+        vectors = self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                     normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def load_embedder(name=DEFAULT_EMBEDDER):
+    """Embedder for a spec: "hashing", "hashing:<dim>" or "st:<sentence-transformers model>"."""
+    kind, _, arg = name.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder(int(arg) if arg else HASHING_DIM)
+    if kind == "st":
+        if not arg:
+            raise ValueError("st: needs a model name, e.g. st:all-MiniLM-L6-v2")
+        try:
+            return SentenceTransformerEmbedder(arg)
+        except ImportError:
+            raise ImportError("st: embedders need sentence-transformers: pip install sentence-transformers")
+    raise ValueError(f"Unknown embedder: {name}")
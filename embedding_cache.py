@@ -0,0 +1,153 @@
+"""
+Persistent cache of text embeddings, so rebuilding the vector index only
+embeds passages that are new or changed.
+
+    cache = EmbeddingCache("embedding_cache.sqlite")
+    embedder = CachedEmbedder(load_embedder("hashing"), cache)
+    embedder.embed(["passage text", ...])   # cached rows come from SQLite
+
+Key: blake2b (16 bytes) of the embedder version and the text, so a new model
+or an edited passage misses and stale vectors are never served.
+
+Size bound: the summed size of the stored float32 vectors is kept under
+max_bytes (DEFAULT_MAX_BYTES). Lookups stamp entries as used; once an insert
+passes the bound, the least recently used entries are deleted until the cache
+is back under 90% of it.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB, ~2M 256-dim vectors
+SQL_BATCH = 500                             # keys per IN (...) lookup, under SQLite's variable limit
+
+
+def embedding_key(version, text):
+    """Cache key: the embedder version plus the exact (cleaned) text, so a new model or edited passage misses."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(version.encode("utf-8"))
+    h.update(b"\0")
+    h.update((text if isinstance(text, str) else "").encode("utf-8"))
+    return h.digest()
+
+
+# -----------------------------
+# SQLite-backed LRU store
+# -----------------------------
+class EmbeddingCache:
+    """
+    Persistent text -> vector cache (float32 blobs). Like ResponseCache, the
+    least recently used entries are evicted once the total size passes `max_bytes`.
+    """
+
+    def __init__(self, path="embedding_cache.sqlite", max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, accessed REAL, size INTEGER, vector BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings(accessed)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys):
+        """{key: float32 vector} for the keys that are cached; marks them as recently used."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), SQL_BATCH):
+                batch = keys[start:start + SQL_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[bytes(key)] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._db.executemany("UPDATE embeddings SET accessed = ? WHERE key = ?", [(now, k) for k in found])
+                self._db.commit()
+        return found
+
+    def put_many(self, keys, vectors):
+        now = time.time()
+        rows = [(key, now, vector.nbytes, np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+                for key, vector in zip(keys, vectors)]
+        with self._lock:
+            # Keys already cached are left alone; every vector of one batch has the same size
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            if rows:
+                self._total += (self._db.total_changes - before) * rows[0][2]
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        while self._total > target:
+            rows = self._db.execute("SELECT key, size FROM embeddings ORDER BY accessed LIMIT 1000").fetchall()
+            if not rows:
+                self._total = 0
+                return
+            self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k, _ in rows])
+            self._total -= sum(size for _, size in rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -----------------------------
+# Embedder wrapper
+# -----------------------------
+class CachedEmbedder:
+    """
+    Wraps an embedder: embed() answers from the cache and sends only new or
+    changed texts to the model. Duplicate texts within a batch are embedded once.
+    `hits` / `misses` count texts served from / added to the cache.
+    """
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.name, self.version, self.dim = embedder.name, embedder.version, embedder.dim
+        self.hits = self.misses = 0
+
+    def embed(self, texts):
+        keys = [embedding_key(self.version, t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+
+        todo = {}   # key -> first text with that key
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        if todo:
+            vectors = np.asarray(self.embedder.embed(list(todo.values())), dtype=np.float32)
+            self.cache.put_many(list(todo), vectors)
+            found.update(zip(todo, vectors))
+
+        self.misses += len(todo)
+        self.hits += len(texts) - len(todo)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            out[i] = found[key]
+        return out
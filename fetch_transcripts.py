@@ -1,110 +1,175 @@
-import os
-import pandas as pd
+import sys
+import threading
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-from youtube_transcript_api.formatters import TextFormatter
-import time
-import random
+from concurrent_fetch import TokenBucket, FetchStopped, fetch_concurrently
+from response_cache import ResponseCache, CachedSession, CacheMiss
+from checkpoint_journal import Journal, replay, reset, is_empty
+from columnar_store import storage_paths
+from catalog import Catalog
+from segments import Segments
+from run_stamps import write_stamp
 
 # --- Config ---
 csv_path = "youtube_50_videos.csv"
 output_path = "transcripts_output.csv"
 failed_path = "failed_videos.csv"
-MIN_DELAY = 5
-MAX_DELAY = 15
-
-# --- Load dataset ---
-df = pd.read_csv(csv_path)
-all_video_ids = df['id'].dropna().unique().tolist()
-print(f"Found {len(all_video_ids)} videos in dataset")
-
-def safe_read_csv(filepath):
-    """Return an empty DataFrame if file missing or empty, otherwise read CSV."""
-    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-        return pd.DataFrame()
-    try:
-        return pd.read_csv(filepath)
-    except pd.errors.EmptyDataError:
-        # File exists but contains no data/columns
-        return pd.DataFrame()
-
-# --- Load already processed videos ---
-already_fetched = set()
-permanent_failures = set()
-
-if os.path.exists(output_path):
-    existing_df = safe_read_csv(output_path)
-    if not existing_df.empty and 'video_id' in existing_df.columns and 'transcript' in existing_df.columns:
-        success_df = existing_df[existing_df['transcript'].notna() & (existing_df['transcript'] != '')]
-        already_fetched = set(success_df['video_id'].astype(str).tolist())
-        print(f"Already fetched: {len(already_fetched)} videos")
-
-if os.path.exists(failed_path):
-    failed_df = safe_read_csv(failed_path)
-    if not failed_df.empty and 'reason' in failed_df.columns:
-        perm_fail_df = failed_df[failed_df['reason'].isin(['disabled', 'not_found', 'unavailable'])]
-        permanent_failures = set(perm_fail_df['video_id'].astype(str).tolist())
-        print(f"Permanently failed: {len(permanent_failures)} videos")
-
-# --- Filter videos to process ---
-videos_to_process = [
-    vid for vid in all_video_ids 
-    if str(vid) not in already_fetched and str(vid) not in permanent_failures
-]
+journal_path = "transcripts_journal.jsonl"   # append-only progress log, folded into the CSVs by compact()
+PERMANENT_REASONS = ['disabled', 'not_found', 'unavailable']
+WORKERS = 4                 # parallel fetch threads (1 = sequential)
+REQUESTS_PER_SECOND = 0.5   # total network budget shared by all workers (~3 requests per uncached video)
+BURST = 4                   # requests allowed back-to-back before the budget kicks in
+cache_path = "api_cache.sqlite"    # on-disk response cache shared with the metadata crawler
+OFFLINE = "--offline" in sys.argv  # serve transcripts only from the cache
+catalog_path = "catalog.sqlite"    # indexed videos / transcripts / failures; the CSVs are exported from it
+transcript_store_path = "transcript_store"   # compressed transcript text, one record per video
+
+catalog = Catalog(catalog_path, transcript_store_path)
+
+def compact():
+    """Fold the journal into the catalog, re-export transcripts_output.csv / failed_videos.csv, then truncate it."""
+    if is_empty(journal_path):
+        return
+    transcripts = {}
+    failures = {}
+    for rec in replay(journal_path):
+        vid_str = str(rec['video_id'])
+        if 'transcript' in rec:
+            transcripts[vid_str] = rec
+            failures.pop(vid_str, None)
+        else:
+            failures[vid_str] = rec
+
+    # Only the journal's rows touch the database; the CSVs are rewritten for their readers
+    catalog.upsert_transcripts(transcripts.values())
+    catalog.upsert_segments({'video_id': vid, 'segments': Segments.from_record(rec['segments'])}
+                            for vid, rec in transcripts.items() if 'segments' in rec)
+    catalog.record_failures(failures.values())
+    catalog.export_transcripts(output_path)
+    catalog.export_failures(failed_path)
+    reset(journal_path)
+    print(f"Compacted journal: {len(transcripts)} transcripts, {len(failures)} failures")
+
+if '--compact' in sys.argv:
+    compact()
+    exit()
+
+# --- Bring the catalog up to date ---
+# Each file is imported only if something else changed it since the catalog
+# last wrote or read it, so an unchanged dataset costs a few os.stat calls
+for path, kind in [(csv_path, 'videos'), (output_path, 'transcripts'), (failed_path, 'failures')]:
+    imported = catalog.sync_table(path, kind)
+    if imported:
+        print(f"Imported {imported} rows from {path} into the catalog")
+
+# Progress that has not been compacted yet
+compact()
+
+counts = catalog.counts()
+print(f"Catalog: {counts['videos']} videos, {counts['transcripts']} transcripts, {counts['fetch_failures']} failures")
+
+# --- Filter videos to process (an index lookup, not a CSV scan) ---
+videos_to_process = catalog.missing_transcripts(PERMANENT_REASONS)
 print(f"Videos to process: {len(videos_to_process)}")
 
 if len(videos_to_process) == 0:
     print("All videos already processed!")
+    compact()
+    # Closing checkpoints the WAL first, so the stamp sees the catalog's settled size / mtime
+    catalog.close()
+    # Lets `querytube.py transcripts` skip this whole script until an input or the catalog changes
+    write_stamp('transcripts', storage_paths(csv_path, output_path, failed_path) + [journal_path] + catalog.state_paths())
     exit()
 
 # --- Initialize ---
-ytt_api = YouTubeTranscriptApi()
-formatter = TextFormatter()
-
-# initialize the data lists safely
-transcripts_data = safe_read_csv(output_path).to_dict('records') if os.path.exists(output_path) else []
-failed_data = safe_read_csv(failed_path).to_dict('records') if os.path.exists(failed_path) else []
-# --- Load already processed videos ---
-
-# --- Fetch transcripts ---
-for i, vid in enumerate(videos_to_process, start=1):
-    vid_str = str(vid)
-    print(f"[{i}/{len(videos_to_process)}] {vid_str}")
-    
+limiter = TokenBucket(REQUESTS_PER_SECOND, BURST)
+stop_event = threading.Event()
+cache = ResponseCache(cache_path, offline=OFFLINE)
+thread_state = threading.local()
+
+def throttle():
+    """Runs before every network request; cache hits skip it and cost no budget."""
+    if not limiter.acquire(stop_event=stop_event):
+        raise FetchStopped()
+
+def get_api():
+    """YouTubeTranscriptApi is not thread-safe, so every worker gets its own instance."""
+    if not hasattr(thread_state, "api"):
+        thread_state.api = YouTubeTranscriptApi(http_client=CachedSession(cache, before_request=throttle))
+    return thread_state.api
+
+def fetch_one(vid_str):
+    """Fetch one transcript. Returns (status, payload) where payload is (text, Segments) or an error message."""
+    ytt_api = get_api()
     try:
         transcript_list = ytt_api.list(vid_str)
         try:
             transcript = transcript_list.find_manually_created_transcript(['en'])
         except:
             transcript = transcript_list.find_generated_transcript(['en'])
-        
-        transcript_text = formatter.format_transcript(transcript.fetch().snippets)
-        transcripts_data.append({'video_id': vid_str, 'transcript': transcript_text})
-        print(f"   Success ({len(transcript_text)} chars)")
+
+        # Same text TextFormatter produced, plus every snippet's start / duration
+        return 'ok', Segments.from_snippets(transcript.fetch().snippets)
+
+    except (CacheMiss, FetchStopped):
+        return 'stopped', None
 
     except TranscriptsDisabled:
-        print(f"   Transcripts disabled")
-        failed_data.append({'video_id': vid_str, 'reason': 'disabled'})
+        return 'disabled', None
+
+    except VideoUnavailable:
+        return 'unavailable', None
 
     except (NoTranscriptFound, Exception) as e:
         error_msg = str(e).lower()
         if any(x in error_msg for x in ['blocking', 'too many', 'rate limit', 'forbidden', '429']):
-            print(f"   IP blocked - stopping")
-            failed_data.append({'video_id': vid_str, 'reason': 'ip_blocked'})
-            break
-        else:
-            print(f"   Failed: {str(e)[:60]}")
-            failed_data.append({'video_id': vid_str, 'reason': 'not_found'})
+            return 'ip_blocked', str(e)
+        return 'not_found', str(e)
 
-    except VideoUnavailable:
+# Each result is one O(1) journal append instead of rewriting both CSVs
+journal = Journal(journal_path)
+success_count = 0
+failed_count = 0
+
+# --- Fetch transcripts ---
+videos_to_process = [str(vid) for vid in videos_to_process]
+results = fetch_concurrently(videos_to_process, fetch_one, workers=WORKERS, stop_event=stop_event)
+
+for i, (vid_str, (status, payload)) in enumerate(results, start=1):
+    print(f"[{i}/{len(videos_to_process)}] {vid_str}")
+
+    if status == 'stopped':
+        continue
+
+    if status == 'ok':
+        text, segments = payload
+        journal.append({'video_id': vid_str, 'transcript': text, 'segments': segments.to_record()})
+        success_count += 1
+        print(f"   Success ({len(text)} chars, {len(segments)} segments)")
+        continue
+
+    if status == 'disabled':
+        print(f"   Transcripts disabled")
+        journal.append({'video_id': vid_str, 'reason': 'disabled'})
+
+    elif status == 'unavailable':
         print(f"   Video unavailable")
-        failed_data.append({'video_id': vid_str, 'reason': 'unavailable'})
+        journal.append({'video_id': vid_str, 'reason': 'unavailable'})
+
+    elif status == 'ip_blocked':
+        print(f"   IP blocked - stopping")
+        journal.append({'video_id': vid_str, 'reason': 'ip_blocked'})
+        stop_event.set()
+
+    else:
+        print(f"   Failed: {payload[:60]}")
+        journal.append({'video_id': vid_str, 'reason': status})
+
+    failed_count += 1
+
+journal.close()
 
-    # Save progress
-    pd.DataFrame(transcripts_data).to_csv(output_path, index=False, encoding='utf-8')
-    pd.DataFrame(failed_data).to_csv(failed_path, index=False, encoding='utf-8')
-    
-    if i < len(videos_to_process):
-        time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
+# --- Fold the journal into the output CSVs ---
+compact()
 
 # --- Summary ---
-print(f"\nDone. Success: {len(transcripts_data)}, Failed: {len(failed_data)}")
\ No newline at end of file
+print(f"\nDone. Success: {success_count}, Failed: {failed_count}")
\ No newline at end of file
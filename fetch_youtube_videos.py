@@ -1,8 +1,11 @@
-from googleapiclient.discovery import build
 import os
-import pandas as pd
-import isodate
+import sys
 from dotenv import load_dotenv
+from response_cache import ResponseCache
+from channel_crawler import (
+    build_client, get_channel_info, crawl_channel, sync_channel,
+    load_sync_state, save_sync_state, record_watermark
+)
 
 # -----------------------------
 # 0. Load environment variables
@@ -12,6 +15,33 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY")
 CHANNEL_ID = os.getenv("CHANNEL_ID")
 
+output_csv = "youtube_50_videos.csv"  # name kept for downstream scripts; now holds the whole channel
+WORKERS = 4        # concurrent videos().list batches
+MAX_VIDEOS = None  # None = crawl the entire uploads playlist
+
+state_path = "sync_state.json"  # per-channel watermark: newest publishedAt + playlist ETag
+STATS_WINDOW_DAYS = 7           # incremental runs refresh view/like/comment counts only for this window
+FULL_CRAWL = "--full" in sys.argv
+
+cache_path = "api_cache.sqlite"  # on-disk API response cache (per-endpoint TTLs, LRU-bounded)
+OFFLINE = "--offline" in sys.argv  # answer only from the cache, never call the API
+catalog_path = "catalog.sqlite"    # indexed local store of videos / channels / transcripts
+
+
+class LazyCatalog:
+    """Opens the catalog on first use, so a sync with nothing new never imports it (or numpy / the transcript store)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._catalog = None
+
+    def __getattr__(self, name):
+        if self._catalog is None:
+            from catalog import Catalog
+            self._catalog = Catalog(self.path)
+        return getattr(self._catalog, name)
+
+
 print("CHANNEL_ID raw:", repr(CHANNEL_ID))
 
 if not API_KEY:
@@ -25,122 +55,60 @@ print(f"Using CHANNEL_ID: {CHANNEL_ID}")
 # -----------------------------
 # 1. Create YouTube API client
 # -----------------------------
-youtube = build("youtube", "v3", developerKey=API_KEY)
+cache = ResponseCache(cache_path, offline=OFFLINE)
+youtube = build_client(API_KEY, cache)
+catalog = LazyCatalog(catalog_path)
 
 # -----------------------------
 # 2. Fetch CHANNEL Details
 # -----------------------------
-channel_res = youtube.channels().list(
-    part="snippet,statistics,contentDetails",
-    id=CHANNEL_ID
-).execute()
+channel_info, uploads_playlist_id = get_channel_info(youtube, CHANNEL_ID)
 
 # Safety check: Did we actually get a channel?
-if "items" not in channel_res or len(channel_res["items"]) == 0:
+if channel_info is None:
     print("❌ No channel found for this CHANNEL_ID.")
-    print("Raw API response:", channel_res)
+    print("Raw API response:", uploads_playlist_id)
     raise SystemExit("Stopping because YouTube returned 0 results for this channel.")
 
-channel_data = channel_res["items"][0]
-
-channel_info = {
-    "channel_id": CHANNEL_ID,
-    "channel_title": channel_data["snippet"]["title"],
-    "channel_description": channel_data["snippet"].get("description"),
-    "channel_country": channel_data["snippet"].get("country"),
-    "channel_thumbnail": channel_data["snippet"]["thumbnails"]["default"]["url"],
-    "channel_subscriber": channel_data["statistics"].get("subscriberCount"),
-    "channel_videoCount": channel_data["statistics"].get("videoCount")
-}
-
-uploads_playlist_id = channel_data["contentDetails"]["relatedPlaylists"]["uploads"]
-
 print(f"✅ Channel found: {channel_info['channel_title']}")
 print(f"Uploads playlist ID: {uploads_playlist_id}")
 
 # ------------------------------------
-# 3. Fetch up to 50 videos from uploads
+# 3a. Incremental sync: only uploads newer than the
+#     stored watermark + stats for recent videos
 # ------------------------------------
-playlist_res = youtube.playlistItems().list(
-    part="snippet",
-    playlistId=uploads_playlist_id,
-    maxResults=50
-).execute()
-
-video_ids = []
-for item in playlist_res.get("items", []):
-    vid = item["snippet"]["resourceId"]["videoId"]
-    video_ids.append(vid)
-
-if not video_ids:
-    raise SystemExit("❌ No videos found in the uploads playlist.")
-
-print(f"✅ Fetched {len(video_ids)} video IDs from playlist.")
+state = load_sync_state(state_path)
+
+if not FULL_CRAWL and CHANNEL_ID in state and os.path.exists(output_csv):
+    new_count, refreshed = sync_channel(
+        youtube, API_KEY, channel_info, uploads_playlist_id, output_csv, state,
+        stats_window_days=STATS_WINDOW_DAYS, workers=WORKERS, cache=cache, catalog=catalog
+    )
+    if new_count or refreshed:   # the CSV was rewritten
+        catalog.mark_synced(output_csv, "videos")
+    save_sync_state(state, state_path)
+    print(f"✅ Incremental sync: {new_count} new videos, {refreshed} stats refreshed.")
+    print(f"\n🎉 CSV updated: {output_csv}")
+    raise SystemExit(0)
 
 # ------------------------------------
-# 4. Fetch VIDEO DETAILS + STATS
+# 3b. Full crawl: paginate the playlist,
+#     fetch details in concurrent 50-id batches,
+#     stream rows to CSV as they arrive
 # ------------------------------------
-videos_res = youtube.videos().list(
-    part="snippet,contentDetails,statistics,status",
-    id=",".join(video_ids)
-).execute()
-
-final_data = []
-
-for v in videos_res.get("items", []):
-    snippet = v["snippet"]
-    stats = v.get("statistics", {})
-    content = v["contentDetails"]
-    status = v.get("status", {})
-
-    # Parse duration (ISO → seconds)
-    duration_iso = content.get("duration")
-    duration_seconds = None
-    if duration_iso:
-        try:
-            duration_seconds = int(isodate.parse_duration(duration_iso).total_seconds())
-        except Exception:
-            duration_seconds = None
-
-    video_record = {
-        "id": v["id"],
-        "title": snippet.get("title"),
-        "description": snippet.get("description"),
-        "publishedAt": snippet.get("publishedAt"),
-        "tags": ",".join(snippet.get("tags", [])),
-        "categoryId": snippet.get("categoryId"),
-        "defaultLanguage": snippet.get("defaultLanguage"),
-        "defaultAudioLanguage": snippet.get("defaultAudioLanguage"),
-
-        "thumbnail_default": snippet["thumbnails"]["default"]["url"],
-        "thumbnail_high": snippet["thumbnails"]["high"]["url"],
-
-        "duration": duration_seconds,
-        "privacyStatus": status.get("privacyStatus"),
-
-        "viewCount": stats.get("viewCount"),
-        "likeCount": stats.get("likeCount"),
-        "commentCount": stats.get("commentCount"),
-
-        # Add channel info (duplicated per row for convenience)
-        "channel_id": channel_info["channel_id"],
-        "channel_title": channel_info["channel_title"],
-        "channel_description": channel_info["channel_description"],
-        "channel_country": channel_info["channel_country"],
-        "channel_thumbnail": channel_info["channel_thumbnail"],
-        "channel_subscriber": channel_info["channel_subscriber"],
-        "channel_videoCount": channel_info["channel_videoCount"]
-    }
-
-    final_data.append(video_record)
-
-print(f"✅ Collected details for {len(final_data)} videos.")
+written, newest = crawl_channel(
+    youtube, API_KEY, channel_info, uploads_playlist_id, output_csv,
+    workers=WORKERS, max_videos=MAX_VIDEOS, cache=cache, catalog=catalog
+)
+catalog.mark_synced(output_csv, "videos")
 
-# ------------------------------------
-# 5. Save to CSV
-# ------------------------------------
-output_csv = "youtube_50_videos.csv"
-df = pd.DataFrame(final_data)
-df.to_csv(output_csv, index=False, encoding="utf-8")
+if written == 0:
+    raise SystemExit("❌ No videos found in the uploads playlist.")
+
+# A capped crawl has not seen the whole channel, so it must not set a watermark
+if MAX_VIDEOS is None:
+    record_watermark(state, CHANNEL_ID, uploads_playlist_id, newest)
+    save_sync_state(state, state_path)
 
+print(f"✅ Collected details for {written} videos.")
 print(f"\n🎉 CSV saved successfully: {output_csv}")
@@ -0,0 +1,311 @@
+"""
+Metadata filter index for faceted search (channel, category, language, date,
+duration, views, likes), built from the dataset next to the search indexes.
+
+    build_filter_index("final_merged_output.csv", "filter_index")
+    filters = FilterIndex("filter_index")
+    filters.video_ids(filters.match({"channel_id": "UC...", "publishedAt": ("2024-01-01", None),
+                                     "duration_seconds": (60, 600), "viewCount": (1000, None)}))
+
+A filter maps a field to a value or list of values (categorical fields) or to
+an inclusive (min, max) range with None for an open end (numeric fields).
+Rows are videos in table order.
+
+On-disk layout (one directory, arrays opened with np.load(mmap_mode="r")):
+
+    meta.json                    rows, fields, build time
+    video_ids.npy                video id of every row
+    <numeric>.npy                value per row (float64, NaN = missing); publishedAt as epoch seconds
+    <numeric>.sorted.npy         the non-missing values, ascending     } a range is two binary
+    <numeric>.order.npy          the rows in that order                } searches and one slice
+    <categorical>.keys.npy       distinct values, sorted
+    <categorical>.codes.npy      key number per row (-1 = missing)
+    <categorical>.offsets.npy    rows of key i are rows[offsets[i]:offsets[i+1]]
+    <categorical>.rows.npy       row lists of all keys, ascending within a key
+    <categorical>.bitmaps.npy    packed bitmaps of the frequent keys (>= 1/BITMAP_FRACTION of rows)
+    <categorical>.bitmap_of.npy  bitmap number of every key, -1 for keys kept only as row lists
+
+match() plans before it reads: every predicate's match count is known from
+the offsets or two binary searches. When the most selective predicate keeps at
+most 1/SPARSE_FRACTION of the rows, only its rows are checked against the other
+predicates' per-row values; otherwise the predicates become packed bitmaps
+and are ANDed. Either way the result is the sorted matching rows, which the
+segmented indexes turn into the only rows they score.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+NUMERIC_FIELDS = ["publishedAt", "duration_seconds", "viewCount", "likeCount"]
+CATEGORICAL_FIELDS = ["channel_id", "categoryId", "defaultLanguage"]
+BITMAP_FRACTION = 32   # a key gets a bitmap once a row list of it would be bigger (4-byte rows vs 1 bit)
+SPARSE_FRACTION = 64   # check the other predicates row by row when the best one keeps <= 1/64 of rows
+FORMAT_VERSION = 1
+
+
+def to_epoch(value):
+    """Epoch seconds of an ISO date / datetime string ("2024-01-01", "2024-11-15T12:30:04Z") or a number."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    parsed = datetime.fromisoformat(str(value).strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_filters(options):
+    """
+    Filters from string options (search.py flags, query server parameters): channel,
+    category, language (comma-separated values), after / before (ISO dates),
+    min_duration / max_duration (seconds), min_views, min_likes. Missing or empty
+    options are ignored; a bad number raises ValueError.
+    """
+    get = lambda name: options.get(name) if options.get(name) not in (None, "") else None
+    number = lambda name: None if get(name) is None else float(get(name))
+    filters = {}
+    for field, name in (("channel_id", "channel"), ("categoryId", "category"), ("defaultLanguage", "language")):
+        if get(name) is not None:
+            filters[field] = [v.strip() for v in str(get(name)).split(",") if v.strip()]
+    ranges = {"publishedAt": (get("after"), get("before")),
+              "duration_seconds": (number("min_duration"), number("max_duration")),
+              "viewCount": (number("min_views"), None), "likeCount": (number("min_likes"), None)}
+    for field, (lo, hi) in ranges.items():
+        if lo is not None or hi is not None:
+            if field == "publishedAt":
+                lo, hi = to_epoch(lo), to_epoch(hi)
+            filters[field] = (lo, hi)
+    return filters
+
+
+# -----------------------------
+# Building
+# -----------------------------
+class FilterIndexBuilder:
+    """Collects filter columns chunk by chunk (add_frame), then writes the index directory (finish)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+        self.video_ids = []
+        self.numeric = {f: [] for f in NUMERIC_FIELDS}
+        self.categorical = {f: [] for f in CATEGORICAL_FIELDS}
+
+    def add_frame(self, df):
+        """
+        Add the videos of one chunk (an id column plus any of the filter fields); repeated ids are skipped.
+        Text columns are typed with schema's converters, so counts and dates parse like the typed loaders.
+        """
+        import pandas as pd
+        from normalize import iso_duration_to_seconds
+        from schema import VIDEO_DTYPES, apply_dtypes
+
+        if "id" not in df.columns:
+            raise ValueError("filter index input needs an id column")
+        df = apply_dtypes(df, VIDEO_DTYPES, categorize=False)
+        keep = [isinstance(v, str) and v not in self.seen and not self.seen.add(v) for v in df["id"]]
+        df = df[keep]
+        if df.empty:
+            return
+        self.video_ids.extend(df["id"].tolist())
+        for field in NUMERIC_FIELDS:
+            if field == "publishedAt" and field in df.columns:
+                values = (df[field] - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+            elif field == "duration_seconds" and field not in df.columns and "duration" in df.columns:
+                values = iso_duration_to_seconds(df["duration"])
+            elif field in df.columns:
+                values = df[field]
+            else:
+                values = pd.Series(np.nan, index=df.index)
+            self.numeric[field].append(pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan))
+        for field in CATEGORICAL_FIELDS:
+            values = df[field] if field in df.columns else pd.Series(None, index=df.index, dtype=object)
+            self.categorical[field].extend(v if isinstance(v, str) and v else None for v in values.tolist())
+
+    def finish(self):
+        """Write the index (replacing `path` atomically). Returns the number of rows."""
+        rows = len(self.video_ids)
+        temp = self.path + "_temp"
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+        save = lambda name, values: np.save(os.path.join(temp, name + ".npy"), values)
+        save("video_ids", np.array(self.video_ids, dtype="S"))
+
+        for field, parts in self.numeric.items():
+            values = np.concatenate(parts) if parts else np.empty(0)
+            present = np.flatnonzero(~np.isnan(values))
+            order = present[np.argsort(values[present], kind="stable")]
+            save(field, values)
+            save(field + ".sorted", values[order])
+            save(field + ".order", order.astype(np.uint32))
+
+        for field, values in self.categorical.items():
+            keys = sorted({v for v in values if v is not None})
+            code_of = {k: i for i, k in enumerate(keys)}
+            codes = np.array([code_of[v] if v is not None else -1 for v in values], dtype=np.int32)
+            present = np.flatnonzero(codes >= 0)
+            order = present[np.argsort(codes[present], kind="stable")]
+            counts = np.bincount(codes[present], minlength=len(keys))
+            dense = np.flatnonzero(counts * BITMAP_FRACTION >= rows)
+            bitmap_of = np.full(len(keys), -1, dtype=np.int32)
+            bitmap_of[dense] = np.arange(len(dense))
+            bitmaps = np.zeros((len(dense), (rows + 7) // 8), dtype=np.uint8)
+            for i, key in enumerate(dense.tolist()):
+                bitmaps[i] = np.packbits(codes == key)
+            save(field + ".keys", np.array(keys, dtype="S") if keys else np.empty(0, dtype="S1"))
+            save(field + ".codes", codes)
+            save(field + ".offsets", np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+            save(field + ".rows", order.astype(np.uint32))
+            save(field + ".bitmaps", bitmaps)
+            save(field + ".bitmap_of", bitmap_of)
+
+        with open(os.path.join(temp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "rows": rows, "numeric": NUMERIC_FIELDS,
+                       "categorical": CATEGORICAL_FIELDS, "built": time.time()}, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(temp, self.path)
+        return rows
+
+
+def build_filter_index(table_path, path="filter_index", chunksize=100_000):
+    """Index the filter fields of every video in `table_path`. Returns the number of rows."""
+    from columnar_store import table_columns
+    from schema import iter_videos
+
+    available = set(table_columns(table_path))
+    wanted = ["id", "duration"] + NUMERIC_FIELDS + CATEGORICAL_FIELDS
+    builder = FilterIndexBuilder(path)
+    for videos, _ in iter_videos(table_path, [c for c in wanted if c in available], chunksize):
+        builder.add_frame(videos)
+    return builder.finish()
+
+
+# -----------------------------
+# Matching
+# -----------------------------
+class FilterIndex:
+    """Read-only view of a filter index directory. Every file is mapped when it is opened, so the view
+    stays valid after build_filter_index() replaces the directory."""
+
+    def __init__(self, path="filter_index"):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: filter index format {self.meta.get('format')}, expected {FORMAT_VERSION}; rebuild it")
+        self.rows = self.meta["rows"]
+        names = ["video_ids"]
+        for field in self.meta["numeric"]:
+            names += [field, field + ".sorted", field + ".order"]
+        for field in self.meta["categorical"]:
+            names += [field + s for s in (".keys", ".codes", ".offsets", ".rows", ".bitmaps", ".bitmap_of")]
+        self._arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in names}
+
+    def _load(self, name):
+        return self._arrays[name]
+
+    def __len__(self):
+        return self.rows
+
+    def video_ids(self, rows):
+        """Video ids (bytes) of the given rows."""
+        return self._load("video_ids")[np.asarray(rows, dtype=np.int64)]
+
+    def _predicate(self, field, condition):
+        """(estimated rows, predicate dict) for one filter; the estimate is exact."""
+        if field in self.meta["numeric"]:
+            lo, hi = condition if isinstance(condition, (tuple, list)) else (condition, condition)
+            if field == "publishedAt":
+                lo, hi = to_epoch(lo), to_epoch(hi)
+            ordered = self._load(field + ".sorted")
+            a = 0 if lo is None else int(np.searchsorted(ordered, lo, side="left"))
+            z = len(ordered) if hi is None else int(np.searchsorted(ordered, hi, side="right"))
+            z = max(a, z)
+            return z - a, {"field": field, "kind": "range", "lo": lo, "hi": hi, "slice": (a, z)}
+        if field in self.meta["categorical"]:
+            values = [condition] if isinstance(condition, str) else list(condition)
+            keys = self._load(field + ".keys")
+            # A value longer than the widest key matches nothing; casting it to keys.dtype would cut it to a key
+            width = keys.dtype.itemsize
+            wanted = np.array([v for v in (v.encode("utf-8") for v in values) if len(v) <= width],
+                              dtype=keys.dtype if len(keys) else "S1")
+            pos = np.searchsorted(keys, wanted)
+            found = np.unique(pos[(pos < len(keys)) & (keys[np.minimum(pos, max(len(keys) - 1, 0))] == wanted)]) \
+                if len(keys) else np.empty(0, dtype=np.int64)
+            offsets = self._load(field + ".offsets")
+            count = int((offsets[found + 1] - offsets[found]).sum()) if len(found) else 0
+            return count, {"field": field, "kind": "keys", "keys": found}
+        raise KeyError(f"{field} is not a filter field (numeric: {self.meta['numeric']}, "
+                       f"categorical: {self.meta['categorical']})")
+
+    def plan(self, filters):
+        """Predicates of `filters`, most selective first, each with its exact match count."""
+        predicates = [self._predicate(field, condition) for field, condition in filters.items()
+                      if condition is not None]
+        return sorted(predicates, key=lambda p: p[0])
+
+    def _rows_of(self, predicate):
+        """Sorted rows matching one predicate."""
+        field = predicate["field"]
+        if predicate["kind"] == "range":
+            a, z = predicate["slice"]
+            return np.sort(np.asarray(self._load(field + ".order")[a:z], dtype=np.int64))
+        offsets, rows = self._load(field + ".offsets"), self._load(field + ".rows")
+        parts = [rows[offsets[k]:offsets[k + 1]] for k in predicate["keys"].tolist()]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts).astype(np.int64)) if len(parts) > 1 else np.asarray(parts[0], dtype=np.int64)
+
+    def _check(self, predicate, rows):
+        """Which of `rows` satisfy `predicate`, from its per-row values."""
+        field = predicate["field"]
+        if predicate["kind"] == "range":
+            values = self._load(field)[rows]
+            ok = ~np.isnan(values)
+            if predicate["lo"] is not None:
+                ok &= values >= predicate["lo"]
+            if predicate["hi"] is not None:
+                ok &= values <= predicate["hi"]
+            return ok
+        return np.isin(self._load(field + ".codes")[rows], predicate["keys"])
+
+    def _bitmap(self, predicate):
+        """Packed bitmap (uint8, rows bits) of one predicate."""
+        field = predicate["field"]
+        if predicate["kind"] == "keys":
+            bitmap_of = self._load(field + ".bitmap_of")
+            dense = [int(bitmap_of[k]) for k in predicate["keys"].tolist() if bitmap_of[k] >= 0]
+            if len(dense) == len(predicate["keys"]) and dense:
+                bitmaps = self._load(field + ".bitmaps")
+                return np.bitwise_or.reduce(bitmaps[dense], axis=0) if len(dense) > 1 else np.array(bitmaps[dense[0]])
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[self._rows_of(predicate)] = True
+        return np.packbits(mask)
+
+    def match(self, filters):
+        """Sorted rows (int64) satisfying every filter; all rows when `filters` is empty."""
+        predicates = self.plan(filters)
+        if not predicates:
+            return np.arange(self.rows, dtype=np.int64)
+        if predicates[0][0] == 0:
+            return np.empty(0, dtype=np.int64)
+        if predicates[0][0] * SPARSE_FRACTION <= self.rows or len(predicates) == 1:
+            rows = self._rows_of(predicates[0][1])
+            for _, predicate in predicates[1:]:
+                rows = rows[self._check(predicate, rows)]
+                if not len(rows):
+                    break
+            return rows
+        bits = self._bitmap(predicates[0][1])
+        for _, predicate in predicates[1:]:
+            bits &= self._bitmap(predicate)
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows)).astype(np.int64)
+
+    def match_video_ids(self, filters):
+        """Sorted video ids (bytes) satisfying every filter."""
+        return np.sort(self.video_ids(self.match(filters)))
@@ -0,0 +1,195 @@
+"""
+Hybrid retrieval: BM25 keyword matches fused with embedding similarity.
+
+    hybrid = HybridSearcher(SegmentedSearchIndex("search_index"), SegmentedVectorIndex("vector_index"))
+    hybrid.search("binary search tree", k=10)                    # reciprocal rank fusion
+    hybrid.search("binary search tree", fusion="weighted", rerank=50)
+
+Both retrievers run at the same time (numpy releases the GIL for the heavy
+parts), each returning its best `depth` candidates. Results are per video:
+a video's dense rank and score are those of its best passage, which also
+gives the timestamp to link to.
+
+Fusion:
+    rrf       sum of 1 / (RRF_K + rank) over the two lists (tied scores share a rank)
+    weighted  ALPHA * bm25 / best bm25 + (1 - ALPHA) * cosine
+
+Early termination: candidates start at max(MIN_DEPTH, DEPTH_FACTOR * k) per
+retriever. A video missing from a list can at best sit just below that list's
+last candidate, which bounds the score of every video not (fully) seen. Once
+the k-th fused score is at least that bound, the top k cannot change and the
+search stops; otherwise the depth doubles, up to MAX_DEPTH.
+
+rerank=N re-scores only the fused top N videos (from the candidates already
+fetched; N does not deepen the search) with exact scores: their BM25
+scores (also for videos only the dense list found) and an exact cosine scan
+of just their passages (no IVF approximation), combined by weighted fusion.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+RRF_K = 60           # the usual reciprocal rank fusion constant
+ALPHA = 0.5          # weight of normalized BM25 in weighted fusion
+MIN_DEPTH = 20       # first round of candidates per retriever
+DEPTH_FACTOR = 4     # ... or this many times k
+PASSAGES_PER_VIDEO = 4   # dense candidates are passages: fetch this many per video of depth (k costs a scan little)
+MAX_DEPTH = 1000     # stop deepening here, settled or not
+FUSIONS = ("rrf", "weighted")
+
+
+def competition_ranks(scores):
+    """1-based ranks of scores sorted best first, equal scores sharing the best rank ("1224"), so a
+    rank does not depend on how a retriever broke ties at its cut-off."""
+    ranks = []
+    for i, score in enumerate(scores):
+        ranks.append(ranks[-1] if i and score == scores[i - 1] else i + 1)
+    return ranks
+
+
+class HybridSearcher:
+    """Fuses a SegmentedSearchIndex and a SegmentedVectorIndex (either may be None for a one-sided search)."""
+
+    def __init__(self, lexical, vectors, alpha=ALPHA, rrf_k=RRF_K, nprobe=None):
+        self.lexical, self.vectors = lexical, vectors
+        self.alpha, self.rrf_k, self.nprobe = alpha, rrf_k, nprobe
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid")
+        self.stats = {}   # depth, rounds, candidates and whether the top k settled, for the last search
+
+    # --- candidates ---
+    def _lexical(self, query, depth, allowed):
+        """[(video_id, bm25)] and whether that is every match."""
+        if self.lexical is None:
+            return [], True
+        found = self.lexical.search(query, depth, allowed=allowed)
+        return found, len(found) < depth
+
+    def _dense(self, embedded, depth, allowed):
+        """[(video_id, cosine, best passage)] one entry per video, whether that is every passage, and
+        the score of the last passage fetched (no unseen passage scores higher)."""
+        if self.vectors is None:
+            return [], True, 0.0
+        fetch = depth * PASSAGES_PER_VIDEO
+        segments, [(scores, ranks, rows)] = self.vectors.search_rows(embedded[None, :], fetch, self.nprobe, allowed)
+        video_ids = np.empty(len(rows), dtype=object)
+        for g in np.unique(ranks).tolist():
+            here = ranks == g
+            video_ids[here] = segments[g].video_ids[rows[here]]
+        # Best passage per video: hits are best first, so each video's first hit
+        _, first = np.unique(video_ids.astype("S"), return_index=True)
+        out = []
+        for i in np.sort(first).tolist():
+            item = self.vectors._vectors(segments[ranks[i]].reader).item(int(rows[i]))
+            out.append((item["video_id"], float(scores[i]), dict(item, score=float(scores[i]))))
+        return out, len(rows) < fetch, (float(scores[-1]) if len(rows) else 0.0)
+
+    # --- fusion ---
+    def _fuse(self, lexical, dense, fusion, lex_done=True, dense_done=True, dense_last=0.0):
+        """
+        {video_id: entry} with the fused score of everything seen and its "bound", the
+        most it could reach from the list(s) it is missing from, plus the bound of a
+        video seen in neither list. A list that is done (exhausted) adds nothing more.
+        """
+        lex_ranks = competition_ranks([score for _, score in lexical])
+        dense_ranks = competition_ranks([score for _, score, _ in dense])
+        fused = {}
+        for rank, (vid, score) in zip(lex_ranks, lexical):
+            fused[vid] = {"video_id": vid, "lexical_rank": rank, "lexical_score": score,
+                          "dense_rank": None, "dense_score": None, "passage": None}
+        for rank, (vid, score, hit) in zip(dense_ranks, dense):
+            entry = fused.setdefault(vid, {"video_id": vid, "lexical_rank": None, "lexical_score": None})
+            entry.update(dense_rank=rank, dense_score=score, passage=hit)
+
+        if fusion == "rrf":
+            # An unseen video can tie the last lexical score; its best passage can tie the last one fetched
+            part = lambda rank: 1.0 / (self.rrf_k + rank)
+            lex_next = 0.0 if lex_done else part(lex_ranks[-1])
+            dense_next = 0.0 if dense_done else part(1 + sum(score > dense_last for _, score, _ in dense))
+            for e in fused.values():
+                e["score"] = (part(e["lexical_rank"]) if e["lexical_rank"] else 0.0) \
+                    + (part(e["dense_rank"]) if e["dense_rank"] else 0.0)
+                e["bound"] = e["score"] + (0.0 if e["lexical_rank"] else lex_next) \
+                    + (0.0 if e["dense_rank"] else dense_next)
+        else:
+            best = lexical[0][1] if lexical else 1.0
+            lex = lambda score: self.alpha * score / best
+            cos = lambda score: (1 - self.alpha) * max(score, 0.0)
+            lex_next = 0.0 if lex_done or not lexical else lex(lexical[-1][1])
+            dense_next = 0.0 if dense_done else cos(dense_last)
+            for e in fused.values():
+                e["score"] = (lex(e["lexical_score"]) if e["lexical_rank"] else 0.0) \
+                    + (cos(e["dense_score"]) if e["dense_rank"] else 0.0)
+                e["bound"] = e["score"] + (0.0 if e["lexical_rank"] else lex_next) \
+                    + (0.0 if e["dense_rank"] else dense_next)
+        return fused, lex_next + dense_next
+
+    # --- search ---
+    def search(self, query, k=10, fusion="rrf", rerank=0, allowed=None, embedded=None):
+        """
+        Top `k` videos for `query`, best first: dicts with video_id, score,
+        lexical_rank / lexical_score, dense_rank / dense_score and the best
+        passage (key, start) when the dense list found the video. `allowed`
+        (sorted video id bytes) filters like the indexes' own search; `embedded`
+        is the query vector if the caller already has it.
+        """
+        if fusion not in FUSIONS:
+            raise ValueError(f"fusion must be one of {FUSIONS}")
+        if self.vectors is not None and embedded is None:
+            embedded = np.asarray(self.vectors.embedder.embed([query]), dtype=np.float32)[0]
+        depth, rounds, settled = min(MAX_DEPTH, max(MIN_DEPTH, DEPTH_FACTOR * k)), 0, False
+        lex_done = dense_done = False
+        while True:
+            rounds += 1   # a list that already returned everything is not fetched again
+            lex_job = None if lex_done else self._pool.submit(self._lexical, query, depth, allowed)
+            if not dense_done:
+                dense, dense_done, dense_last = self._dense(embedded, depth, allowed)
+            if lex_job is not None:
+                lexical, lex_done = lex_job.result()
+            fused, unseen = self._fuse(lexical, dense, fusion, lex_done, dense_done, dense_last)
+            ranked = sorted(fused.values(), key=lambda e: (-e["score"], e["video_id"]))
+            if lex_done and dense_done:
+                settled = True
+            elif len(ranked) >= k:   # settled once nothing outside the top k can overtake it
+                settled = ranked[k - 1]["score"] >= max([e["bound"] for e in ranked[k:]] + [unseen])
+            if settled or depth >= MAX_DEPTH:
+                break
+            depth = min(MAX_DEPTH, depth * 2)
+        self.stats = {"depth": depth, "rounds": rounds, "candidates": len(fused), "settled": settled}
+
+        top = ranked[:max(k, rerank)]
+        if rerank:
+            top = self._rerank(query, embedded, top, allowed)
+        return [self._result(e) for e in top[:k]]
+
+    def _rerank(self, query, embedded, top, allowed):
+        """Exact weighted-fusion scores for the `top` entries only."""
+        ids = np.array(sorted(e["video_id"] for e in top), dtype="S")
+        if allowed is not None:
+            ids = ids[np.isin(ids, allowed)]
+        lexical = dict(self.lexical.search(query, len(ids), allowed=ids)) if self.lexical is not None else {}
+        dense = {}
+        if self.vectors is not None:
+            passages = sum(len(seg.rows_of(ids)) for seg in self.vectors.segments)
+            for hit in self.vectors.search_embedded(embedded[None, :], passages, 0, ids)[0]:
+                dense.setdefault(hit["video_id"], hit)   # best passage first
+        best = max(lexical.values(), default=1.0) or 1.0
+        for e in top:
+            hit = dense.get(e["video_id"])
+            e["lexical_score"] = lexical.get(e["video_id"], 0.0)
+            if hit is not None:
+                e["dense_score"], e["passage"] = hit["score"], hit
+            e["score"] = self.alpha * e["lexical_score"] / best + (1 - self.alpha) * max(e["dense_score"] or 0.0, 0.0)
+        return sorted(top, key=lambda e: (-e["score"], e["video_id"]))
+
+    @staticmethod
+    def _result(e):
+        passage = e.get("passage") or {}
+        return {"video_id": e["video_id"], "score": e["score"],
+                "lexical_rank": e["lexical_rank"], "lexical_score": e["lexical_score"],
+                "dense_rank": e.get("dense_rank"), "dense_score": e.get("dense_score"),
+                "key": passage.get("key"), "start": passage.get("start")}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
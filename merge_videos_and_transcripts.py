@@ -1,15 +1,39 @@
+import sys
 import pandas as pd
+from columnar_store import load_table, save_table
+from streaming import grace_left_join
 
 videos_csv = "youtube_50_videos.csv"
 transcripts_csv = "transcripts_output.csv"
 output_csv = "merged_youtube_videos_with_transcripts.csv"
 
+# Catalog mode (--catalog): both files are imported only if changed since the
+# catalog last saw them, and the join runs on the catalog's id indexes
+if "--catalog" in sys.argv:
+    from catalog import Catalog
+    with Catalog() as catalog:
+        for path, kind in [(videos_csv, "videos"), (transcripts_csv, "transcripts")]:
+            imported = catalog.sync_table(path, kind)
+            if imported:
+                print(f"Imported {imported} rows from {path} into the catalog")
+        rows = catalog.export_merged(output_csv)
+    print(f"✅ Merge completed successfully! {rows} rows (catalog)")
+    print(f"👉 Output saved as: {output_csv}")
+    sys.exit(0)
+
+# Streaming mode (--stream): partitioned on-disk join, memory stays flat
+if "--stream" in sys.argv:
+    rows = grace_left_join(videos_csv, transcripts_csv, "id", "video_id", output_csv, dtype=str)
+    print(f"✅ Merge completed successfully! {rows} rows (streaming)")
+    print(f"👉 Output saved as: {output_csv}")
+    sys.exit(0)
+
 # Load videos CSV
-videos_df = pd.read_csv(videos_csv)
+videos_df = load_table(videos_csv)
 print("Videos loaded:", videos_df.shape)
 
 # Load transcript CSV
-transcripts_df = pd.read_csv(transcripts_csv)
+transcripts_df = load_table(transcripts_csv)
 print("Transcripts loaded:", transcripts_df.shape)
 
 # Check columns
@@ -28,7 +52,7 @@ merged_df = pd.merge(
 print("\nMerged shape:", merged_df.shape)
 
 # Save final CSV
-merged_df.to_csv(output_csv, index=False, encoding="utf-8")
+save_table(merged_df, output_csv)
 
 print(f"\n✅ Merge completed successfully!")
 print(f"👉 Output saved as: {output_csv}")
@@ -0,0 +1,213 @@
+"""
+Near-duplicate videos by transcript: MinHash signatures + LSH banding.
+
+    hasher = MinHasher()
+    signatures = np.vstack([hasher.signature(t) for t in transcripts])
+    i, j, similarity = lsh_pairs(signatures)         # pairs with estimated Jaccard, sub-quadratic
+    groups = clusters(len(signatures), i, j)         # cluster number per row
+    collapse(video_ids, signatures, rank_keys)       # {duplicate id: (kept id, similarity)}
+
+A transcript becomes the set of its SHINGLE-word shingles (tokenized like the
+cleaned columns, so raw and cleaned copies agree). Each of NUM_PERM hash
+functions keeps the smallest hash over the set; two signatures agree in a
+position with probability equal to the Jaccard similarity of the sets.
+
+LSH: the signature is cut into BANDS bands of ROWS values; videos sharing any
+whole band land in the same bucket and become candidates, so only similar
+pairs are ever compared (the chance to become a candidate is
+1 - (1 - J**ROWS)**BANDS: ~0.3 at J = 0.6, ~0.98 at J = 0.8). Candidates are
+kept when their signatures agree in at least THRESHOLD of the positions. A
+bucket of s videos is checked as s - 1 pairs against its first member and
+between neighbours, not s**2 / 2, so boilerplate transcripts stay linear.
+
+SignatureCache keeps signatures by video id and transcript fingerprint, so a
+rerun only hashes new or changed transcripts.
+"""
+import os
+import shutil
+import zlib
+import numpy as np
+from search_index import tokenize
+
+# -----------------------------
+# Config
+# -----------------------------
+SHINGLE = 5          # words per shingle
+NUM_PERM = 128       # signature length
+BANDS, ROWS = 16, 8  # BANDS * ROWS == NUM_PERM
+THRESHOLD = 0.8      # estimated Jaccard for a near-duplicate
+MIN_TOKENS = 50      # shorter transcripts are too generic to call duplicates
+_PRIME = (1 << 61) - 1
+_MASK32 = np.uint64(0xFFFFFFFF)
+_BLOCK = 8192        # shingles hashed at a time (NUM_PERM x this uint64 = 8 MB)
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, shingle=SHINGLE, min_tokens=MIN_TOKENS, seed=1):
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and x < 2**32 keep a * x + b below 2**64, so the universal hash needs no bigints
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 60, num_perm, dtype=np.uint64)
+        self.num_perm, self.shingle, self.min_tokens = num_perm, shingle, max(shingle, min_tokens)
+        self._token_hash = {}
+
+    def shingles(self, text):
+        """Distinct 32-bit hashes of the word shingles of `text` (none below min_tokens words)."""
+        tokens = tokenize(text)
+        if len(tokens) < self.min_tokens:
+            return np.empty(0, dtype=np.uint64)
+        cache = self._token_hash
+        if len(cache) > 1_000_000:
+            cache.clear()
+        ids = np.fromiter((cache[t] if t in cache else cache.setdefault(t, zlib.crc32(t.encode("utf-8")))
+                           for t in tokens), dtype=np.uint64, count=len(tokens))
+        n = len(ids) - self.shingle + 1
+        h = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over="ignore"):   # uint64 wrap-around is the point
+            for i in range(self.shingle):
+                h = h * np.uint64(0x100000001B3) ^ ids[i:i + n]
+        return np.unique((h ^ (h >> np.uint64(32))) & _MASK32)
+
+    def signature(self, text):
+        """NUM_PERM uint32 minimum hashes; all 0xFFFFFFFF when `text` has no shingle."""
+        x = self.shingles(text)
+        out = np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint64)
+        for start in range(0, len(x), _BLOCK):
+            hashed = (np.outer(x[start:start + _BLOCK], self.a) + self.b) % np.uint64(_PRIME)
+            np.minimum(out, (hashed & _MASK32).min(axis=0), out=out)
+        return out.astype(np.uint32)
+
+
+def lsh_pairs(signatures, bands=BANDS, rows=ROWS, threshold=THRESHOLD):
+    """
+    Near-duplicate pairs among the rows of `signatures` (n x bands*rows uint32):
+    (i, j, similarity) arrays with i < j, each pair once. Rows that are all
+    0xFFFFFFFF (no shingles) never match.
+    """
+    signatures = np.asarray(signatures, dtype=np.uint32)
+    n = len(signatures)
+    usable = np.flatnonzero(~(signatures == 0xFFFFFFFF).all(axis=1))
+    left, right = [], []
+    for band in range(bands):
+        block = signatures[usable, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(len(usable), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for col in range(rows):
+                key = key * np.uint64(0x9E3779B97F4A7C15) ^ block[:, col]
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        same = np.flatnonzero(key[1:] == key[:-1])   # neighbours in one bucket
+        if not len(same):
+            continue
+        members = usable[order]
+        starts = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+        first = members[starts[np.searchsorted(starts, same, side="right") - 1]]
+        left += [members[same], first]
+        right += [members[same + 1], members[same + 1]]
+    if not left:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    i, j = np.concatenate(left), np.concatenate(right)
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    keep = i != j
+    pairs = np.unique(i[keep] * n + j[keep])
+    i, j = pairs // n, pairs % n
+    similarity = np.empty(len(i))
+    for start in range(0, len(i), 65_536):
+        a, b = i[start:start + 65_536], j[start:start + 65_536]
+        similarity[start:start + 65_536] = (signatures[a] == signatures[b]).mean(axis=1)
+    keep = similarity >= threshold
+    return i[keep], j[keep], similarity[keep]
+
+
+def clusters(n, i, j):
+    """Connected components of the pair graph: a cluster number per row (singletons get their own)."""
+    parent = list(range(n))
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for a, b in zip(np.asarray(i).tolist(), np.asarray(j).tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return np.array([find(x) for x in range(n)])
+
+
+def collapse(video_ids, signatures, rank_keys, threshold=THRESHOLD):
+    """
+    {duplicate video_id: (kept video_id, similarity)} for every near-duplicate
+    cluster; the member with the smallest rank key (e.g. (publishedAt, -views))
+    is kept. Clusters are connected components, so a chain A ~ B ~ C can hold
+    members that are not near-duplicates of each other: only members that agree
+    with the kept video in at least `threshold` of the positions collapse into
+    it, and the rest are clustered again the same way among themselves.
+    Similarity is estimated between the duplicate and the kept video.
+    """
+    if len(video_ids) < 2:
+        return {}
+    signatures = np.asarray(signatures, dtype=np.uint32)
+    i, j, _ = lsh_pairs(signatures, threshold=threshold)
+    if not len(i):
+        return {}
+    group = clusters(len(video_ids), i, j)
+    involved = np.unique(np.concatenate([i, j]))
+    involved = involved[np.argsort(group[involved], kind="stable")]
+    bounds = np.flatnonzero(np.diff(group[involved])) + 1
+    duplicates = {}
+    for members in np.split(involved, bounds):
+        members = np.array(sorted(members.tolist(), key=lambda m: (rank_keys[m], video_ids[m])))
+        while len(members) > 1:
+            kept, rest = members[0], members[1:]
+            similarity = (signatures[rest] == signatures[kept]).mean(axis=1)
+            close = similarity >= threshold
+            for m, sim in zip(rest[close].tolist(), similarity[close].tolist()):
+                duplicates[video_ids[m]] = (video_ids[kept], sim)
+            members = rest[~close]   # still in rank order; the best of them is kept next
+    return duplicates
+
+
+# -----------------------------
+# Signature cache
+# -----------------------------
+class SignatureCache:
+    """
+    Signatures of earlier runs by video id, valid while the transcript
+    fingerprint matches. Saved as a directory of .npy files (ids,
+    fingerprints, signatures) replaced as a whole.
+    """
+
+    def __init__(self, path="minhash_signatures", num_perm=NUM_PERM):
+        self.path = path
+        self.rows = {}
+        self.fingerprints = np.empty(0, dtype=np.uint64)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        if os.path.exists(os.path.join(path, "signatures.npy")):
+            signatures = np.load(os.path.join(path, "signatures.npy"))
+            if signatures.shape[1] == num_perm:
+                ids = np.load(os.path.join(path, "ids.npy"))
+                self.fingerprints = np.load(os.path.join(path, "fingerprints.npy"))
+                self.signatures = signatures
+                self.rows = {v.decode("utf-8"): r for r, v in enumerate(ids.tolist())}
+
+    def get(self, video_id, fingerprint):
+        row = self.rows.get(video_id)
+        if row is None or int(self.fingerprints[row]) != fingerprint:
+            return None
+        return self.signatures[row]
+
+    def save(self, video_ids, fingerprints, signatures):
+        """Replace the cache with exactly these entries (videos no longer in the table drop out)."""
+        temp = self.path + "_temp"
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+        np.save(os.path.join(temp, "ids.npy"), np.array(video_ids, dtype="S") if video_ids else np.empty(0, dtype="S1"))
+        np.save(os.path.join(temp, "fingerprints.npy"), np.asarray(fingerprints, dtype=np.uint64))
+        np.save(os.path.join(temp, "signatures.npy"), np.asarray(signatures, dtype=np.uint32).reshape(-1, self.signatures.shape[1]))
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(temp, self.path)
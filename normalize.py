@@ -0,0 +1,235 @@
+"""
+Column-at-a-time cleaning shared by build_final_dataset.py and untitled3.py.
+
+Each function takes a whole pandas Series and returns exactly what the old
+per-row `.apply(...)` helpers returned (same values, same dtype). Common
+inputs go through vectorized string / regex operations; the rare values the
+fast path does not recognise fall back to the original scalar function, so
+odd inputs keep their old results (or errors).
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Scalar reference implementations (the original per-row helpers)
+# -----------------------------
+def _duration_seconds_basic(duration_str):
+    # untitled3.py, duration conversion cell
+    if pd.isna(duration_str):
+        return 0
+    duration_str = str(duration_str)
+    if duration_str.startswith('PT'):
+        duration_str = duration_str[2:]
+    hours = minutes = seconds = 0
+    if 'H' in duration_str:
+        hours = int(duration_str.split('H')[0])
+        duration_str = duration_str.split('H')[1]
+    if 'M' in duration_str:
+        minutes = int(duration_str.split('M')[0])
+        duration_str = duration_str.split('M')[1]
+    if 'S' in duration_str:
+        seconds = int(duration_str.split('S')[0])
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _duration_seconds_lenient(duration_str):
+    # untitled3.py, final cleaning cell
+    if pd.isna(duration_str):
+        return 0
+    duration_str = str(duration_str).strip()
+    if duration_str.isdigit():
+        return int(duration_str)
+    if duration_str.startswith("PT"):
+        duration_str = duration_str[2:]
+    h = m = s = 0
+    if "H" in duration_str:
+        part = duration_str.split("H")
+        h = int(part[0]) if part[0] else 0
+        duration_str = part[1]
+    if "M" in duration_str:
+        part = duration_str.split("M")
+        m = int(part[0]) if part[0] else 0
+        duration_str = part[1]
+    if "S" in duration_str:
+        part = duration_str.split("S")
+        s = int(part[0]) if part[0] else 0
+    return h * 3600 + m * 60 + s
+
+
+def _duration_seconds_iso(d):
+    # build_final_dataset.py
+    import isodate
+    if pd.isna(d):
+        return None
+    try:
+        return int(isodate.parse_duration(str(d)).total_seconds())
+    except:
+        return None
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+_BASIC_RE = r"^(?:PT)?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$"
+_LENIENT_RE = r"^(?:PT)?(?:(\d*)H)?(?:(\d*)M)?(?:(\d*)S)?$"
+_ISO_RE = r"^P(?:(\d+)D)?T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$"
+
+
+def _as_str(series):
+    """
+    str(x) for every value, like the scalar helpers did. Kept as object dtype:
+    pandas' Arrow-backed strings run regexes with ASCII-only \\w and \\s,
+    which would change the cleaning results for non-English text.
+    """
+    return series.astype(object).map(str).astype(object)
+
+
+def _hms_seconds(parts, day_col=None):
+    """Seconds from str.extract groups (H, M, S[, D]); empty / missing groups count as 0."""
+    nums = parts.replace("", np.nan).astype(float).fillna(0)
+    cols = list(parts.columns)
+    h, m, s = nums[cols[-3]], nums[cols[-2]], nums[cols[-1]]
+    total = h * 3600 + m * 60 + s
+    if day_col is not None:
+        total = total + nums[day_col] * 86400
+    return total
+
+
+def _finish(values, fallback_idx, fallback_values, index, allow_none):
+    """Combine fast-path and fallback results into the dtype `.apply` would have produced."""
+    out = dict(zip(values.index, values.tolist()))
+    out.update(zip(fallback_idx, fallback_values))
+    result = [out[i] for i in index]
+    if allow_none:
+        return pd.Series(result, index=index)   # same inference as apply: ints + None -> float64
+    return pd.Series(result, index=index, dtype="int64")
+
+
+# -----------------------------
+# Durations
+# -----------------------------
+def duration_to_seconds(series, plain_seconds=False):
+    """
+    ISO-8601 "PT#H#M#S" -> seconds, NaN -> 0 (untitled3.py semantics).
+    plain_seconds=True also strips whitespace, reads bare digits as seconds and
+    treats empty components as 0 (the final cleaning cell's variant).
+    """
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    scalar = _duration_seconds_lenient if plain_seconds else _duration_seconds_basic
+    missing = series.isna()
+    text = _as_str(series[~missing])
+    if plain_seconds:
+        text = text.str.strip()
+
+    values = pd.Series(0, index=series.index, dtype=object)
+    if plain_seconds:
+        digits = text.str.fullmatch(r"\d+", na=False)
+        values.loc[digits[digits].index] = text[digits].astype("int64").tolist()
+        text = text[~digits]
+
+    parts = text.str.extract(_LENIENT_RE if plain_seconds else _BASIC_RE)
+    matched = parts.notna().any(axis=1) | text.str.fullmatch(r"(?:PT)?", na=False)
+    fast = parts[matched]
+    if len(fast):
+        values.loc[fast.index] = _hms_seconds(fast).astype("int64").tolist()
+
+    fallback_idx = text.index[~matched]
+    fallback = [scalar(series.loc[i]) for i in fallback_idx]
+    return _finish(values, fallback_idx, fallback, series.index, allow_none=False)
+
+
+def iso_duration_to_seconds(series):
+    """isodate.parse_duration -> whole seconds; NaN or unparseable -> None (build_final_dataset.py semantics)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    missing = series.isna()
+    text = _as_str(series[~missing])
+    values = pd.Series([None] * len(series), index=series.index, dtype=object)
+
+    parts = text.str.extract(_ISO_RE)
+    matched = parts.notna().any(axis=1)
+    fast = parts[matched]
+    if len(fast):
+        values.loc[fast.index] = _hms_seconds(fast, day_col=0).astype("int64").tolist()
+
+    # Anything that cannot start an ISO duration is None without asking isodate
+    rest = text[~matched]
+    maybe_iso = rest.str.match(r"^[+-]?P", na=False)
+    fallback_idx = rest.index[maybe_iso]
+    fallback = [_duration_seconds_iso(series.loc[i]) for i in fallback_idx]
+    return _finish(values, fallback_idx, fallback, series.index, allow_none=True)
+
+
+# -----------------------------
+# Text cleaning
+# -----------------------------
+# After lower(), every byte outside [a-z0-9] -- including each byte of a
+# non-ASCII character -- becomes a space; split/join then collapses and strips.
+# Same result as "[^a-z0-9\s] -> space, \s+ -> space, strip", without a regex pass.
+_ALNUM_BYTES = bytes(b if (48 <= b <= 57 or 97 <= b <= 122) else 32 for b in range(256))
+
+
+def _alnum_words(text):
+    return " ".join(text.encode("utf-8", "surrogatepass").translate(_ALNUM_BYTES).decode("ascii").split())
+
+
+def clean_text_alnum(series):
+    """Lowercase, non [a-z0-9] -> space, collapse whitespace; NaN -> "" (build_final_dataset.py)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    missing = series.isna()
+    out = pd.Series("", index=series.index, dtype=object)
+    text = _as_str(series[~missing]).str.lower().map(_alnum_words)
+    out.loc[text.index] = text.tolist()
+    return pd.Series(out.tolist(), index=series.index)
+
+
+_URL_RE = re.compile(r"http\S+|www\S+|https\S+")
+
+
+def clean_text_strip_urls(series):
+    """Drop URLs and special characters, collapse whitespace, lowercase; NaN stays NaN (untitled3.py)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    missing = series.isna()
+    out = series.astype(object).copy()
+    text = _as_str(series[~missing])
+    text = text.str.replace(_URL_RE, "", regex=True)
+    text = text.str.replace(r"[^\w\s.,!?-]", "", regex=True)
+    text = text.str.replace(r"\s+", " ", regex=True).str.strip().str.lower()
+    out.loc[text.index] = text.tolist()
+    return pd.Series(out.tolist(), index=series.index)
+
+
+# -----------------------------
+# Transcript availability flags
+# -----------------------------
+def flag_transcript_yes_no(series):
+    """"no" for NaN / blank / "nan" / "NaN" / "None", else "yes" (untitled3.py merge cell)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    blank = series.isna() | _as_str(series).str.strip().isin(["", "nan", "NaN", "None"])
+    return pd.Series(np.where(blank, "no", "yes").tolist(), index=series.index)
+
+
+def flag_transcript_true_false(series):
+    """"TRUE" only for str values that are not blank / "nan" / "none" (untitled3.py final cell)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    try:
+        is_str = series.str.len().notna()   # the .str accessor yields NaN for non-str cells
+    except AttributeError:
+        is_str = pd.Series(False, index=series.index)   # no str values at all
+    text = series.where(is_str, "").astype(object)
+    available = is_str & ~text.str.strip().isin(["", "nan", "none"])
+    return pd.Series(np.where(available, "TRUE", "FALSE").tolist(), index=series.index)
+
+
+def bool_text_upper(series):
+    """"TRUE" where str(x).strip().lower() == "true", else "FALSE" (untitled3.py TRUE/FALSE cell)."""
+    if series.empty:
+        return series.copy()   # .apply keeps the input dtype on empty input
+    is_true = _as_str(series).str.strip().str.lower().eq("true")
+    return pd.Series(np.where(is_true, "TRUE", "FALSE").tolist(), index=series.index)
@@ -0,0 +1,311 @@
+"""
+Tiny DAG runner for notebook-style pipelines.
+
+    pipe = Pipeline("neso")
+    pipe.source("videos", "/content/live_overflow_videos.csv")
+
+    @pipe.stage(inputs=["videos"], output="/content/videos_converted.csv")
+    def converted(videos):
+        ...
+        return df
+
+    pipe.run()
+
+Stages receive their inputs as DataFrames straight from memory. Each stage
+gets a fingerprint: a hash of its code plus the content hashes of its
+inputs. Its code is the function's source, the plain-data globals it reads
+(e.g. a column list), other functions of its module that it calls, the
+source files of the local modules it uses (normalize.py, sharded_clean.py,
+... and what they use in turn) and anything listed in `deps=`. If the
+fingerprint matches the previous run, the stage is skipped and its cached
+result is loaded only when a downstream stage actually needs it. A stage
+that reruns but produces identical data does not invalidate the stages after
+it. Cached results and output tables are checked by size and mtime: an
+edited cache reruns the stage, an edited or missing output is rewritten.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sys
+import sysconfig
+import time
+import pandas as pd
+from columnar_store import load_table, save_table, storage_paths, table_exists
+
+# -----------------------------
+# Config
+# -----------------------------
+CACHE_DIR = os.path.join(".querytube", "pipeline")
+
+
+# -----------------------------
+# Fingerprints
+# -----------------------------
+def _sha(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def frame_fingerprint(df):
+    """Content hash of a DataFrame: columns, dtypes and every cell."""
+    header = json.dumps([[str(c) for c in df.columns], [str(t) for t in df.dtypes]])
+    return _sha(header, pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+
+_LIBRARY_PATHS = [os.path.realpath(p) + os.sep for p in
+                  {sysconfig.get_paths()[k] for k in ("stdlib", "platstdlib", "purelib", "platlib")}]
+_PLAIN = (str, bytes, int, float, bool, type(None), list, tuple, dict, set, frozenset)
+
+
+def _is_local(path):
+    """True for the project's own files, False for the standard library and installed packages."""
+    path = os.path.realpath(path)
+    return not any(path.startswith(lib) for lib in _LIBRARY_PATHS)
+
+
+def _code_names(code):
+    """Global names a code object (and the functions / comprehensions nested in it) reads."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def _plain_repr(value):
+    """repr() that does not depend on set iteration order."""
+    if isinstance(value, (set, frozenset)):
+        return repr(sorted(_plain_repr(v) for v in value))
+    if isinstance(value, dict):
+        return repr([(_plain_repr(k), _plain_repr(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return repr([_plain_repr(v) for v in value])
+    return repr(value)
+
+
+def code_fingerprint(func, deps=()):
+    """
+    Hash of everything `func` runs: its source, same-module functions it calls,
+    plain-data globals it reads, the source files of local modules it uses
+    (transitively), and `deps` (file paths are hashed by content, other values by repr).
+    """
+    parts, seen = [], set()
+
+    def add_module(module):
+        file = getattr(module, "__file__", None)
+        if module is None or file is None or file in seen or not os.path.exists(file) or not _is_local(file):
+            return
+        seen.add(file)
+        parts.append(_file_sha(file))
+        for value in vars(module).values():
+            add_reference(value, same_module=module)
+
+    def add_function(f):
+        if f in seen:
+            return
+        seen.add(f)
+        try:
+            parts.append(inspect.getsource(f))
+        except (OSError, TypeError):
+            parts.append(_sha(f.__code__.co_code, repr(f.__code__.co_consts)))
+        for name in sorted(_code_names(f.__code__)):
+            if name in f.__globals__:
+                add_reference(f.__globals__[name], same_module=sys.modules.get(f.__module__), name=name)
+
+    def add_reference(value, same_module, name=None):
+        if inspect.ismodule(value):
+            add_module(value)
+        elif inspect.isfunction(value) or inspect.isclass(value):
+            module = sys.modules.get(value.__module__)
+            if module is same_module:
+                # The whole file is hashed when the module is a dependency; a stage's own module is not
+                if name is not None and inspect.isfunction(value):
+                    add_function(value)
+            else:
+                add_module(module)
+        elif name is not None and isinstance(value, _PLAIN):
+            parts.append(f"{name}={_plain_repr(value)}")
+
+    add_function(func)
+    for dep in deps:
+        parts.append(_file_sha(dep) if isinstance(dep, str) and os.path.isfile(dep) else _plain_repr(dep))
+    return _sha(*parts)
+
+
+def _file_sha(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_stats(path):
+    """[file, size, mtime_ns] of every file backing a table or cache file (CSV, Parquet dataset or pickle)."""
+    stats = []
+    for candidate in storage_paths(path):
+        files = ([os.path.join(candidate, n) for n in sorted(os.listdir(candidate))]
+                 if os.path.isdir(candidate) else [candidate] if os.path.exists(candidate) else [])
+        for file in files:
+            st = os.stat(file)
+            stats.append([file, st.st_size, st.st_mtime_ns])
+    return stats
+
+
+# -----------------------------
+# Stages
+# -----------------------------
+class Stage:
+    def __init__(self, name, func, inputs=(), output=None, deps=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.output = output   # optional table written after every (re)run
+        self.deps = list(deps) # extra files / values the stage depends on (e.g. a lookup CSV, a version)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs})"
+
+
+class Pipeline:
+    """Named stages plus source tables, run in dependency order with result caching."""
+
+    def __init__(self, name, cache_dir=CACHE_DIR):
+        self.name = name
+        self.cache_dir = os.path.join(cache_dir, name)
+        self.manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self.sources = {}
+        self.stages = {}
+
+    # ---- declaration ----
+    def source(self, name, path):
+        """A table on disk; its fingerprint is the hash of the stored bytes."""
+        self.sources[name] = path
+
+    def add(self, name, func, inputs=(), output=None, deps=()):
+        if name in self.stages or name in self.sources:
+            raise ValueError(f"Duplicate stage name: {name}")
+        self.stages[name] = Stage(name, func, inputs, output, deps)
+        return func
+
+    def stage(self, inputs=(), output=None, name=None, deps=()):
+        """Decorator form of add(); the stage is named after the function."""
+        def register(func):
+            return self.add(name or func.__name__, func, inputs, output, deps)
+        return register
+
+    # ---- planning ----
+    def order(self, targets=None):
+        """Stages needed for `targets` (default: all), dependencies first."""
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in self.sources or name in ordered:
+                return
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage or source: {name}")
+            if name in visiting:
+                raise ValueError(f"Cycle in pipeline at stage: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in targets or self.stages:
+            visit(name)
+        return ordered
+
+    # ---- cache ----
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"stages": {}, "sources": {}}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.manifest_path + "_temp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.manifest_path + "_temp", self.manifest_path)
+
+    def _cache_file(self, name):
+        return os.path.join(self.cache_dir, name + ".pkl")
+
+    def _source_fingerprint(self, path, memo):
+        """sha256 of the table's files; re-hashed only when their size or mtime changed."""
+        parts = []
+        for candidate in storage_paths(path):
+            files = ([os.path.join(candidate, n) for n in sorted(os.listdir(candidate))]
+                     if os.path.isdir(candidate) else [candidate] if os.path.exists(candidate) else [])
+            for file in files:
+                st = os.stat(file)
+                seen = memo.get(file)
+                if not seen or seen[:2] != [st.st_size, st.st_mtime_ns]:
+                    seen = memo[file] = [st.st_size, st.st_mtime_ns, _file_sha(file)]
+                parts.append(seen[2])
+        if not parts:
+            raise FileNotFoundError(path)
+        return _sha(*parts)
+
+    # ---- execution ----
+    def run(self, targets=None, force=False):
+        """Run what is out of date. Returns {stage: "ran" | "cached"}."""
+        manifest = self._load_manifest()
+        plan = self.order(targets)
+        needed = {i for name in plan for i in self.stages[name].inputs if i in self.sources}
+        data_fp = {name: self._source_fingerprint(self.sources[name], manifest["sources"]) for name in needed}
+        values = {}
+
+        def value(name):
+            if name not in values:
+                if name in self.sources:
+                    values[name] = load_table(self.sources[name])
+                else:
+                    values[name] = pd.read_pickle(self._cache_file(name))
+            return values[name]
+
+        report = {}
+        for name in plan:
+            stage = self.stages[name]
+            fingerprint = _sha(code_fingerprint(stage.func, stage.deps), *[data_fp[i] for i in stage.inputs])
+            cached = manifest["stages"].get(name, {})
+            if (not force and cached.get("fingerprint") == fingerprint
+                    and cached.get("cache_stats") == _file_stats(self._cache_file(name))
+                    and os.path.exists(self._cache_file(name))):
+                data_fp[name] = cached["data"]
+                if stage.output and (not table_exists(stage.output)
+                                     or cached.get("output_stats") != _file_stats(stage.output)):
+                    save_table(value(name), stage.output)   # missing or edited since this stage wrote it
+                    cached["output_stats"] = _file_stats(stage.output)
+                    self._save_manifest(manifest)
+                print(f"⏭️  {name}: up to date")
+                report[name] = "cached"
+                continue
+
+            print(f"▶️  {name}")
+            started = time.perf_counter()
+            # Copies, so a stage that edits its input in place cannot change another stage's view
+            result = stage.func(*[value(i).copy() for i in stage.inputs])
+            values[name] = result
+            data_fp[name] = frame_fingerprint(result)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            result.to_pickle(self._cache_file(name) + "_temp")
+            os.replace(self._cache_file(name) + "_temp", self._cache_file(name))
+            if stage.output:
+                save_table(result, stage.output)
+            manifest["stages"][name] = {"fingerprint": fingerprint, "data": data_fp[name], "output": stage.output,
+                                        "cache_stats": _file_stats(self._cache_file(name)),
+                                        "output_stats": _file_stats(stage.output) if stage.output else None}
+            self._save_manifest(manifest)
+            print(f"✅ {name} ({time.perf_counter() - started:.1f}s)")
+            report[name] = "ran"
+
+        self._save_manifest(manifest)
+        return report
@@ -0,0 +1,447 @@
+"""
+Long-running local query server (asyncio, standard library HTTP/1.1).
+
+    python query_server.py [--port 8765]
+    GET /search?q=binary+search+tree&mode=bm25|dense|hybrid[&fusion=rrf|weighted]&page=1&per_page=10
+        [&channel=UC...&category=27&language=en&after=2024-01-01&before=...
+         &min_duration=60&max_duration=600&min_views=1000&min_likes=10]
+    GET /health
+
+The indexes and video metadata are opened once. Queries arriving together
+are collected into micro-batches (up to MAX_BATCH, waiting at most
+BATCH_WINDOW_MS for company) and scored in one worker thread, so dense
+queries share one embedding call and one matrix product per segment, and
+identical queries in a batch are scored once. Filters are matched against
+the filter index, and only the videos they allow are scored. Results are cached
+(LRU with a TTL) by normalized query, mode, filters and depth; query embeddings
+have their own cache. The indexes are refreshed every REFRESH_SECONDS, and the index
+generations are part of every cache key, so updates from update_indexes.py
+show up within seconds and never serve stale cached pages. The video metadata
+is reloaded when its table changes or an index generation moves.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from filter_index import FilterIndex, parse_filters
+from hybrid_search import FUSIONS, HybridSearcher
+from search_index import tokenize
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex
+
+# -----------------------------
+# Config
+# -----------------------------
+HOST, PORT = "127.0.0.1", 8765
+INDEX_PATH = "search_index"
+VECTOR_INDEX_PATH = "vector_index"
+FILTER_INDEX_PATH = "filter_index"
+VIDEOS_PATH = "final_merged_output.csv"   # titles / channels shown with results
+BATCH_WINDOW_MS = 2         # how long the first query of a batch waits for others
+MAX_BATCH = 64
+RESULT_CACHE_SIZE = 10_000  # cached result lists
+EMBEDDING_CACHE_SIZE = 10_000
+CACHE_TTL = 300             # seconds a cached result / embedding stays valid
+REFRESH_SECONDS = 1.0       # how often index manifests are checked for updates
+PAGE_DEPTH = 50             # results are computed in multiples of this, so page 2 reuses page 1's work
+MAX_DEPTH = 1000
+MODES = ("bm25", "dense", "hybrid")
+
+
+class TTLCache:
+    """LRU mapping whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries, self.ttl = max_entries, ttl
+        self._data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Result cache key; queries of a batch with equal facets share one filter match and one dense search
+CacheKey = namedtuple("CacheKey", "mode query depth generation videos_version facets")
+
+
+def normalize_query(query, mode):
+    """Cache key text: BM25 only sees tokens; embedders (dense, hybrid) get lowercased, whitespace-collapsed text."""
+    return " ".join(tokenize(query)) if mode == "bm25" else " ".join(query.lower().split())
+
+
+class VideoMetadata:
+    """
+    title / channel_title / publishedAt per video id, for display. Kept in schema's
+    typed columns (Arrow strings, channel titles once per channel) instead of a
+    Python dict per video.
+    """
+
+    def __init__(self, videos=None, channels=None):
+        self._ids = self._titles = self._published = self._channel_ids = None
+        self._channel_titles = {}
+        if videos is None or videos.empty:
+            return
+        videos = videos.dropna(subset=["id"]).drop_duplicates(subset="id", keep="first").set_index("id")
+        self._ids = videos.index
+        self._titles = videos["title"].array if "title" in videos else None
+        self._published = videos["publishedAt"].array if "publishedAt" in videos else None
+        self._channel_ids = videos["channel_id"].array if "channel_id" in videos else None
+        if channels is not None and "channel_title" in channels:
+            self._channel_titles = {k: v for k, v in zip(channels["channel_id"], channels["channel_title"])
+                                    if isinstance(v, str)}
+
+    def __len__(self):
+        return 0 if self._ids is None else len(self._ids)
+
+    def get(self, video_id, default=None):
+        if self._ids is None or video_id not in self._ids:
+            return default
+        row = self._ids.get_loc(video_id)
+        text = lambda values: values[row] if values is not None and isinstance(values[row], str) else None
+        published = self._published[row] if self._published is not None else None
+        return {"title": text(self._titles),
+                "channel_title": self._channel_titles.get(text(self._channel_ids)),
+                "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ") if published is not None and published == published else None}
+
+
+def table_signature(path):
+    """[file, size, mtime_ns] of every file backing a table (CSV or Parquet dataset), to notice rewrites."""
+    from columnar_store import storage_paths
+
+    sig = []
+    for candidate in storage_paths(path):
+        files = ([os.path.join(candidate, n) for n in sorted(os.listdir(candidate))]
+                 if os.path.isdir(candidate) else [candidate] if os.path.exists(candidate) else [])
+        for file in files:
+            st = os.stat(file)
+            sig.append([file, st.st_size, st.st_mtime_ns])
+    return sig
+
+
+def load_videos(path):
+    """Display metadata of the video table at `path` (see VideoMetadata); empty if the table is missing."""
+    if not os.path.exists(path):
+        return VideoMetadata()
+    from columnar_store import table_columns
+    from schema import load_videos as load_typed
+
+    available = set(table_columns(path))
+    videos, channels = load_typed(path, columns=[c for c in ["id", "title", "publishedAt", "channel_id", "channel_title"]
+                                                 if c in available])
+    return VideoMetadata(videos, channels)
+
+
+# -----------------------------
+# Query service
+# -----------------------------
+class QueryService:
+    def __init__(self, index_path=INDEX_PATH, vector_index_path=VECTOR_INDEX_PATH, videos_path=VIDEOS_PATH,
+                 filter_index_path=FILTER_INDEX_PATH, batch_window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH,
+                 cache_size=RESULT_CACHE_SIZE):
+        self.indexes = {}
+        if os.path.exists(index_path):
+            self.indexes["bm25"] = SegmentedSearchIndex(index_path)
+        if os.path.exists(vector_index_path):
+            self.indexes["dense"] = SegmentedVectorIndex(vector_index_path)
+        if not self.indexes:
+            raise FileNotFoundError(f"Neither {index_path} nor {vector_index_path} exists - build an index first")
+        self.hybrid = None
+        if len(self.indexes) == 2:
+            self.hybrid = HybridSearcher(self.indexes["bm25"], self.indexes["dense"])
+        self.videos_path = videos_path
+        self._videos_seen = (table_signature(videos_path), self._generations())
+        self.videos = load_videos(videos_path)
+        self.videos_version = 0   # bumped on every reload; part of the cache key, since results carry titles
+        self.filter_index_path = filter_index_path
+        self.filters = FilterIndex(filter_index_path) if os.path.exists(filter_index_path) else None
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.results = TTLCache(cache_size, CACHE_TTL)
+        self.embeddings = TTLCache(EMBEDDING_CACHE_SIZE, CACHE_TTL)
+        self.stats = {"queries": 0, "batches": 0, "batched_queries": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")   # numpy does the heavy lifting
+        self._queue = None
+
+    def _generations(self):
+        return tuple(index.generation for index in self.indexes.values())
+
+    def generation(self, mode):
+        if mode.startswith("hybrid"):
+            return self.indexes["bm25"].generation, self.indexes["dense"].generation
+        return self.indexes[mode].generation
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        return [asyncio.create_task(self._batcher()), asyncio.create_task(self._refresher())]
+
+    async def search(self, query, mode="bm25", depth=PAGE_DEPTH, filters=None):
+        """
+        Top `depth` results for `query` among the videos `filters` allow (cached or
+        from the next micro-batch). mode: bm25, dense, or hybrid:<fusion>.
+        """
+        self.stats["queries"] += 1
+        facets = tuple(sorted((field, tuple(value)) for field, value in (filters or {}).items()))
+        if facets:
+            if self.filters is None:
+                raise LookupError("no filter index loaded")
+            facets += (("built", self.filters.meta["built"]),)
+        key = CacheKey(mode, normalize_query(query, mode), depth, self.generation(mode), self.videos_version, facets)
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached, True
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((key, (query, filters or None), future))
+        return await future, False
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.stats["batches"] += 1
+            self.stats["batched_queries"] += len(batch)
+            try:
+                results = await loop.run_in_executor(self._executor, self._score_batch, batch)
+            except Exception as e:   # one bad batch must not stop the server
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for key, _, future in batch:
+                self.results.put(key, results[key])
+                if not future.done():
+                    future.set_result(results[key])
+
+    def _score_batch(self, batch):
+        """{cache key: results} for a batch; runs in the scoring thread."""
+        unique = {}
+        for key, request, _ in batch:
+            unique.setdefault(key, request)
+        allowed = {}   # filter -> matching video ids, matched once per batch
+        for key, (_, filters) in unique.items():
+            if filters and key.facets not in allowed:
+                allowed[key.facets] = self.filters.match_video_ids(filters)
+
+        results = {}
+        dense = [(key, query) for key, (query, _) in unique.items() if key.mode != "bm25"]   # dense and hybrid
+        for key, (query, _) in unique.items():
+            if key.mode == "bm25":
+                results[key] = [self._describe({"video_id": vid, "score": score})
+                                for vid, score in self.indexes["bm25"].search(query, key.depth, allowed.get(key.facets))]
+        if dense:
+            index = self.indexes["dense"]
+            vectors = [self.embeddings.get(key.query) for key, _ in dense]
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            if missing:   # one embedding call for every query the cache did not have
+                for i, v in zip(missing, index.embedder.embed([dense[i][0].query for i in missing])):
+                    vectors[i] = v
+                    self.embeddings.put(dense[i][0].query, v)
+            groups = {}   # dense queries with the same filters share one search
+            for i, (key, query) in enumerate(dense):
+                if key.mode == "dense":
+                    groups.setdefault(key.facets, []).append(i)
+                else:
+                    fusion = key.mode.split(":", 1)[1]
+                    results[key] = [self._describe(hit) for hit in self.hybrid.search(
+                        query, key.depth, fusion, allowed=allowed.get(key.facets), embedded=vectors[i])]
+            for facets, members in groups.items():
+                found = index.search_embedded(np.vstack([vectors[i] for i in members]),
+                                              max(dense[i][0].depth for i in members), allowed=allowed.get(facets))
+                for i, hits in zip(members, found):
+                    results[dense[i][0]] = [self._describe(hit) for hit in hits[:dense[i][0].depth]]
+        return results
+
+    def _describe(self, hit):
+        video = self.videos.get(hit["video_id"], {})
+        url = f"https://www.youtube.com/watch?v={hit['video_id']}"
+        if hit.get("start") is not None:
+            url += f"&t={int(hit['start'])}s"
+        return dict(hit, url=url, **video)
+
+    async def _refresher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            for index in self.indexes.values():
+                try:
+                    await loop.run_in_executor(self._executor, index.refresh)
+                except Exception as e:   # keep serving the last good view
+                    print(f"⚠️  refresh of {index.path} failed: {e}")
+            try:   # update_indexes.py rewrites the filter index as a whole
+                if os.path.exists(self.filter_index_path) and (
+                        self.filters is None or FilterIndex(self.filter_index_path).meta["built"] != self.filters.meta["built"]):
+                    self.filters = FilterIndex(self.filter_index_path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  refresh of {self.filter_index_path} failed: {e}")
+            try:   # the dataset is rewritten along with the indexes; titles of new videos must show up too
+                seen = (table_signature(self.videos_path), self._generations())
+                if seen != self._videos_seen:
+                    # Not on the scoring thread: a full reload should not stall queries
+                    self.videos = await loop.run_in_executor(None, load_videos, self.videos_path)
+                    self.videos_version += 1
+                    self._videos_seen = seen
+            except Exception as e:   # keep serving the last good metadata
+                print(f"⚠️  refresh of {self.videos_path} failed: {e}")
+
+    def health(self):
+        batches = self.stats["batches"] or 1
+        return {
+            "indexes": {mode: {"generation": index.generation, "segments": len(index.segments), "rows": len(index)}
+                        for mode, index in self.indexes.items()},
+            "filters": None if self.filters is None else {"rows": len(self.filters), "built": self.filters.meta["built"]},
+            "queries": self.stats["queries"],
+            "batches": self.stats["batches"],
+            "mean_batch": round(self.stats["batched_queries"] / batches, 2),
+            "result_cache": {"entries": len(self.results), "hits": self.results.hits, "misses": self.results.misses},
+            "embedding_cache": {"entries": len(self.embeddings), "hits": self.embeddings.hits},
+        }
+
+
+# -----------------------------
+# HTTP
+# -----------------------------
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class QueryServer:
+    def __init__(self, service):
+        self.service = service
+
+    async def route(self, method, target):
+        if method != "GET":
+            return 405, {"error": "only GET is supported"}
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return 200, self.service.health()
+        if url.path != "/search":
+            return 404, {"error": f"no route {url.path}"}
+
+        query = params.get("q", "").strip()
+        mode = params.get("mode", "bm25")
+        fusion = params.get("fusion", "rrf")
+        try:
+            page = max(1, int(params.get("page", 1)))
+            per_page = min(100, max(1, int(params.get("per_page", 10))))
+        except ValueError:
+            return 400, {"error": "page and per_page must be integers"}
+        try:
+            filters = parse_filters(params)
+        except ValueError as e:
+            return 400, {"error": f"bad filter: {e}"}
+        if filters and self.service.filters is None:
+            return 503, {"error": "no filter index loaded"}
+        if not query:
+            return 400, {"error": "missing q"}
+        if mode not in MODES:
+            return 400, {"error": f"mode must be one of {MODES}"}
+        if mode == "hybrid":
+            if fusion not in FUSIONS:
+                return 400, {"error": f"fusion must be one of {FUSIONS}"}
+            if self.service.hybrid is None:
+                return 503, {"error": "hybrid search needs both the bm25 and the dense index"}
+        elif mode not in self.service.indexes:
+            return 503, {"error": f"no {mode} index loaded"}
+        end = page * per_page
+        if end > MAX_DEPTH:
+            return 400, {"error": f"results are available up to rank {MAX_DEPTH}"}
+
+        started = time.perf_counter()
+        depth = min(MAX_DEPTH, math.ceil(end / PAGE_DEPTH) * PAGE_DEPTH)
+        results, cached = await self.service.search(query, f"hybrid:{fusion}" if mode == "hybrid" else mode,
+                                                    depth, filters)
+        return 200, {
+            "query": query, "mode": mode, "filters": filters,
+            "page": page, "per_page": per_page,
+            "results": results[end - per_page:end], "has_more": len(results) > end,
+            "cached": cached, "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive, so a client can send many requests."""
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                method, target, version = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0) or 0):
+                    await reader.readexactly(int(headers["content-length"]))
+                try:
+                    status, payload = await self.route(method, target)
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                body = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode("latin-1") + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass   # client went away or sent garbage
+        finally:
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, **service_kwargs):
+    service = QueryService(**service_kwargs)
+    tasks = await service.start()
+    server = await asyncio.start_server(QueryServer(service).handle, host, port, backlog=1024)
+    modes = ", ".join(f"{mode} ({len(index)} rows)" for mode, index in service.indexes.items())
+    print(f"🚀 Serving {modes} on http://{host}:{port}/search?q=...")
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve /search over the BM25 and vector indexes")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS, help="micro-batch wait (0 = none)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--cache-size", type=int, default=RESULT_CACHE_SIZE, help="cached result lists (0 = off)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, batch_window_ms=args.batch_window_ms,
+                          max_batch=args.max_batch, cache_size=args.cache_size))
+    except KeyboardInterrupt:
+        print("👋 Stopped")
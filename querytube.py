@@ -0,0 +1,84 @@
+"""
+QueryTube command line entry point.
+
+    python querytube.py sync [--full] [--offline]
+    python querytube.py crawl-channels [UC... | --file channels.txt]
+    python querytube.py transcripts [--compact] [--offline] [--force]
+    python querytube.py merge-transcripts [--compact] [--offline] [--force]
+    python querytube.py merge
+    python querytube.py build
+    python querytube.py passages [--tokens 128] [--overlap 32]
+    python querytube.py index [final_output.csv]
+    python querytube.py vectors [--dtype float16|int8] [--embedder hashing] [--no-cache]
+    python querytube.py update-index [final_merged_output.csv] [--no-vectors] [--no-merge] [--no-dedup]
+    python querytube.py filters [final_merged_output.csv]
+    python querytube.py ann [--nlist N]
+    python querytube.py bench-ann [--nprobe 1,4,16,64] [--queries 200]
+    python querytube.py search "query words" [-k 10] [--dense [--nprobe 16]] [--channel UC... --after 2024-01-01 ...]
+    python querytube.py search "query words" --hybrid [--fusion rrf|weighted] [--rerank 50]
+    python querytube.py bench-hybrid [--queries 200] [--alpha 0.5]
+    python querytube.py serve [--port 8765] [--batch-window-ms 2]
+    python querytube.py bench-server [--clients 32] [--mode bm25|dense|hybrid]
+
+Only the standard library is imported here. Each command runs its script
+on demand, so pandas / googleapiclient / youtube_transcript_api load only
+when there is real work to do.
+"""
+import argparse
+import os
+import runpy
+import sys
+
+from run_stamps import stamp_matches
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (script, help, stamp name written by the script when it has nothing to do)
+COMMANDS = {
+    "sync": ("fetch_youtube_videos.py", "crawl or incrementally sync channel metadata", None),
+    "crawl-channels": ("crawl_channels.py", "crawl many channels in parallel into one dataset", None),
+    "transcripts": ("fetch_transcripts.py", "fetch missing transcripts into transcripts_output.csv", "transcripts"),
+    "merge-transcripts": ("YT_info.py", "fetch missing transcripts into final_merged_output.csv", "merged_transcripts"),
+    "merge": ("merge_videos_and_transcripts.py", "join video metadata with transcripts", None),
+    "build": ("build_final_dataset.py", "clean and combine datasets into final_output.csv", None),
+    "passages": ("build_passages.py", "cut catalog transcripts into overlapping, time-anchored passages", None),
+    "index": ("build_search_index.py", "build the BM25 search index from final_output.csv", None),
+    "vectors": ("build_vector_index.py", "embed passages and titles into the dense vector index", None),
+    "update-index": ("update_indexes.py", "add new / changed videos to the indexes as segments, drop private ones and near-duplicates", None),
+    "filters": ("build_filter_index.py", "index channel / category / language / date / duration / views for filtered search", None),
+    "ann": ("build_ann_index.py", "cluster large vector index segments into IVF lists for approximate search", None),
+    "bench-ann": ("bench_ann.py", "recall@10 and p50/p99 latency of IVF search vs exact", None),
+    "search": ("search.py", "BM25 (or --dense embedding, or --hybrid fused) search over the indexes", None),
+    "bench-hybrid": ("bench_hybrid.py", "known-item MRR / recall of BM25, dense and hybrid search", None),
+    "serve": ("query_server.py", "serve /search over HTTP with micro-batching and a result cache", None),
+    "bench-server": ("bench_server.py", "load-test the query server: QPS and p50/p99 latency", None),
+    "notebook": ("untitled3.py", "run the Neso Academy notebook stages (cached, only changed stages rerun)", None),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="querytube", description="QueryTube data pipeline")
+    parser.add_argument("command", choices=COMMANDS, help="; ".join(f"{k}: {v[1]}" for k, v in COMMANDS.items()))
+    parser.add_argument("--force", action="store_true", help="skip the 'nothing to do' fast path")
+    args, script_args = parser.parse_known_args(argv)
+
+    script, _, stamp = COMMANDS[args.command]
+
+    # Fast path: inputs unchanged since the last run that found nothing to do
+    if stamp and not args.force and "--compact" not in script_args and stamp_matches(stamp):
+        print(f"{args.command}: nothing to do (inputs unchanged)")
+        return 0
+
+    sys.argv = [script] + script_args
+    try:
+        runpy.run_path(os.path.join(HERE, script), run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:   # Windows: saves in one process are still serialized by the thread lock
+    fcntl = None
+
+# -----------------------------
+# Config
+# -----------------------------
+DAILY_QUOTA = 10_000          # default YouTube Data API units per key per day
+QUOTA_TZ = ZoneInfo("America/Los_Angeles")   # quota resets at midnight Pacific time
+UNIT_COSTS = {"channels.list": 1, "playlistItems.list": 1, "videos.list": 1}
+PAGE_SIZE = 50
+
+
+def key_fingerprint(api_key):
+    """Short stable id for a key, so usage files never contain the key itself."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def estimate_channel_cost(video_count):
+    """Units for a full crawl: one playlistItems page + one videos().list batch per 50 uploads."""
+    pages = max(1, math.ceil(int(video_count or 0) / PAGE_SIZE))
+    return pages * (UNIT_COSTS["playlistItems.list"] + UNIT_COSTS["videos.list"])
+
+
+class QuotaScheduler:
+    """
+    Tracks quota units per API key for the current quota day and hands out the
+    key with the most remaining budget. Usage is persisted to `usage_path`, so
+    separate runs on the same day share one budget: save() adds this run's
+    units since the last save to what the file holds (under an flock), so
+    concurrent runs and other keys' usage are never overwritten.
+    """
+
+    def __init__(self, api_keys, usage_path="quota_usage.json", daily_quota=DAILY_QUOTA):
+        if not api_keys:
+            raise ValueError("At least one API key is required")
+        self.keys = list(dict.fromkeys(api_keys))
+        self.usage_path = usage_path
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._day = datetime.now(QUOTA_TZ).strftime("%Y-%m-%d")
+        self._used = {key_fingerprint(k): 0 for k in self.keys}
+        self._unsaved = {fp: 0 for fp in self._used}   # units this run added since the last save()
+        with self._file_lock():
+            self._merge(self._read())
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.usage_path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        if not os.path.exists(self.usage_path):
+            return {}
+        with open(self.usage_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _merge(self, saved):
+        """Our view = the file's usage for today + what this run has not saved yet."""
+        for fp in self._used:
+            self._used[fp] = saved.get(self._day, {}).get(fp, 0) + self._unsaved[fp]
+
+    def save(self):
+        with self._lock, self._file_lock():
+            saved = self._read()
+            today = saved.setdefault(self._day, {})
+            for fp, units in self._unsaved.items():
+                today[fp] = today.get(fp, 0) + units
+                self._unsaved[fp] = 0
+            self._merge(saved)
+            temp_path = self.usage_path + "_temp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(saved, f, indent=2)
+            os.replace(temp_path, self.usage_path)
+
+    def remaining(self, api_key):
+        return self.daily_quota - self._used[key_fingerprint(api_key)]
+
+    def reserve(self, units):
+        """Pick the key with the most remaining quota and reserve `units` on it. Returns None if no key can afford it."""
+        with self._lock:
+            best = max(self.keys, key=self.remaining)
+            if self.remaining(best) < units:
+                return None
+            self._used[key_fingerprint(best)] += units
+            self._unsaved[key_fingerprint(best)] += units
+            return best
+
+    def charge(self, api_key, units):
+        """Record units spent outside a reservation (or correct one: negative units refund)."""
+        with self._lock:
+            self._used[key_fingerprint(api_key)] += units
+            self._unsaved[key_fingerprint(api_key)] += units
+
+    def summary(self):
+        return {key_fingerprint(k): {"used": self._used[key_fingerprint(k)], "remaining": self.remaining(k)} for k in self.keys}
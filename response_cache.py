@@ -0,0 +1,206 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# -----------------------------
+# Config
+# -----------------------------
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Seconds a cached response stays fresh, by endpoint
+DEFAULT_TTLS = {
+    "youtube.channels.list": DAY,
+    "youtube.playlistItems.list": HOUR,
+    "youtube.videos.list": 6 * HOUR,
+    "transcript": 30 * DAY,   # transcripts rarely change once published
+}
+DEFAULT_TTL = HOUR
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+# Query parameters that change per request but not the response
+VOLATILE_PARAMS = {"key", "expire", "signature", "sparams", "ei", "ip", "ipbits", "opi", "xoaf"}
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+def make_key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part or b"")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def normalize_url(url):
+    """Drop API keys / signatures and sort the query so equivalent requests share a key."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_PARAMS)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}?{urlencode(query)}"
+
+
+# -----------------------------
+# SQLite-backed LRU store
+# -----------------------------
+class ResponseCache:
+    """
+    Persistent response cache. Entries expire per endpoint (`ttls`), and the
+    least recently used ones are evicted once the total body size passes `max_bytes`.
+    With offline=True, callers serve only from the cache and raise CacheMiss otherwise.
+    """
+
+    def __init__(self, path="api_cache.sqlite", max_bytes=DEFAULT_MAX_BYTES, ttls=None, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)  # other processes may hold the write lock
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, endpoint TEXT, created REAL, accessed REAL,"
+            " size INTEGER, meta TEXT, body BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def get(self, endpoint, key):
+        """Return (meta, body) for a fresh entry, else None. Offline mode ignores expiry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT created, meta, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created, meta, body = row
+            if not self.offline and now - created > self.ttl(endpoint):
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(meta), body
+
+    def put(self, endpoint, key, body, meta=None):
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, now, now, len(body), json.dumps(meta or {}), body)
+            )
+            self._total += len(body) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        while self._total > target:
+            rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                self._total = 0
+                return
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in rows])
+            self._total -= sum(size for _, size in rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# -----------------------------
+# googleapiclient integration
+# -----------------------------
+def cached_request_builder(cache):
+    """
+    Return a requestBuilder for googleapiclient's build(): execute() answers from
+    the cache when possible. Conditional (If-None-Match) requests still go to the
+    API unless offline, since their whole point is to ask whether anything changed.
+    """
+    from googleapiclient.http import HttpRequest
+
+    class CachedHttpRequest(HttpRequest):
+        def execute(self, http=None, num_retries=0):
+            endpoint = self.methodId or "youtube"
+            key = make_key(endpoint, self.method, normalize_url(self.uri), self.body)
+            conditional = "If-None-Match" in (self.headers or {})
+
+            if cache.offline or not conditional:
+                hit = cache.get(endpoint, key)
+                if hit is not None:
+                    return json.loads(hit[1])
+                if cache.offline:
+                    raise CacheMiss(f"{endpoint} not cached (offline mode)")
+
+            result = super().execute(http=http, num_retries=num_retries)
+            cache.put(endpoint, key, json.dumps(result).encode("utf-8"))
+            return result
+
+    return CachedHttpRequest
+
+
+# -----------------------------
+# youtube_transcript_api integration
+# -----------------------------
+class CachedSession(requests.Session):
+    """
+    requests.Session for YouTubeTranscriptApi(http_client=...). Successful
+    responses of the watch page, innertube player and timedtext calls are cached,
+    so re-running list()/fetch() for a known video makes no network requests.
+    `before_request` (e.g. a rate limiter) runs only for requests that miss the cache.
+    """
+
+    def __init__(self, cache, endpoint="transcript", before_request=None):
+        super().__init__()
+        self.cache = cache
+        self.endpoint = endpoint
+        self.before_request = before_request
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        payload = kwargs.get("json")
+        if isinstance(data, dict):
+            body = urlencode(sorted(data.items()))
+        elif data is not None:
+            body = data
+        else:
+            body = json.dumps(payload, sort_keys=True) if payload is not None else None
+        key = make_key(self.endpoint, method.upper(), normalize_url(requests.Request(method, url, params=params).prepare().url), body)
+
+        hit = self.cache.get(self.endpoint, key)
+        if hit is not None:
+            meta, content = hit
+            response = requests.Response()
+            response.status_code = meta["status"]
+            response.headers = CaseInsensitiveDict(meta["headers"])
+            response.encoding = meta.get("encoding")
+            response.url = meta.get("url", url)
+            response._content = content
+            return response
+        if self.cache.offline:
+            raise CacheMiss(f"{method} {url} not cached (offline mode)")
+
+        if self.before_request is not None:
+            self.before_request()
+        response = super().request(method, url, params=params, data=data, **kwargs)
+        if response.status_code == 200:
+            meta = {
+                "status": response.status_code,
+                "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+                "encoding": response.encoding,
+                "url": response.url,
+            }
+            self.cache.put(self.endpoint, key, response.content, meta)
+        return response
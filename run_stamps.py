@@ -0,0 +1,44 @@
+import json
+import os
+
+# -----------------------------
+# "Nothing to do" stamps
+# -----------------------------
+# A script that finds no work writes a stamp recording the size and mtime of
+# the files it looked at. As long as none of them change, the CLI can answer
+# "nothing to do" from a few os.stat calls instead of importing pandas and
+# re-reading every CSV. Stdlib only, so checking a stamp stays fast.
+STAMP_DIR = ".querytube"
+
+
+def _signature(paths):
+    sig = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig[path] = [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            sig[path] = None
+    return sig
+
+
+def stamp_path(name, stamp_dir=STAMP_DIR):
+    return os.path.join(stamp_dir, name + ".done.json")
+
+
+def write_stamp(name, paths, stamp_dir=STAMP_DIR):
+    os.makedirs(stamp_dir, exist_ok=True)
+    path = stamp_path(name, stamp_dir)
+    with open(path + "_temp", "w", encoding="utf-8") as f:
+        json.dump(_signature(paths), f)
+    os.replace(path + "_temp", path)
+
+
+def stamp_matches(name, stamp_dir=STAMP_DIR):
+    """True if a stamp exists and every file it recorded is unchanged."""
+    try:
+        with open(stamp_path(name, stamp_dir), encoding="utf-8") as f:
+            recorded = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return bool(recorded) and _signature(recorded) == recorded
@@ -0,0 +1,239 @@
+"""
+Normalized, compactly typed in-memory layout for video metadata.
+
+The CSV files repeat the seven channel_* columns (channel_description
+included) on every video row and keep counts and flags as text. The typed
+loaders here return two frames instead:
+
+    videos    one row per video; channel_id is a categorical key
+    channels  one row per channel_id
+
+Counts are nullable integers, flags are booleans, publishedAt is a UTC
+timestamp, low-cardinality columns are categoricals and free text uses
+Arrow-backed strings (no Python object per cell). with_channels() joins the
+two frames back into the wide layout for code that still expects it.
+filter_index.py (and so update_indexes.py) types its facet columns with
+apply_dtypes, and query_server.py keeps its display metadata in these frames.
+
+    python schema.py youtube_50_videos.csv   # memory: wide CSV frame vs normalized
+"""
+import sys
+import pandas as pd
+from channel_crawler import VIDEO_COLUMNS
+from columnar_store import iter_table_chunks
+
+# -----------------------------
+# Column types
+# -----------------------------
+try:
+    import pyarrow  # noqa: F401
+    STRING = pd.StringDtype("pyarrow")
+except ImportError:
+    STRING = pd.StringDtype()
+
+CHUNK_ROWS = 50_000
+TRUE_TEXT = ["true", "yes", "1"]
+FALSE_TEXT = ["false", "no", "0"]
+
+# Older exports use a different name for the same column
+COLUMN_ALIASES = {"channel_subscriberCount": "channel_subscriber"}
+
+CHANNEL_DTYPES = {
+    "channel_id": STRING,
+    "channel_title": STRING,
+    "channel_description": STRING,
+    "channel_country": "category",
+    "channel_thumbnail": STRING,
+    "channel_subscriber": "Int64",
+    "channel_videoCount": "Int32",
+}
+
+VIDEO_DTYPES = {
+    "id": STRING,
+    "title": STRING,
+    "description": STRING,
+    "publishedAt": "datetime64[ns, UTC]",
+    "tags": STRING,
+    "categoryId": "category",
+    "defaultLanguage": "category",
+    "defaultAudioLanguage": "category",
+    "thumbnail_default": STRING,
+    "thumbnail_high": STRING,
+    "duration": STRING,
+    "duration_seconds": "Int32",
+    "privacyStatus": "category",
+    "viewCount": "Int64",
+    "likeCount": "Int64",
+    "commentCount": "Int64",
+    "channel_id": "category",
+    "is_transcript_available": "boolean",
+    "transcript": STRING,
+}
+
+TRANSCRIPT_DTYPES = {"video_id": STRING, "transcript": STRING}
+
+
+# -----------------------------
+# Converters
+# -----------------------------
+def _to_int(series, dtype):
+    """Numbers or numeric text -> nullable integers; anything else (or a fraction) -> <NA>."""
+    numbers = pd.to_numeric(series, errors="coerce")
+    numbers = numbers.where(numbers % 1 == 0)
+    return numbers.astype(dtype)
+
+
+def _to_bool(series):
+    """True/False, "TRUE"/"FALSE", "yes"/"no", 1/0 -> boolean; anything else -> <NA>."""
+    text = series.astype(STRING).str.strip().str.lower()
+    out = pd.Series(pd.NA, index=series.index, dtype="boolean")
+    out[text.isin(TRUE_TEXT).fillna(False).astype(bool)] = True
+    out[text.isin(FALSE_TEXT).fillna(False).astype(bool)] = False
+    return out
+
+
+def _convert(series, dtype):
+    if dtype == "category":
+        # Strings first, so "27" and 27 (CSV vs Parquet) are the same category
+        return series.astype(STRING) if series.dtype != "category" else series
+    if dtype == "boolean":
+        return _to_bool(series)
+    if dtype in ("Int64", "Int32"):
+        return _to_int(series, dtype)
+    if str(dtype).startswith("datetime64"):
+        return pd.to_datetime(series, utc=True, errors="coerce")
+    return series.astype(dtype)
+
+
+def apply_dtypes(df, dtypes, categorize=True):
+    """
+    Convert the columns of `df` named in `dtypes`; other text columns become
+    STRING. With categorize=False, "category" columns stay STRING, so chunks can
+    be concatenated first and categorized once (see _categorize).
+    """
+    df = df.rename(columns=COLUMN_ALIASES)
+    out = {}
+    for col in df.columns:
+        if col in dtypes:
+            out[col] = _convert(df[col], dtypes[col])
+        elif df[col].dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            out[col] = df[col].astype(STRING)
+        else:
+            out[col] = df[col]
+    df = pd.DataFrame(out, index=df.index)
+    return _categorize(df, dtypes) if categorize else df
+
+
+def _categorize(df, dtypes):
+    for col in df.columns:
+        if dtypes.get(col) == "category" and df[col].dtype != "category":
+            df[col] = df[col].astype("category")
+    return df
+
+
+# -----------------------------
+# Normalize
+# -----------------------------
+def split_channels(df, categorize=True):
+    """
+    Wide video rows (channel_* columns on every row) -> (videos, channels).
+    Each channel keeps its last row, i.e. the most recently appended metadata.
+    """
+    df = df.rename(columns=COLUMN_ALIASES)
+    channel_cols = [c for c in CHANNEL_DTYPES if c in df.columns]
+    if "channel_id" in df.columns:
+        channels = (df[channel_cols].dropna(subset=["channel_id"])
+                    .drop_duplicates(subset="channel_id", keep="last"))
+    else:
+        channels = pd.DataFrame(columns=list(CHANNEL_DTYPES))
+    videos = df.drop(columns=[c for c in channel_cols if c != "channel_id"])
+    return (apply_dtypes(videos, VIDEO_DTYPES, categorize),
+            apply_dtypes(channels, CHANNEL_DTYPES, categorize).reset_index(drop=True))
+
+
+def with_channels(videos, channels):
+    """Join the channel columns back onto each video row (the CSV layout), keeping video order."""
+    key = videos["channel_id"].astype(STRING)
+    wide = pd.merge(videos.assign(channel_id=key), channels.astype({"channel_id": STRING}),
+                    on="channel_id", how="left")
+    wide["channel_id"] = wide["channel_id"].astype(videos["channel_id"].dtype)
+    wide.index = videos.index
+    ordered = [c for c in VIDEO_COLUMNS if c in wide.columns]
+    return wide[ordered + [c for c in wide.columns if c not in ordered]]
+
+
+# -----------------------------
+# Typed loaders
+# -----------------------------
+def iter_videos(path, columns=None, chunksize=CHUNK_ROWS):
+    """(videos, channels) per chunk of a video table, typed but not yet categorized (for streaming consumers)."""
+    for chunk in iter_table_chunks(path, chunksize, columns=columns, dtype=str):
+        yield split_channels(chunk, categorize=False)
+
+
+def load_videos(path, columns=None, chunksize=CHUNK_ROWS):
+    """
+    Read a video table (CSV or Parquet) into (videos, channels). The file is
+    read in chunks and each chunk is typed before the next one is read, so the
+    untyped text frame never exists for the whole table.
+    """
+    video_parts, channel_parts = [], []
+    for videos, channels in iter_videos(path, columns, chunksize):
+        video_parts.append(videos)
+        channel_parts.append(channels)
+    if not video_parts:
+        return split_channels(pd.DataFrame(columns=columns or VIDEO_COLUMNS))
+
+    videos = _categorize(pd.concat(video_parts, ignore_index=True), VIDEO_DTYPES)
+    channels = (pd.concat(channel_parts, ignore_index=True)
+                .drop_duplicates(subset="channel_id", keep="last").reset_index(drop=True))
+    return videos, _categorize(channels, CHANNEL_DTYPES)
+
+
+def load_transcripts(path, chunksize=CHUNK_ROWS):
+    """Read a transcript table (id or video_id + transcript) as STRING columns keyed by video_id."""
+    parts = []
+    for chunk in iter_table_chunks(path, chunksize, dtype=str):
+        chunk = chunk.rename(columns={"id": "video_id"})
+        parts.append(apply_dtypes(chunk[["video_id", "transcript"]], TRANSCRIPT_DTYPES))
+    if not parts:
+        return apply_dtypes(pd.DataFrame(columns=list(TRANSCRIPT_DTYPES)), TRANSCRIPT_DTYPES)
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_catalog(catalog, chunksize=CHUNK_ROWS):
+    """(videos, channels) straight from a catalog.Catalog, whose tables are already normalized."""
+    from catalog import VIDEO_FIELDS
+
+    def select(table, cols):
+        return "SELECT " + ", ".join(f'"{c}"' for c in cols) + f" FROM {table} ORDER BY rowid"
+
+    video_parts = [
+        apply_dtypes(chunk, VIDEO_DTYPES, categorize=False)
+        for chunk in pd.read_sql_query(select("videos", VIDEO_FIELDS), catalog.conn, chunksize=chunksize)
+    ]
+    videos = (pd.concat(video_parts, ignore_index=True) if video_parts
+              else apply_dtypes(pd.DataFrame(columns=VIDEO_FIELDS), VIDEO_DTYPES, categorize=False))
+    channels = pd.read_sql_query(select("channels", CHANNEL_DTYPES), catalog.conn)
+    return _categorize(videos, VIDEO_DTYPES), apply_dtypes(channels, CHANNEL_DTYPES)
+
+
+def memory_bytes(*frames):
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames))
+
+
+# -----------------------------
+# Memory report
+# -----------------------------
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "youtube_50_videos.csv"
+    from columnar_store import load_table
+
+    wide = load_table(path).astype(object)
+    videos, channels = load_videos(path)
+    before, after = memory_bytes(wide), memory_bytes(videos, channels)
+    print(f"📄 {path}: {len(videos)} videos, {len(channels)} channels")
+    print(f"   wide text frame : {before / 1e6:.2f} MB")
+    print(f"   normalized      : {after / 1e6:.2f} MB (videos {memory_bytes(videos) / 1e6:.2f} MB, "
+          f"channels {memory_bytes(channels) / 1e6:.2f} MB)")
+    print(f"✅ {before / max(after, 1):.1f}x smaller")
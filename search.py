@@ -0,0 +1,78 @@
+import argparse
+import os
+import time
+from filter_index import FilterIndex, parse_filters
+from hybrid_search import FUSIONS
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex
+
+# --- Config ---
+index_path = "search_index"          # built by build_search_index.py, kept fresh by update_indexes.py
+vector_index_path = "vector_index"   # built by build_vector_index.py, kept fresh by update_indexes.py
+filter_index_path = "filter_index"   # built by build_filter_index.py / update_indexes.py
+
+parser = argparse.ArgumentParser(description="BM25 (or --dense embedding) search over the indexed videos")
+parser.add_argument("query", nargs="+", help="search words")
+parser.add_argument("-k", type=int, default=10, help="number of results")
+parser.add_argument("--dense", action="store_true", help="search passage / title embeddings instead of BM25")
+parser.add_argument("--nprobe", type=int, default=None, help="IVF lists scanned per --dense query (0 = exact scan)")
+parser.add_argument("--hybrid", action="store_true", help="fuse BM25 and embedding results")
+parser.add_argument("--fusion", choices=FUSIONS, default="rrf", help="--hybrid: reciprocal rank or weighted score fusion")
+parser.add_argument("--rerank", type=int, default=0, help="--hybrid: re-score the fused top N exactly")
+facets = parser.add_argument_group("filters")
+facets.add_argument("--channel", help="channel_id (comma-separated for several)")
+facets.add_argument("--category", help="categoryId (comma-separated for several)")
+facets.add_argument("--language", help="defaultLanguage (comma-separated for several)")
+facets.add_argument("--after", help="published on or after this ISO date")
+facets.add_argument("--before", help="published on or before this ISO date")
+facets.add_argument("--min-duration", type=float, help="seconds")
+facets.add_argument("--max-duration", type=float, help="seconds")
+facets.add_argument("--min-views", type=float)
+facets.add_argument("--min-likes", type=float)
+args = parser.parse_args()
+query = " ".join(args.query)
+
+filters = parse_filters(vars(args))
+allowed = None
+if filters:
+    if not os.path.exists(filter_index_path):
+        raise SystemExit(f"❌ No {filter_index_path}/ - run `querytube.py filters` or `update-index` first")
+    started = time.perf_counter()
+    allowed = FilterIndex(filter_index_path).match_video_ids(filters)
+    print(f"🏷️  {len(allowed)} videos match the filters ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+if args.hybrid:
+    from hybrid_search import HybridSearcher
+
+    lexical, vectors = SegmentedSearchIndex(index_path), SegmentedVectorIndex(vector_index_path)
+    hybrid = HybridSearcher(lexical, vectors, nprobe=args.nprobe)
+    started = time.perf_counter()
+    results = hybrid.search(query, k=args.k, fusion=args.fusion, rerank=args.rerank, allowed=allowed)
+    elapsed = (time.perf_counter() - started) * 1000
+    hybrid.close()
+
+    print(f"🔎 {len(results)} results in {elapsed:.1f} ms ({args.fusion} fusion, {hybrid.stats['rounds']} rounds, "
+          f"{hybrid.stats['candidates']} candidates)")
+    for rank, hit in enumerate(results, start=1):
+        at = "" if hit["start"] is None else f"&t={int(hit['start'])}s"
+        ranks = f"bm25 #{hit['lexical_rank'] or '-'}, dense #{hit['dense_rank'] or '-'}"
+        print(f"{rank:>3}. {hit['score']:7.3f}  https://www.youtube.com/watch?v={hit['video_id']}{at}  ({ranks})")
+elif args.dense:
+    # Segments with IVF lists (build_ann_index.py) are searched approximately, the rest exactly
+    index = SegmentedVectorIndex(vector_index_path)
+    started = time.perf_counter()
+    results = index.search(query, k=args.k, nprobe=args.nprobe, allowed=allowed)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"🔎 {len(results)} results in {elapsed:.1f} ms ({len(index)} passages and titles embedded)")
+    for rank, hit in enumerate(results, start=1):
+        at = "" if hit["start"] is None else f"&t={int(hit['start'])}s"
+        print(f"{rank:>3}. {hit['score']:7.3f}  https://www.youtube.com/watch?v={hit['video_id']}{at}  ({hit['key']})")
+else:
+    index = SegmentedSearchIndex(index_path)
+    started = time.perf_counter()
+    results = index.search(query, k=args.k, allowed=allowed)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"🔎 {len(results)} results in {elapsed:.1f} ms ({len(index)} videos indexed)")
+    for rank, (video_id, score) in enumerate(results, start=1):
+        print(f"{rank:>3}. {score:7.3f}  https://www.youtube.com/watch?v={video_id}")
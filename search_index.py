@@ -0,0 +1,644 @@
+"""
+BM25 inverted index over video text, stored as memory-mapped files.
+
+    build_index(iter_documents("final_output.csv"), "search_index")
+    index = SearchIndex("search_index")
+    index.search("binary search tree", k=10)   # [(video_id, score), ...]
+
+A document is one video: its title, description and transcript, tokenized
+like normalize.clean_text_alnum (lowercase [a-z0-9]+ runs). Field weights
+multiply term frequencies, so a title hit counts FIELD_WEIGHTS["title"] times.
+
+On-disk layout (one directory, every array opened with np.load(mmap_mode="r")):
+
+    meta.json            docs, avgdl, k1, b, block size, field weights
+    doc_ids.npy          video id of every doc number
+    doc_len.npy          weighted token count per doc
+    term_hash.npy        sorted 64-bit term hashes (binary-searched at query time)
+    term_text.bin/.npy   the terms in hash order + offsets, to rule out collisions
+    term_df.npy          document frequency per term
+    term_blocks.npy      first block of every term (len = terms + 1)
+    block_last_doc.npy   last doc number in each block (skip pointers)
+    block_offset.npy     byte offset of each block in postings.bin (len = blocks + 1)
+    block_max.npy        best BM25 score in each block
+    postings.bin         per block: (doc delta, tf) pairs as LEB128 varints
+
+Postings are cut into blocks of BLOCK postings. Doc numbers are delta-coded
+within a block, starting from the previous block's last doc, so any block can
+be decoded on its own. Decoding and encoding are vectorized with numpy.
+
+Queries prune twice. MaxScore: the weakest query terms, whose best possible
+scores together cannot reach the current k-th best score, only score docs
+another term already found. Block-max: the doc range is cut at every block
+boundary of the remaining terms, each piece is bounded by the sum of its
+blocks' maximum scores, and pieces are scored best bound first until no
+unscored piece can beat the k-th best. Frequent terms therefore decode only
+the blocks that can still matter, not their whole postings list.
+
+Building is SPIMI: postings are collected in memory up to RUN_POSTINGS, sorted
+and spilled as a run; finish() merges the runs a range of terms at a time, so
+memory stays bounded by the run size, not the collection size.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from collections import Counter
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+FIELD_WEIGHTS = {"title": 3, "description": 1, "transcript": 1}
+K1 = 1.2
+B = 0.75
+BLOCK = 128                 # postings per block
+RUN_POSTINGS = 20_000_000   # postings held in memory before a run is spilled (~240 MB)
+MERGE_POSTINGS = 20_000_000 # postings merged and encoded at a time in finish()
+EXACT_POSTINGS = 4_096      # query terms with at most this many postings are decoded up front
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+FORMAT_VERSION = 1
+
+
+def tokenize(text):
+    """Lowercase [a-z0-9]+ runs; the same tokens clean_text_alnum() leaves in the cleaned columns."""
+    if not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# -----------------------------
+# Varints (LEB128), vectorized
+# -----------------------------
+def encode_varints(values):
+    """uint64 array -> uint8 array of LEB128 varints, plus the byte offset where each value starts."""
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        nbytes += values >= np.uint64(1 << shift)
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max(initial=0))):
+        has = nbytes > k
+        byte = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + k] = (byte | more).astype(np.uint8)
+    return out, starts
+
+
+def decode_varints(buf):
+    """uint8 array of whole LEB128 varints -> uint64 array."""
+    buf = np.asarray(buf, dtype=np.uint8)
+    if len(buf) == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    if len(ends) == len(buf):   # every value fits in one byte
+        return buf.astype(np.uint64)
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shift = ((np.arange(len(buf)) - starts[group]) * 7).astype(np.uint64)
+    parts = (buf & 0x7F).astype(np.uint64) << shift
+    return np.add.reduceat(parts, starts)
+
+
+def _gather(data, starts, ends):
+    """Concatenation of data[s:e] for every (s, e), without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=data.dtype)
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return data[np.arange(total) + shift]
+
+
+def idf(df, docs):
+    """The non-negative BM25 idf ln(1 + (N - df + 0.5) / (df + 0.5))."""
+    df = np.asarray(df, dtype=np.float64)
+    return np.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+def bm25(tf, doc_len, df, docs, avgdl, k1=K1, b=B):
+    """BM25 of term frequencies `tf` in docs of length `doc_len`; df may be per posting."""
+    tf = np.asarray(tf, dtype=np.float64)
+    norm = k1 * (1 - b + b * np.asarray(doc_len, dtype=np.float64) / avgdl)
+    return idf(df, docs) * tf * (k1 + 1) / (tf + norm)
+
+
+# -----------------------------
+# Building
+# -----------------------------
+class IndexBuilder:
+    """Add documents one at a time with add(); finish() writes the index directory."""
+
+    def __init__(self, path, field_weights=FIELD_WEIGHTS, run_postings=RUN_POSTINGS):
+        self.path = path
+        self.field_weights = dict(field_weights)
+        self.run_postings = run_postings
+        self.vocab = {}
+        self.df = array("I")
+        self.doc_ids = []
+        self.doc_len = array("I")
+        self._tids, self._docs, self._tfs = array("I"), array("I"), array("I")
+        self._tmp = tempfile.mkdtemp(prefix=".index_", dir=os.path.dirname(os.path.abspath(path)))
+        self._runs = []
+
+    def add(self, video_id, fields):
+        """fields: {"title": str, "description": str, "transcript": str}; missing / NaN fields are skipped."""
+        counts = Counter()
+        for field, weight in self.field_weights.items():
+            for term, tf in Counter(tokenize(fields.get(field))).items():
+                counts[term] += tf * weight
+        doc = len(self.doc_ids)
+        self.doc_ids.append(str(video_id))
+        self.doc_len.append(sum(counts.values()))
+        vocab, df = self.vocab, self.df
+        for term, tf in counts.items():
+            tid = vocab.get(term)
+            if tid is None:
+                tid = vocab[term] = len(vocab)
+                df.append(0)
+            df[tid] += 1
+            self._tids.append(tid)
+            self._tfs.append(tf)
+        self._docs.extend([doc] * len(counts))
+        if len(self._tids) >= self.run_postings:
+            self._spill()
+
+    def _spill(self):
+        if not len(self._tids):
+            return
+        tids = np.frombuffer(self._tids, dtype=np.uint32)
+        docs = np.frombuffer(self._docs, dtype=np.uint32)
+        tfs = np.frombuffer(self._tfs, dtype=np.uint32)
+        run = os.path.join(self._tmp, f"run_{len(self._runs)}")
+        # Postings arrive in doc order, so a stable sort by term keeps docs ascending
+        order = np.argsort(tids, kind="stable")
+        np.save(run + "_tid.npy", tids[order])
+        np.save(run + "_doc.npy", docs[order])
+        np.save(run + "_tf.npy", tfs[order])
+        self._runs.append(run)
+        self._tids, self._docs, self._tfs = array("I"), array("I"), array("I")
+
+    def finish(self, k1=K1, b=B):
+        """Merge the runs into `path` (replaced atomically). Returns the number of documents."""
+        self._spill()
+        n_docs, n_terms = len(self.doc_ids), len(self.vocab)
+        doc_len = np.frombuffer(self.doc_len, dtype=np.uint32)
+        avgdl = float(doc_len.mean()) if n_docs and doc_len.any() else 1.0
+        df = np.frombuffer(self.df, dtype=np.uint32)
+
+        # Terms are stored in hash order; rank[tid] is a term's position
+        terms = sorted(self.vocab, key=self.vocab.get)
+        hashes = np.array([term_hash(t) for t in terms], dtype=np.uint64)
+        by_hash = np.argsort(hashes, kind="stable")
+        rank = np.empty(n_terms, dtype=np.int64)
+        rank[by_hash] = np.arange(n_terms)
+        df_ranked = df[by_hash]
+        self.vocab = None   # the largest Python structure; not needed any more
+
+        temp = self.path + "_temp"
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+        term_bytes = [terms[i].encode("utf-8") for i in by_hash]
+        with open(os.path.join(temp, "term_text.bin"), "wb") as f:
+            f.write(b"".join(term_bytes))
+        np.save(os.path.join(temp, "term_text.npy"),
+                np.concatenate([[0], np.cumsum([len(t) for t in term_bytes], dtype=np.uint64)]).astype(np.uint64))
+        del terms, term_bytes
+
+        # Re-sort every run by rank (one run in memory at a time), then map them all
+        runs = []
+        for run in self._runs:
+            ranks = rank[np.load(run + "_tid.npy")]
+            order = np.argsort(ranks, kind="stable")
+            np.save(run + "_rank.npy", ranks[order])
+            for k in ("doc", "tf"):
+                np.save(f"{run}_{k}.npy", np.load(f"{run}_{k}.npy")[order])
+            os.remove(run + "_tid.npy")
+            del ranks, order
+            runs.append({k: np.load(f"{run}_{k}.npy", mmap_mode="r") for k in ("rank", "doc", "tf")})
+
+        blocks_per_term = -(-df_ranked.astype(np.int64) // BLOCK)
+        term_blocks = np.concatenate([[0], np.cumsum(blocks_per_term)]).astype(np.uint64)
+        n_blocks = int(term_blocks[-1])
+        block_last_doc = np.empty(n_blocks, dtype=np.uint32)
+        block_max = np.empty(n_blocks, dtype=np.float64)   # float64: a rounded-down bound could prune a real hit
+        block_offset = np.empty(n_blocks + 1, dtype=np.uint64)
+        written = 0
+
+        # Ranges of terms holding about MERGE_POSTINGS postings each
+        cum = np.concatenate([[0], np.cumsum(df_ranked, dtype=np.int64)])
+        with open(os.path.join(temp, "postings.bin"), "wb") as out:
+            lo = 0
+            while lo < n_terms:
+                hi = max(lo + 1, int(np.searchsorted(cum, cum[lo] + MERGE_POSTINGS, side="right")) - 1)
+                written = self._encode_range(runs, lo, hi, df_ranked, term_blocks, doc_len, avgdl, n_docs,
+                                             k1, b, out, written, block_last_doc, block_max, block_offset)
+                lo = hi
+        del runs
+        block_offset[n_blocks] = written
+
+        np.save(os.path.join(temp, "doc_ids.npy"), np.array(self.doc_ids, dtype="S"))
+        np.save(os.path.join(temp, "doc_len.npy"), doc_len)
+        np.save(os.path.join(temp, "term_hash.npy"), hashes[by_hash])
+        np.save(os.path.join(temp, "term_df.npy"), df_ranked)
+        np.save(os.path.join(temp, "term_blocks.npy"), term_blocks)
+        np.save(os.path.join(temp, "block_last_doc.npy"), block_last_doc)
+        np.save(os.path.join(temp, "block_offset.npy"), block_offset)
+        np.save(os.path.join(temp, "block_max.npy"), block_max)
+        with open(os.path.join(temp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "docs": n_docs, "terms": n_terms, "avgdl": avgdl,
+                       "k1": k1, "b": b, "block": BLOCK, "field_weights": self.field_weights}, f, indent=2)
+
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(temp, self.path)
+        return n_docs
+
+    @staticmethod
+    def _encode_range(runs, lo, hi, df, term_blocks, doc_len, avgdl, n_docs, k1, b,
+                      out, written, block_last_doc, block_max, block_offset):
+        """Encode the postings of term ranks [lo, hi) and append them to `out`."""
+        parts = []
+        for run in runs:
+            a, z = np.searchsorted(run["rank"], [lo, hi])
+            parts.append((run["rank"][a:z], run["doc"][a:z], run["tf"][a:z]))
+        ranks = np.concatenate([p[0] for p in parts])
+        order = np.argsort(ranks, kind="stable")   # runs are in doc order, so docs stay ascending per term
+        ranks = ranks[order]
+        docs = np.concatenate([p[1] for p in parts])[order].astype(np.int64)
+        tfs = np.concatenate([p[2] for p in parts])[order].astype(np.int64)
+        if len(ranks) == 0:
+            return written
+
+        # Position of every posting within its term, then its (global) block number
+        term_start = np.searchsorted(ranks, np.arange(lo, hi))
+        pos = np.arange(len(ranks)) - np.repeat(term_start, df[lo:hi].astype(np.int64))
+        block = (term_blocks[ranks].astype(np.int64) + pos // BLOCK)
+        first_in_block = np.flatnonzero(pos % BLOCK == 0)
+
+        # Doc deltas restart at each block from the previous block's last doc (0 for a term's first block)
+        prev = np.concatenate([[0], docs[:-1]])
+        prev[pos == 0] = 0
+        deltas = docs - prev
+
+        scores = bm25(tfs, doc_len[docs], df[ranks], n_docs, avgdl, k1, b)
+
+        pairs = np.empty(2 * len(ranks), dtype=np.uint64)
+        pairs[0::2], pairs[1::2] = deltas, tfs
+        encoded, starts = encode_varints(pairs)
+        out.write(encoded.tobytes())
+
+        blocks = block[first_in_block]
+        block_offset[blocks] = written + starts[2 * first_in_block]
+        last_in_block = np.concatenate([first_in_block[1:], [len(ranks)]]) - 1
+        block_last_doc[blocks] = docs[last_in_block]
+        block_max[blocks] = np.maximum.reduceat(scores, first_in_block)
+        return written + len(encoded)
+
+    def close(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+def iter_documents(path, chunksize=10_000):
+    """(video_id, fields) for every row of a table with an id column; later duplicates of an id are skipped."""
+    from columnar_store import iter_table_chunks
+
+    seen = set()
+    wanted = ["id"] + list(FIELD_WEIGHTS)
+    for chunk in iter_table_chunks(path, chunksize, columns=wanted, dtype=str):
+        for row in chunk.to_dict("records"):
+            vid = row.get("id")
+            if not isinstance(vid, str) or vid in seen:
+                continue
+            seen.add(vid)
+            yield vid, row
+
+
+def build_index(documents, path, field_weights=FIELD_WEIGHTS):
+    """Index every (video_id, fields) pair into the directory `path`. Returns the number of documents."""
+    builder = IndexBuilder(path, field_weights)
+    try:
+        for video_id, fields in documents:
+            builder.add(video_id, fields)
+        return builder.finish()
+    finally:
+        builder.close()
+
+
+def merge_indexes(indexes, path, deleted=None):
+    """
+    Write the docs of several SearchIndexes, in order, as one index at `path`,
+    leaving out docs flagged in the matching boolean arrays of `deleted`.
+    Postings are copied over term range by term range; no text is re-tokenized.
+    Returns the number of documents written.
+    """
+    builder = IndexBuilder(path, indexes[0].meta["field_weights"])
+    df = np.zeros(0, dtype=np.int64)
+    try:
+        for index, dead in zip(indexes, deleted or [None] * len(indexes)):
+            live = np.ones(index.docs, dtype=bool) if dead is None else ~np.asarray(dead, dtype=bool)
+            new_doc = np.cumsum(live) - 1 + len(builder.doc_ids)
+            builder.doc_ids.extend(d.decode("utf-8") for d in index.doc_ids[live])
+            builder.doc_len.extend(index.doc_len[live].tolist())
+            terms = index.terms()
+            tid = np.full(len(terms), -1, dtype=np.int64)
+
+            # Each term range becomes a run, in doc order like the runs of add()
+            cum = np.concatenate([[0], np.cumsum(index.term_df, dtype=np.int64)])
+            lo = 0
+            while lo < len(terms):
+                hi = max(lo + 1, int(np.searchsorted(cum, cum[lo] + MERGE_POSTINGS, side="right")) - 1)
+                ranks, docs, tfs = index.postings_range(lo, hi)
+                keep = live[docs]
+                for r in np.unique(ranks[keep]).tolist():   # terms left only in deleted docs are dropped
+                    tid[r] = builder.vocab.setdefault(terms[r], len(builder.vocab))
+                tids = tid[ranks[keep]]
+                df = np.concatenate([df, np.zeros(len(builder.vocab) - len(df), dtype=np.int64)])
+                df += np.bincount(tids, minlength=len(df))
+                for name, values in (("_tids", tids), ("_docs", new_doc[docs[keep]]), ("_tfs", tfs[keep])):
+                    getattr(builder, name).frombytes(values.astype(np.uint32).tobytes())
+                builder._spill()
+                lo = hi
+        builder.df = array("I", df.astype(np.uint32).tobytes())
+        meta = indexes[0].meta
+        return builder.finish(meta["k1"], meta["b"])
+    finally:
+        builder.close()
+
+
+# -----------------------------
+# Searching
+# -----------------------------
+class SearchIndex:
+    """Read-only view of an index directory; opening it maps the files, it reads nothing up front."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: index format {self.meta.get('format')}, expected {FORMAT_VERSION}; rebuild it")
+        load = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        self.doc_ids = load("doc_ids")
+        self.doc_len = load("doc_len")
+        self.term_hash = load("term_hash")
+        self.term_text_offsets = load("term_text")
+        self.term_df = load("term_df")
+        self.term_blocks = load("term_blocks")
+        self.block_last_doc = load("block_last_doc")
+        self.block_offset = load("block_offset")
+        self.block_max = load("block_max")
+        self.term_text = self._map("term_text.bin")
+        self.postings_data = self._map("postings.bin")
+        self.docs = self.meta["docs"]
+        self.block = self.meta["block"]
+
+    def _map(self, name):
+        file = os.path.join(self.path, name)
+        return np.memmap(file, dtype=np.uint8, mode="r") if os.path.getsize(file) else np.empty(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.docs
+
+    def term_id(self, term):
+        """Position of `term` in the lexicon, or None."""
+        h = np.uint64(term_hash(term))
+        i = int(np.searchsorted(self.term_hash, h))
+        encoded = term.encode("utf-8")
+        while i < len(self.term_hash) and self.term_hash[i] == h:   # more than one term only on a hash collision
+            s, e = int(self.term_text_offsets[i]), int(self.term_text_offsets[i + 1])
+            if self.term_text[s:e].tobytes() == encoded:
+                return i
+            i += 1
+        return None
+
+    def _blocks(self, t):
+        return int(self.term_blocks[t]), int(self.term_blocks[t + 1])
+
+    def _score(self, q, docs, tfs):
+        return bm25(tfs, self.doc_len[docs], q["df"], q["N"], q["avgdl"], self.meta["k1"], self.meta["b"])
+
+    def postings(self, t, blocks=None):
+        """(docs, tfs) of term `t`, either all of it or only the given block numbers (ascending)."""
+        first, end = self._blocks(t)
+        if blocks is None:
+            blocks = np.arange(first, end)
+        blocks = np.asarray(blocks, dtype=np.int64)
+        if len(blocks) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        df = int(self.term_df[t])
+        counts = np.full(len(blocks), self.block, dtype=np.int64)
+        counts[blocks == end - 1] = df - self.block * (end - first - 1)
+
+        values = decode_varints(_gather(self.postings_data, self.block_offset[blocks].astype(np.int64),
+                                        self.block_offset[blocks + 1].astype(np.int64))).astype(np.int64)
+        deltas, tfs = values[0::2], values[1::2]
+        base = np.where(blocks == first, 0, self.block_last_doc[np.maximum(blocks - 1, 0)].astype(np.int64))
+        block_start = np.cumsum(counts) - counts
+        running = np.cumsum(deltas)
+        before = np.where(block_start > 0, running[block_start - 1], 0)
+        docs = running - np.repeat(before - base, counts)
+        return docs, tfs
+
+    def terms(self):
+        """Every lexicon term, in term-id order."""
+        data = self.term_text.tobytes()
+        offsets = self.term_text_offsets.astype(np.int64).tolist()
+        return [data[s:e].decode("utf-8") for s, e in zip(offsets, offsets[1:])]
+
+    def postings_range(self, lo, hi):
+        """(term ids, docs, tfs) of every posting of terms lo .. hi-1, by term, docs ascending within a term."""
+        term_blocks = self.term_blocks[lo:hi + 1].astype(np.int64)
+        first, end = int(term_blocks[0]), int(term_blocks[-1])
+        if end == first:
+            return (np.empty(0, dtype=np.int64),) * 3
+        per_term = np.diff(term_blocks)
+        blocks = np.arange(first, end)
+        term_first = np.repeat(term_blocks[:-1], per_term)
+        counts = np.full(len(blocks), self.block, dtype=np.int64)
+        last = blocks == np.repeat(term_blocks[1:], per_term) - 1
+        counts[last] = (self.term_df[lo:hi].astype(np.int64) - self.block * (per_term - 1))[per_term > 0]
+
+        values = decode_varints(self.postings_data[int(self.block_offset[first]):int(self.block_offset[end])]).astype(np.int64)
+        deltas, tfs = values[0::2], values[1::2]
+        base = np.where(blocks == term_first, 0, self.block_last_doc[np.maximum(blocks - 1, 0)].astype(np.int64))
+        block_start = np.cumsum(counts) - counts
+        running = np.cumsum(deltas)
+        before = np.where(block_start > 0, running[block_start - 1], 0)
+        docs = running - np.repeat(before - base, counts)
+        return np.repeat(np.repeat(np.arange(lo, hi), per_term), counts), docs, tfs
+
+    def _query_terms(self, query, stats=None):
+        """Lexicon terms of `query` as dicts: t, n (query tf), df / N / avgdl (the statistics scores use),
+        scale (block maxima -> bounds under those statistics), bound (best possible score), and either
+        docs / scores (rare terms, decoded up front) or first / end (block range)."""
+        terms = []
+        for term, n in Counter(tokenize(query)).items():
+            t = self.term_id(term)
+            if t is None:
+                continue
+            first, end = self._blocks(t)
+            q = {"t": t, "n": n, "first": first, "end": end,
+                 "df": int(self.term_df[t]), "N": self.docs, "avgdl": self.meta["avgdl"], "scale": 1.0}
+            if stats is not None:
+                # Block maxima were computed with this index's own df / N / avgdl. Under other
+                # statistics a score changes by at most the idf ratio times max(1, avgdl ratio)
+                docs, avgdl, df = stats
+                q["scale"] = float(idf(df[term], docs) / idf(q["df"], q["N"])) \
+                    * max(1.0, avgdl / q["avgdl"]) * (1 + 1e-9)
+                q.update(df=df[term], N=docs, avgdl=avgdl)
+            if int(self.term_df[t]) <= EXACT_POSTINGS:
+                q["docs"], tfs = self.postings(t)
+                q["scores"] = self._score(q, q["docs"], tfs) * n
+                q["bound"] = float(q["scores"].max())
+            else:
+                q["bound"] = float(self.block_max[first:end].max()) * q["scale"] * n
+            terms.append(q)
+        return terms
+
+    def _intervals(self, terms):
+        """
+        Elementary doc intervals (bounds[i-1], bounds[i]], cut at every block boundary
+        of a block-coded term and around every doc of a rare term. Each interval lies
+        inside one block per term, so the sum of those blocks' maxima (exact scores for
+        rare-term docs) bounds the score of every doc in it. Returns (bounds, bound, blocks).
+        """
+        cuts = [self.block_last_doc[q["first"]:q["end"]] if "docs" not in q
+                else np.concatenate([q["docs"], q["docs"][q["docs"] > 0] - 1]) for q in terms]
+        bounds = np.unique(np.concatenate(cuts).astype(np.int64))
+        bound = np.zeros(len(bounds))
+        blocks = []
+        for q in terms:
+            if "docs" in q:
+                bound[np.searchsorted(bounds, q["docs"])] += q["scores"]   # each rare-term doc is an interval of its own
+                blocks.append(None)
+                continue
+            first, end = q["first"], q["end"]
+            blk = np.searchsorted(self.block_last_doc[first:end], bounds)   # == end - first: past the term's last doc
+            present = blk < end - first
+            bound[present] += self.block_max[first + blk[present]] * (q["scale"] * q["n"])
+            blocks.append(np.where(present, first + blk, -1))
+        return bounds, bound, blocks
+
+    def _score_intervals(self, terms, bounds, blocks, picked):
+        """(docs, scores) summed over `terms` for every doc inside the `picked` intervals."""
+        in_batch = np.zeros(len(bounds), dtype=bool)
+        in_batch[picked] = True
+        doc_parts, score_parts = [], []
+        for q, blk in zip(terms, blocks):
+            if blk is None:
+                docs, scores = q["docs"], q["scores"]
+            else:
+                needed = np.unique(blk[picked])
+                docs, tfs = self.postings(q["t"], needed[needed >= 0])
+                scores = None
+            keep = in_batch[np.searchsorted(bounds, docs)]   # a block can reach into unpicked intervals
+            doc_parts.append(docs[keep])
+            score_parts.append(scores[keep] if scores is not None else self._score(q, docs[keep], tfs[keep]) * q["n"])
+        docs, where = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        return docs, np.bincount(where, weights=np.concatenate(score_parts), minlength=len(docs))
+
+    def _lookup(self, q, docs):
+        """Score of term `q` for each of `docs` (0 where absent), decoding only the blocks they fall in."""
+        if "docs" in q:
+            have, scores = q["docs"], q["scores"]
+        else:
+            first, end = q["first"], q["end"]
+            blk = first + np.searchsorted(self.block_last_doc[first:end], docs)
+            have, tfs = self.postings(q["t"], np.unique(blk[blk < end]))
+            scores = None
+        pos = np.minimum(np.searchsorted(have, docs), max(len(have) - 1, 0))
+        hit = (have[pos] == docs) if len(have) else np.zeros(len(docs), dtype=bool)
+        out = np.zeros(len(docs))
+        if scores is not None:
+            out[hit] = scores[pos[hit]]
+        else:
+            out[hit] = self._score(q, have[pos[hit]], tfs[pos[hit]]) * q["n"]
+        return out
+
+    def search(self, query, k=10, stats=None, deleted=None, docs=None):
+        """
+        Top `k` (video_id, score) for `query`, best first; equal scores are ordered
+        by doc number (a tie exactly at the k-th score may be cut either way).
+        `stats` = (docs, avgdl, {term: df}) scores with collection-wide statistics
+        instead of this index's own (a segment of a larger index); docs flagged in
+        the boolean array `deleted` are skipped. `docs` (ascending doc numbers, e.g.
+        the rows a metadata filter allows) scores only those docs, decoding only
+        the blocks they fall in.
+        """
+        terms = sorted(self._query_terms(query, stats), key=lambda q: q["bound"])
+        if not terms or k <= 0:
+            return []
+        if docs is not None:
+            return self._search_docs(terms, np.asarray(docs, dtype=np.int64), k, deleted)
+        prefix = np.cumsum([q["bound"] for q in terms])
+
+        best_docs, best_scores = np.empty(0, dtype=np.int64), np.empty(0)
+        threshold = 0.0
+        while True:
+            # Non-essential terms: the weakest ones whose bounds together stay below the
+            # threshold. A doc holding none of the other terms cannot reach the top k,
+            # so intervals come from the essential terms alone
+            n_rest = int(np.searchsorted(prefix, threshold, side="left"))
+            rest, essential = terms[:n_rest], terms[n_rest:]
+            if not essential:
+                break
+            rest_bound = float(prefix[n_rest - 1]) if n_rest else 0.0
+            bounds, bound, blocks = self._intervals(essential)
+            bound += rest_bound
+            order = np.argsort(-bound, kind="stable")
+
+            # Score whole intervals, best bound first, in growing batches, until no
+            # unscored interval can beat the current k-th best score
+            pos, batch, regroup = 0, 16, False
+            while pos < len(order) and bound[order[pos]] > threshold:
+                picked = order[pos:pos + batch]
+                picked = picked[bound[picked] > threshold]
+                pos, batch = pos + batch, batch * 2
+                docs, scores = self._score_intervals(essential, bounds, blocks, picked)
+                if deleted is not None:
+                    live = ~deleted[docs]
+                    docs, scores = docs[live], scores[live]
+                for j in range(n_rest - 1, -1, -1):   # strongest non-essential term first
+                    alive = scores + prefix[j] > threshold
+                    docs, scores = docs[alive], scores[alive]
+                    scores = scores + self._lookup(rest[j], docs)
+                best_docs, best_scores = self._merge_top(best_docs, best_scores, docs, scores, k)
+                if len(best_docs) == k:
+                    threshold = float(best_scores[-1])
+                if np.searchsorted(prefix, threshold, side="left") > n_rest:
+                    regroup = True   # more terms became non-essential: fewer intervals to look at
+                    break
+            if not regroup:
+                break
+
+        return [(self.doc_ids[d].decode("utf-8"), float(sc)) for d, sc in zip(best_docs.tolist(), best_scores.tolist())]
+
+    def _search_docs(self, terms, docs, k, deleted=None):
+        """search() restricted to `docs`: every term is looked up for just those docs."""
+        if deleted is not None:
+            docs = docs[~deleted[docs]]
+        scores = np.zeros(len(docs))
+        for q in terms:
+            scores += self._lookup(q, docs)
+        hit = scores > 0
+        docs, scores = self._merge_top(docs[:0], scores[:0], docs[hit], scores[hit], k)
+        return [(self.doc_ids[d].decode("utf-8"), float(sc)) for d, sc in zip(docs.tolist(), scores.tolist())]
+
+    @staticmethod
+    def _merge_top(docs_a, scores_a, docs_b, scores_b, k):
+        """Best `k` of two (docs, scores) sets, sorted by score desc, then doc number; a doc counts once."""
+        docs = np.concatenate([docs_a, docs_b])
+        scores = np.concatenate([scores_a, scores_b])
+        docs, first = np.unique(docs, return_index=True)
+        scores = scores[first]
+        order = np.lexsort((docs, -scores))[:k]
+        return docs[order], scores[order]
@@ -0,0 +1,586 @@
+"""
+Segmented search indexes: appends become small new segments, deletes become
+tombstones, and a tiered merge policy folds small segments into larger ones,
+so an update costs time proportional to the change, not to the corpus.
+
+    lexical = SegmentedSearchIndex("search_index", create=True)
+    lexical.update([(video_id, {"title": ..., "description": ..., "transcript": ...})], deleted=[private_id])
+    lexical.search("binary search tree", k=10)
+    lexical.maybe_merge(background=True)
+
+SegmentedVectorIndex does the same for (key, video_id, start, text) passages.
+
+Directory layout:
+
+    manifest.json              generation, settings, segments [{name, rows, deleted, tombstones}]
+    seg_000001/                an immutable SearchIndex / VectorIndex directory, plus
+        fingerprints.npy       uint64 content hash of every row (what update_indexes.py diffs against)
+        tombstones_<g>.npy     rows deleted as of manifest generation g
+
+Every change writes new files first and then replaces manifest.json, so a
+reader sees either the old or the new index; refresh() switches to the newest
+one. Adding rows for a video tombstones its older rows in the same commit.
+Writers serialize on an flock()ed write.lock, so several processes can update
+one index. Lexical scores use BM25 statistics summed over all segments, so a
+document scores the same whichever segment holds it.
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from types import SimpleNamespace
+import numpy as np
+from search_index import FIELD_WEIGHTS, SearchIndex, build_index, merge_indexes, tokenize
+
+try:
+    import fcntl
+except ImportError:   # Windows: writers in one process are still serialized by the thread lock
+    fcntl = None
+
+# -----------------------------
+# Config
+# -----------------------------
+MERGE_FACTOR = 8         # merge once this many segments share a size tier (1-7 rows, 8-63, 64-511, ...)
+MAX_DELETED = 0.3        # rewrite a segment alone once this fraction of its rows is tombstoned
+FILTER_SCAN = 0.05       # a filter allowing at most this fraction of a segment's rows scores only those rows
+IVF_MIN_ROWS = 10_000    # vector segments this big get IVF lists (build_ann_index.py, merges of segments that had them)
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def text_fingerprint(*parts):
+    """uint64 hash of the tokens of `parts`, so raw and cleaned copies of the same text match."""
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(" ".join(tokenize(part)).encode("utf-8"))
+        h.update(b"\0")
+    return int.from_bytes(h.digest(), "little")
+
+
+def video_fingerprint(row_fingerprints):
+    """One fingerprint for a video from those of its rows (sum mod 2**64, so row order does not matter)."""
+    return int(np.sum(np.asarray(row_fingerprints, dtype=np.uint64), dtype=np.uint64))
+
+
+class Segment:
+    """One segment as a reader sees it: the open index plus row metadata and the deleted mask."""
+
+    __slots__ = ("name", "reader", "video_ids", "fingerprints", "deleted", "tombstones", "live", "_by_video")
+
+    def __init__(self, name, reader, video_ids, fingerprints, deleted, tombstones, by_video=None):
+        self.name, self.reader, self.video_ids = name, reader, video_ids
+        self.fingerprints, self.deleted, self.tombstones = fingerprints, deleted, tombstones
+        self.live = len(video_ids) - int(deleted.sum())   # a view's deleted mask never changes
+        self._by_video = by_video
+
+    @property
+    def rows(self):
+        return len(self.video_ids)
+
+    def rows_of(self, video_ids):
+        """Ascending live rows of the given video ids (a sorted bytes array, e.g. a filter's matches)."""
+        if self._by_video is None:   # built on first use and kept for the segment's lifetime
+            order = np.argsort(self.video_ids, kind="stable")
+            self._by_video = (np.asarray(self.video_ids)[order], order)
+        ids, order = self._by_video
+        if not len(ids):
+            return np.empty(0, dtype=np.int64)
+        wanted = np.asarray(video_ids, dtype=bytes)
+        if len(wanted) and wanted.dtype.itemsize > ids.dtype.itemsize:
+            # Ids longer than this segment's widest id are not in it; casting would cut b"v60" to b"v6"
+            wanted = wanted[np.char.str_len(wanted) <= ids.dtype.itemsize]
+        wanted = wanted.astype(ids.dtype)
+        lo, hi = np.searchsorted(ids, wanted, side="left"), np.searchsorted(ids, wanted, side="right")
+        counts = hi - lo
+        if not counts.sum():
+            return np.empty(0, dtype=np.int64)
+        positions = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        rows = np.sort(order[positions])
+        return rows[~self.deleted[rows]]
+
+    def allowed(self, video_ids):
+        """
+        How a search of this segment honours an allow-list of video ids: (rows, None)
+        to score only those rows when they are few, else (None, mask) with every
+        other row flagged deleted. video_ids=None: no filter, just the tombstones.
+        """
+        if video_ids is None:
+            return None, (self.deleted if self.live < self.rows else None)
+        rows = self.rows_of(video_ids)
+        if len(rows) <= FILTER_SCAN * self.rows:
+            return rows, None
+        mask = np.ones(self.rows, dtype=bool)
+        mask[rows] = False
+        return None, mask
+
+
+# -----------------------------
+# Segments, tombstones, merging
+# -----------------------------
+class SegmentedIndex:
+    """
+    Shared machinery; subclasses say how a segment is written, opened, merged
+    and searched (_write_segment, _open_segment, _video_ids, _merge_segments).
+    """
+
+    def __init__(self, path, create=False, settings=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._merge_thread = None
+        self.generation = None
+        self.segments = []
+        manifest = os.path.join(path, MANIFEST)
+        if not os.path.exists(manifest):
+            if os.path.exists(os.path.join(path, "meta.json")):
+                raise ValueError(f"{path} is a single-segment index from an older version; rebuild it")
+            if not create:
+                raise FileNotFoundError(manifest)
+            os.makedirs(path, exist_ok=True)
+            self._write_manifest({"format": FORMAT_VERSION, "kind": self.kind, "generation": 0,
+                                  "next_segment": 1, "settings": settings or {}, "segments": []})
+        self.refresh()
+        if self.manifest.get("format") != FORMAT_VERSION or self.manifest.get("kind") != self.kind:
+            raise ValueError(f"{path} is not a {self.kind} index of format {FORMAT_VERSION}; rebuild it")
+
+    @property
+    def settings(self):
+        return self.manifest["settings"]
+
+    def __len__(self):
+        return sum(seg.live for seg in self.segments)
+
+    # --- manifest ---
+    def _read_manifest(self):
+        with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        temp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, os.path.join(self.path, MANIFEST))
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive write access (threads and processes); yields the current manifest to modify."""
+        with self._lock, open(os.path.join(self.path, "write.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield json.loads(json.dumps(self.manifest))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _commit(self, manifest, obsolete=()):
+        """Publish `manifest` as the next generation, then delete files only older generations used."""
+        manifest["generation"] += 1
+        self._write_manifest(manifest)
+        self.refresh()
+        for path in obsolete:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def refresh(self):
+        """Switch to the newest manifest if a writer changed it. Returns True when the view changed."""
+        for attempt in range(5):
+            try:
+                manifest = self._read_manifest()
+                if manifest["generation"] == self.generation:
+                    return False
+                current = {seg.name: seg for seg in self.segments}
+                segments = [self._load(entry, current.get(entry["name"])) for entry in manifest["segments"]]
+                break
+            except FileNotFoundError:   # a writer removed files of an older generation mid-read; re-read
+                if attempt == 4:
+                    raise
+                time.sleep(0.05)
+        self.manifest, self.generation, self.segments = manifest, manifest["generation"], segments
+        return True
+
+    def _load(self, entry, previous=None):
+        if previous is not None and previous.tombstones == entry["tombstones"]:
+            return previous
+        seg_path = os.path.join(self.path, entry["name"])
+        by_video = None
+        if previous is not None:
+            reader, video_ids, fingerprints = previous.reader, previous.video_ids, previous.fingerprints
+            by_video = previous._by_video
+        else:
+            reader = self._open_segment(seg_path)
+            video_ids = self._video_ids(reader)
+            fingerprints = np.load(os.path.join(seg_path, "fingerprints.npy"), mmap_mode="r")
+        deleted = np.zeros(len(video_ids), dtype=bool)
+        if entry["tombstones"]:
+            deleted[np.load(os.path.join(seg_path, entry["tombstones"]))] = True
+        return Segment(entry["name"], reader, video_ids, fingerprints, deleted, entry["tombstones"], by_video)
+
+    # --- reading ---
+    def live_fingerprints(self):
+        """{video_id: video_fingerprint of its live rows} over the whole index."""
+        ids = [seg.video_ids[~seg.deleted] for seg in self.segments]
+        fps = [np.asarray(seg.fingerprints)[~seg.deleted] for seg in self.segments]
+        if not ids or not sum(len(i) for i in ids):
+            return {}
+        ids, fps = np.concatenate(ids), np.concatenate(fps).astype(np.uint64)
+        order = np.argsort(ids, kind="stable")
+        ids, fps = ids[order], fps[order]
+        starts = np.flatnonzero(np.concatenate([[True], ids[1:] != ids[:-1]]))
+        sums = np.add.reduceat(fps, starts)
+        return dict(zip((v.decode("utf-8") for v in ids[starts]), sums.tolist()))
+
+    # --- writing ---
+    def _build_dir(self):
+        path = os.path.join(self.path, f".build_{os.getpid()}_{threading.get_ident()}_{time.time_ns()}")
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    def update(self, items=(), deleted=()):
+        """
+        Append `items` as one new segment and tombstone the rows of the `deleted`
+        video ids, plus the older rows of every video in `items`, in a single
+        commit. Returns (rows added, rows deleted).
+        """
+        build = None
+        fingerprints = []
+        items = iter(items)
+        first = next(items, None)
+        if first is not None:   # items are streamed into the segment, never held in memory
+            build = self._build_dir()
+            fingerprints = self._write_segment(build, itertools.chain([first], items))
+            np.save(os.path.join(build, "fingerprints.npy"), np.asarray(fingerprints, dtype=np.uint64))
+        try:
+            with self._writing() as manifest:
+                gone = {str(v) for v in deleted}
+                if build is not None:
+                    gone.update(v.decode("utf-8") for v in np.unique(self._video_ids(self._open_segment(build))))
+                removed, obsolete = self._tombstone(manifest, gone)
+                if build is not None:
+                    name = f"seg_{manifest['next_segment']:06d}"
+                    manifest["next_segment"] += 1
+                    os.replace(build, os.path.join(self.path, name))
+                    build = None
+                    manifest["segments"].append({"name": name, "rows": len(fingerprints), "deleted": 0, "tombstones": None})
+                if removed or fingerprints:
+                    self._commit(manifest, obsolete)
+            return len(fingerprints), removed
+        finally:
+            if build is not None:
+                shutil.rmtree(build, ignore_errors=True)
+
+    def _tombstone(self, manifest, video_ids):
+        """Mark the live rows of `video_ids` deleted in `manifest`; returns (rows marked, files to delete after commit)."""
+        removed, obsolete, keep = 0, [], []
+        wanted = np.array(sorted(video_ids), dtype="S") if video_ids else None
+        segments = {seg.name: seg for seg in self.segments}
+        for entry in manifest["segments"]:
+            seg = segments[entry["name"]]
+            hits = np.isin(seg.video_ids, wanted) & ~seg.deleted if wanted is not None else None
+            if hits is None or not hits.any():
+                keep.append(entry)
+                continue
+            removed += int(hits.sum())
+            mask = seg.deleted | hits
+            seg_path = os.path.join(self.path, entry["name"])
+            if entry["tombstones"]:
+                obsolete.append(os.path.join(seg_path, entry["tombstones"]))
+            if mask.all():   # nothing left to search
+                obsolete.append(seg_path)
+                continue
+            entry["tombstones"] = f"tombstones_{manifest['generation'] + 1}.npy"
+            entry["deleted"] = int(mask.sum())
+            np.save(os.path.join(seg_path, entry["tombstones"]), np.flatnonzero(mask).astype(np.uint32))
+            keep.append(entry)
+        manifest["segments"] = keep
+        return removed, obsolete
+
+    def delete(self, video_ids):
+        """Tombstone every row of `video_ids`. Returns the number of rows deleted."""
+        return self.update((), video_ids)[1]
+
+    # --- merging ---
+    def _pick_merge(self):
+        """Names of segments worth merging now, or None."""
+        tiers = {}
+        for seg in self.segments:
+            tiers.setdefault(int(math.log(max(seg.live, 1), MERGE_FACTOR)), []).append(seg.name)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= MERGE_FACTOR:
+                return tiers[tier]
+        for seg in self.segments:
+            if seg.live < seg.rows and (seg.rows - seg.live) / seg.rows >= MAX_DELETED:
+                return [seg.name]
+        return None
+
+    def maybe_merge(self, background=False):
+        """
+        Apply the merge policy until nothing qualifies. Returns the number of
+        merges, or with background=True starts (at most) one merging thread and
+        returns it; searches and updates carry on meanwhile.
+        """
+        if background:
+            with self._lock:
+                if self._merge_thread is None or not self._merge_thread.is_alive():
+                    self._merge_thread = threading.Thread(target=self.maybe_merge, name="segment-merge", daemon=True)
+                    self._merge_thread.start()
+                return self._merge_thread
+        merges = 0
+        while True:
+            self.refresh()
+            names = self._pick_merge()
+            if not names or not self._merge(names):
+                return merges
+            merges += 1
+
+    def _merge(self, names):
+        """Merge segments `names` into one; returns False if another writer got to them first."""
+        sources = [seg for seg in self.segments if seg.name in names]
+        snapshot = [seg.deleted.copy() for seg in sources]
+        build = self._build_dir()
+        live_rows = sum(seg.live for seg in sources)
+        try:
+            if live_rows:
+                self._merge_segments(build, sources, snapshot)
+                np.save(os.path.join(build, "fingerprints.npy"),
+                        np.concatenate([np.asarray(seg.fingerprints)[~dead] for seg, dead in zip(sources, snapshot)]))
+            with self._writing() as manifest:
+                current = {seg.name: seg for seg in self.segments}
+                if any(name not in current for name in names):
+                    return False
+                # Rows deleted while the merge ran are carried over to the merged segment
+                late, offset = [], 0
+                for seg, dead in zip(sources, snapshot):
+                    new_row = np.cumsum(~dead) - 1 + offset
+                    late.append(new_row[current[seg.name].deleted & ~dead])
+                    offset += int((~dead).sum())
+                late = np.concatenate(late).astype(np.uint32) if late else np.empty(0, np.uint32)
+
+                first = min(i for i, e in enumerate(manifest["segments"]) if e["name"] in names)
+                kept = [e for e in manifest["segments"] if e["name"] not in names]
+                obsolete = [os.path.join(self.path, name) for name in names]
+                if live_rows and len(late) < live_rows:
+                    name = f"seg_{manifest['next_segment']:06d}"
+                    manifest["next_segment"] += 1
+                    tombstones = None
+                    if len(late):
+                        tombstones = f"tombstones_{manifest['generation'] + 1}.npy"
+                        np.save(os.path.join(build, tombstones), np.sort(late))
+                    os.replace(build, os.path.join(self.path, name))
+                    kept.insert(first, {"name": name, "rows": live_rows, "deleted": len(late), "tombstones": tombstones})
+                manifest["segments"] = kept
+                self._commit(manifest, obsolete)
+            return True
+        finally:
+            shutil.rmtree(build, ignore_errors=True)
+
+    @classmethod
+    def rebuild(cls, path, items, **kwargs):
+        """Build a fresh single-segment index from `items` and swap it in for `path`."""
+        temp = path + "_rebuild"
+        shutil.rmtree(temp, ignore_errors=True)
+        try:
+            index = cls(temp, create=True, **kwargs)
+            index.update(items)
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp, path)
+        return cls(path, **{k: v for k, v in kwargs.items() if k == "embedder"})
+
+
+# -----------------------------
+# Lexical (BM25)
+# -----------------------------
+class SegmentedSearchIndex(SegmentedIndex):
+    """BM25 over segments of SearchIndex; items are (video_id, fields) like iter_documents() yields."""
+
+    kind = "bm25"
+
+    def _open_segment(self, path):
+        return SearchIndex(path)
+
+    def _video_ids(self, reader):
+        return reader.doc_ids
+
+    def _write_segment(self, path, items):
+        fingerprints = array("Q")
+
+        def documents():
+            for video_id, fields in items:
+                fingerprints.append(text_fingerprint(*(fields.get(f) for f in FIELD_WEIGHTS)))
+                yield video_id, fields
+
+        build_index(documents(), path)
+        return fingerprints
+
+    def _merge_segments(self, path, sources, deleted):
+        merge_indexes([seg.reader for seg in sources], path, deleted)
+
+    def search(self, query, k=10, allowed=None):
+        """
+        Top `k` (video_id, score) over every segment, best first; deleted rows never appear.
+        `allowed` (sorted video id bytes, FilterIndex.match_video_ids) restricts the results.
+        """
+        segments = self.segments   # one consistent view, even if a refresh happens meanwhile
+        if not segments:
+            return []
+        docs = sum(seg.reader.docs for seg in segments)
+        avgdl = sum(seg.reader.meta["avgdl"] * seg.reader.docs for seg in segments) / max(docs, 1)
+        df = {}
+        for term in set(tokenize(query)):
+            ids = [(seg.reader, seg.reader.term_id(term)) for seg in segments]
+            df[term] = sum(int(reader.term_df[t]) for reader, t in ids if t is not None)
+        hits = []
+        for rank, seg in enumerate(segments):
+            rows, deleted = seg.allowed(allowed)
+            if rows is not None and not len(rows):
+                continue
+            found = seg.reader.search(query, k, (docs, avgdl, df), deleted, rows)
+            hits.extend((-score, rank, vid) for vid, score in found)
+        return [(vid, -neg) for neg, _, vid in sorted(hits)[:k]]
+
+
+# -----------------------------
+# Dense vectors
+# -----------------------------
+class SegmentedVectorIndex(SegmentedIndex):
+    """
+    Vector search over segments of VectorIndex (with IVF lists where built);
+    items are (key, video_id, start, text). `embedder` (e.g. a CachedEmbedder)
+    embeds new items and queries; by default the one named in the settings.
+    """
+
+    kind = "vector"
+
+    def __init__(self, path, create=False, embedder=None, dtype="float16"):
+        self._embedder = embedder
+        settings = None
+        if create:
+            from embedders import DEFAULT_EMBEDDER, load_embedder
+
+            self._embedder = embedder = embedder or load_embedder(DEFAULT_EMBEDDER)
+            settings = {"embedder": embedder.name, "embedder_version": embedder.version,
+                        "dim": embedder.dim, "dtype": dtype}
+        super().__init__(path, create, settings)
+        if embedder is not None and embedder.version != self.settings["embedder_version"]:
+            raise ValueError(f"{path} was built with {self.settings['embedder_version']}, not {embedder.version}")
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from embedders import load_embedder
+
+            self._embedder = load_embedder(self.settings["embedder"])
+        return self._embedder
+
+    @embedder.setter
+    def embedder(self, embedder):   # e.g. the same model wrapped in a CachedEmbedder
+        self._embedder = embedder
+
+    def _open_segment(self, path):
+        from ann_index import IVFIndex
+        from vector_index import VectorIndex
+
+        return IVFIndex(path) if IVFIndex.exists(path) else VectorIndex(path)
+
+    @staticmethod
+    def _vectors(reader):
+        """The VectorIndex of a segment reader (an IVFIndex wraps one)."""
+        return getattr(reader, "index", reader)
+
+    def _video_ids(self, reader):
+        return self._vectors(reader).video_ids
+
+    def _write_segment(self, path, items):
+        from vector_index import VectorIndexWriter
+
+        fingerprints = array("Q")
+        with VectorIndexWriter(path, self.embedder, dtype=self.settings["dtype"]) as writer:
+            for key, video_id, start, text in items:
+                writer.add(key, video_id, start, text)
+                fingerprints.append(text_fingerprint(key, text))
+        return fingerprints
+
+    def _merge_segments(self, path, sources, deleted):
+        from ann_index import build_ivf
+        from vector_index import ROWS_PER_BLOCK, VectorIndexWriter
+
+        s = self.settings
+        info = SimpleNamespace(name=s["embedder"], version=s["embedder_version"], dim=s["dim"])
+        with VectorIndexWriter(path, info, dtype=s["dtype"]) as writer:
+            for seg, dead in zip(sources, deleted):
+                vectors = self._vectors(seg.reader)
+                for start in range(0, len(vectors), ROWS_PER_BLOCK):
+                    end = min(start + ROWS_PER_BLOCK, len(vectors))
+                    live = ~dead[start:end]
+                    starts = np.asarray(vectors.starts[start:end])[live]
+                    writer.add_vectors([k.decode("utf-8") for k in vectors.keys[start:end][live]],
+                                       [v.decode("utf-8") for v in vectors.video_ids[start:end][live]],
+                                       [None if x != x else float(x) for x in starts.tolist()],
+                                       vectors.vectors_float32(start, end)[live])
+            rows = writer.count
+        if rows >= IVF_MIN_ROWS and any(self._vectors(seg.reader) is not seg.reader for seg in sources):
+            build_ivf(path)
+
+    def search(self, queries, k=10, nprobe=None, allowed=None):
+        """
+        Top `k` items per query text over every segment, in VectorIndex.search's
+        format. Segments with IVF lists are probed (`nprobe` lists, 0 = exact scan).
+        `allowed` (sorted video id bytes) restricts the results to those videos.
+        """
+        single = isinstance(queries, str)
+        texts = [queries] if single else list(queries)
+        if not texts:
+            return []
+        results = self.search_embedded(self.embedder.embed(texts), k, nprobe, allowed)
+        return results[0] if single else results
+
+    def search_embedded(self, embedded, k=10, nprobe=None, allowed=None):
+        """search() for queries already embedded (nq x dim float32); always one list per query."""
+        segments, found = self.search_rows(embedded, k, nprobe, allowed)
+        return [[dict(self._vectors(segments[g].reader).item(r), score=s)
+                 for s, g, r in zip(scores.tolist(), ranks.tolist(), rows.tolist())] for scores, ranks, rows in found]
+
+    def search_rows(self, embedded, k=10, nprobe=None, allowed=None):
+        """
+        search_embedded() without building result dicts: the segments searched and,
+        per query, (scores, segment numbers, rows) arrays of the top `k`, best first.
+        """
+        segments = self.segments
+        hits = [[] for _ in range(len(embedded))]
+        for rank, seg in enumerate(segments):
+            rows, deleted = seg.allowed(allowed)
+            vectors = self._vectors(seg.reader)
+            if rows is not None:   # a selective filter: exact scores for just its rows
+                if not len(rows):
+                    continue
+                found = zip(*vectors.search_vectors(embedded, k, rows=rows))
+            elif vectors is not seg.reader and nprobe != 0:
+                found = seg.reader.search_vectors(embedded, k, nprobe, deleted)
+            else:
+                found = zip(*vectors.search_vectors(embedded, k, deleted=deleted))
+            for query_hits, (rows, scores) in zip(hits, found):
+                live = scores != -np.inf
+                query_hits.append((np.asarray(scores[live], dtype=np.float64), np.full(int(live.sum()), rank),
+                                   np.asarray(rows[live], dtype=np.int64)))
+        out = []
+        for query_hits in hits:
+            if not query_hits:
+                out.append((np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)))
+                continue
+            scores, ranks, rows = (np.concatenate(part) for part in zip(*query_hits))
+            order = np.lexsort((rows, ranks, -scores))[:k]
+            out.append((scores[order], ranks[order], rows[order]))
+        return segments, out
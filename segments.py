@@ -0,0 +1,119 @@
+"""
+Timestamped transcript segments and passage chunking.
+
+The fetchers used to keep only TextFormatter's output, "\\n".join of the
+snippet texts, and drop every snippet's start / duration. Segments keeps the
+timing next to that same text as three small arrays:
+
+    start_ms     uint32, snippet start in milliseconds
+    duration_ms  uint32, how long the snippet stays on screen
+    offsets      uint32, character offset of each snippet in the transcript,
+                 plus a final entry equal to len(transcript)
+
+chunk_passages() cuts a transcript into overlapping passages of N
+whitespace tokens and anchors each one to the seconds it covers, so a search
+hit can point at "video X from 02:13" instead of the whole video.
+"""
+import base64
+import re
+import numpy as np
+
+# -----------------------------
+# Config
+# -----------------------------
+PASSAGE_TOKENS = 128    # whitespace tokens per passage
+PASSAGE_OVERLAP = 32    # tokens shared by consecutive passages
+_TOKEN_RE = re.compile(r"\S+")
+_DTYPE = np.dtype("<u4")
+
+
+class Segments:
+    """The snippets of one transcript in array form (see module docstring)."""
+
+    __slots__ = ("start_ms", "duration_ms", "offsets")
+    FIELDS = __slots__
+
+    def __init__(self, start_ms, duration_ms, offsets):
+        self.start_ms = np.asarray(start_ms, dtype=_DTYPE)
+        self.duration_ms = np.asarray(duration_ms, dtype=_DTYPE)
+        self.offsets = np.asarray(offsets, dtype=_DTYPE)
+        if not (len(self.start_ms) == len(self.duration_ms) == len(self.offsets) - 1):
+            raise ValueError("Segments need n starts, n durations and n + 1 offsets")
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def __repr__(self):
+        return f"Segments({len(self)} snippets, {self.offsets[-1]} chars)"
+
+    @classmethod
+    def from_snippets(cls, snippets):
+        """(text, Segments) from FetchedTranscriptSnippets; text equals TextFormatter().format_transcript()."""
+        texts = [s.text for s in snippets]
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        if len(texts):
+            offsets[-1] -= 1   # no "\n" after the last snippet
+        segments = cls(
+            np.rint([s.start * 1000 for s in snippets]),
+            np.rint([s.duration * 1000 for s in snippets]),
+            offsets,
+        )
+        return "\n".join(texts), segments
+
+    def matches(self, text):
+        """True if these offsets were computed for `text` (a re-imported transcript may have changed)."""
+        return text is not None and int(self.offsets[-1]) == len(text)
+
+    # ---- serialization ----
+    def to_blobs(self):
+        """(start_ms, duration_ms, offsets) as little-endian bytes, for SQLite BLOB columns."""
+        return tuple(getattr(self, f).tobytes() for f in self.FIELDS)
+
+    @classmethod
+    def from_blobs(cls, start_ms, duration_ms, offsets):
+        return cls(*(np.frombuffer(b, dtype=_DTYPE) for b in (start_ms, duration_ms, offsets)))
+
+    def to_record(self):
+        """JSON-safe form for the fetch journals (base64 of to_blobs())."""
+        return {f: base64.b64encode(b).decode("ascii") for f, b in zip(self.FIELDS, self.to_blobs())}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls.from_blobs(*(base64.b64decode(record[f]) for f in cls.FIELDS))
+
+
+# -----------------------------
+# Passage chunking
+# -----------------------------
+def chunk_passages(text, segments=None, tokens=PASSAGE_TOKENS, overlap=PASSAGE_OVERLAP):
+    """
+    Overlapping passages of `tokens` whitespace tokens, each starting
+    `tokens - overlap` tokens after the previous one; the last passage ends at
+    the last token. Returns {"start", "end", "text"}: start / end are seconds
+    (float arrays, NaN without usable segments), text is a list of substrings
+    of `text` with the original spacing.
+    """
+    if tokens <= 0 or not 0 <= overlap < tokens:
+        raise ValueError("need tokens > 0 and 0 <= overlap < tokens")
+    spans = np.array([m.span() for m in _TOKEN_RE.finditer(text or "")], dtype=np.int64).reshape(-1, 2)
+    n = len(spans)
+    if n == 0:
+        return {"start": np.empty(0), "end": np.empty(0), "text": []}
+
+    firsts = np.arange(0, max(n - overlap, 1), tokens - overlap)
+    lasts = np.minimum(firsts + tokens, n) - 1
+    char_start, char_end = spans[firsts, 0], spans[lasts, 1]
+    passages = [text[a:b] for a, b in zip(char_start.tolist(), char_end.tolist())]
+
+    if segments is None or len(segments) == 0 or not segments.matches(text):
+        nan = np.full(len(firsts), np.nan)
+        return {"start": nan, "end": nan.copy(), "text": passages}
+
+    # Snippet holding the passage's first / last character
+    first_seg = np.searchsorted(segments.offsets, char_start, side="right") - 1
+    last_seg = np.searchsorted(segments.offsets, char_end - 1, side="right") - 1
+    last_seg = np.minimum(last_seg, len(segments) - 1)
+    starts = segments.start_ms.astype(np.int64)
+    ends = starts + segments.duration_ms
+    return {"start": starts[first_seg] / 1000, "end": ends[last_seg] / 1000, "text": passages}
@@ -0,0 +1,115 @@
+"""
+Multi-core text cleaning: one column-wise cleaning function (normalize.py)
+applied to several columns of a DataFrame by a pool of worker processes.
+
+    cleaned = clean_columns(df, ["title", "description", "transcript"], clean_text_alnum)
+    for col, values in cleaned.items():
+        df[col] = values
+
+Rows are split into shards by a hash of their id. Nothing is pickled on the
+way in or out:
+
+- The text columns are converted to one Arrow table before the pool is forked,
+  so workers read the parent's buffers directly (copy-on-write pages that are
+  never written). A task is just a shard number.
+- Each worker writes its cleaned shard as an Arrow IPC file; the parent
+  memory-maps the files and scatters the values back to their original row
+  positions, so the result is in the input order whatever order shards finish.
+
+Small frames, a single worker, or platforms without fork() (or without
+pyarrow) run the function in-process, with exactly the same results.
+"""
+import multiprocessing
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Config
+# -----------------------------
+WORKERS = int(os.getenv("QUERYTUBE_WORKERS", "0")) or os.cpu_count() or 1
+SHARDS_PER_WORKER = 4      # more shards than workers, so one slow shard does not idle the pool
+MIN_PARALLEL_ROWS = 1_000  # below this the pool costs more than it saves
+KEY_COLUMN = "id"
+
+# Set in the parent right before the pool forks; workers inherit it
+_SHARED = None
+
+
+def _can_fork():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def shard_ids(df, shards, key=KEY_COLUMN):
+    """Shard number of every row: hash(id) % shards (row position if there is no id column)."""
+    keys = df[key].astype(object) if key in df.columns else pd.Series(np.arange(len(df)))
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashes % np.uint64(shards)).astype(np.int64)
+
+
+def _to_arrow_column(series):
+    """Arrow array of `series`. Mixed object columns are turned into str first, as the cleaners would."""
+    import pyarrow as pa
+    try:
+        return pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        text = series.astype(object).map(str)
+        return pa.array(text.where(series.notna(), None), from_pandas=True)
+
+
+def _clean_shard(shard):
+    """Worker: clean shard number `shard` of the inherited table; returns its Arrow IPC file."""
+    import pyarrow as pa
+    table, positions, func, out_dir = _SHARED
+    part = table.take(pa.array(positions[shard])).to_pandas()
+    cleaned = {col: pa.array(func(part[col]).astype(object), from_pandas=True) for col in part.columns}
+    path = os.path.join(out_dir, f"shard_{shard}.arrow")
+    result = pa.table(cleaned)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, result.schema) as writer:
+        writer.write_table(result)
+    return shard, path
+
+
+def clean_columns(df, columns, func, workers=None):
+    """
+    {column: func(df[column])} for the `columns` present in `df`, computed
+    across `workers` processes (default WORKERS). Values and row order match
+    the in-process result.
+    """
+    columns = [c for c in columns if c in df.columns]
+    workers = WORKERS if workers is None else workers
+    if workers <= 1 or len(df) < MIN_PARALLEL_ROWS or not columns or not _can_fork():
+        return {col: func(df[col]) for col in columns}
+
+    global _SHARED
+    import pyarrow as pa
+    shards = workers * SHARDS_PER_WORKER
+    ids = shard_ids(df, shards)
+    order = np.argsort(ids, kind="stable")
+    positions = np.split(order, np.cumsum(np.bincount(ids, minlength=shards))[:-1])
+    table = pa.table({col: _to_arrow_column(df[col]) for col in columns})
+
+    merged = {col: np.empty(len(df), dtype=object) for col in columns}
+    with tempfile.TemporaryDirectory(prefix=".clean_") as out_dir:
+        _SHARED = (table, positions, func, out_dir)
+        try:
+            with multiprocessing.get_context("fork").Pool(min(workers, shards)) as pool:
+                for shard, path in pool.imap_unordered(_clean_shard, [s for s in range(shards) if len(positions[s])]):
+                    with pa.memory_map(path) as source:
+                        result = pa.ipc.open_file(source).read_all()
+                    for col in columns:
+                        merged[col][positions[shard]] = result.column(col).to_pandas().to_numpy(dtype=object)
+        finally:
+            _SHARED = None
+
+    # pd.Series(list) infers the dtype the way the column functions do
+    return {col: pd.Series([np.nan if v is None else v for v in merged[col]], index=df.index)
+            for col in columns}
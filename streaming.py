@@ -0,0 +1,167 @@
+"""
+Bounded-memory building blocks for the --stream mode of build_final_dataset.py
+and merge_videos_and_transcripts.py (and the part merge in crawl_channels.py).
+
+- SeenHashes: de-duplication by 64-bit row / id hashes, 8 bytes per kept row
+  instead of whole rows (transcripts included) held in a DataFrame.
+- grace_left_join: pd.merge(how="left") for tables larger than RAM. Both sides
+  are spilled to disk in hash partitions, joined one partition at a time and
+  stitched back into the left table's row order.
+"""
+import math
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from columnar_store import TableWriter, iter_table_chunks, table_columns, table_size
+
+# -----------------------------
+# Config
+# -----------------------------
+CHUNK_ROWS = 10_000
+JOIN_MEMORY_BYTES = 256 * 1024 * 1024   # on-disk size of right-side table held in memory per join partition
+_ROW = "__row__"                        # left row position, carried through the join
+
+
+# -----------------------------
+# Hash de-duplication
+# -----------------------------
+def row_hashes(df):
+    """One uint64 per row, over every column's values (the index is ignored)."""
+    return pd.util.hash_pandas_object(df.astype(object), index=False).to_numpy()
+
+
+class SeenHashes:
+    """
+    Set of uint64 hashes stored as a few sorted numpy arrays. A new batch is
+    merged into the last array while that one is at most twice its size, so
+    there are O(log n) arrays to search and every hash is re-sorted O(log n) times.
+    """
+
+    def __init__(self):
+        self._levels = []
+
+    def __len__(self):
+        return sum(len(level) for level in self._levels)
+
+    def add_new(self, hashes):
+        """Boolean mask of `hashes` not seen before (first occurrence in the batch wins); remembers them."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        new = np.zeros(len(hashes), dtype=bool)
+        new[np.unique(hashes, return_index=True)[1]] = True
+        for level in self._levels:
+            pos = np.searchsorted(level, hashes).clip(max=len(level) - 1)
+            new &= level[pos] != hashes
+        self._push(np.sort(hashes[new]))
+        return new
+
+    def _push(self, batch):
+        while self._levels and len(self._levels[-1]) <= 2 * len(batch):
+            batch = np.sort(np.concatenate([self._levels.pop(), batch]))
+        if len(batch):
+            self._levels.append(batch)
+
+
+# -----------------------------
+# Grace hash join
+# -----------------------------
+class _Partitions:
+    """Spill files on disk: an ordered list of pickled chunks per partition."""
+
+    def __init__(self, root, name, count):
+        self.dir = os.path.join(root, name)
+        os.makedirs(self.dir)
+        self.files = [[] for _ in range(count)]
+
+    def append(self, p, df):
+        if df.empty:
+            return
+        path = os.path.join(self.dir, f"{p}_{len(self.files[p])}.pkl")
+        df.to_pickle(path)
+        self.files[p].append(path)
+
+    def scatter(self, df, buckets):
+        for p, part in df.groupby(buckets, sort=False):   # row order is kept inside each group
+            self.append(p, part)
+
+    def iter(self, p):
+        for path in self.files[p]:
+            yield pd.read_pickle(path)
+
+    def drop(self, p):
+        for path in self.files[p]:
+            os.remove(path)
+        self.files[p] = []
+
+
+def _buckets(keys, partitions):
+    hashes = pd.util.hash_pandas_object(keys.astype(object), index=False).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+def _in_row_order(parts, partitions, total_rows, chunksize):
+    """Yield the joined rows in left-table order, `chunksize` left rows at a time."""
+    streams = [parts.iter(p) for p in range(partitions)]
+    pending = [None] * partitions
+    for end in range(chunksize, total_rows + chunksize, chunksize):
+        pieces = []
+        for p in range(partitions):
+            # Each partition's output is sorted by _ROW, so this window is a prefix of it
+            while True:
+                if pending[p] is None or pending[p].empty:
+                    pending[p] = next(streams[p], None)
+                    if pending[p] is None:
+                        break
+                buf = pending[p]
+                n = int(np.searchsorted(buf[_ROW].to_numpy(), end))
+                if n:
+                    pieces.append(buf.iloc[:n])
+                pending[p] = buf.iloc[n:]
+                if n < len(buf):
+                    break
+        if pieces:
+            yield pd.concat(pieces).sort_values(_ROW, kind="stable")
+
+
+def grace_left_join(left_path, right_path, left_on, right_on, output_path,
+                    chunksize=CHUNK_ROWS, partitions=None, **csv_kwargs):
+    """
+    Stream `left_path` LEFT JOIN `right_path` into `output_path` with the same
+    rows, columns and row order as pd.merge(left, right, how="left"). Only one
+    right-side partition is in memory at a time. Returns the number of rows written.
+    """
+    if partitions is None:
+        partitions = max(1, math.ceil(table_size(right_path) / JOIN_MEMORY_BYTES))
+    left_cols, right_cols = table_columns(left_path), table_columns(right_path)
+    columns = pd.merge(pd.DataFrame(columns=left_cols), pd.DataFrame(columns=right_cols),
+                       left_on=left_on, right_on=right_on, how="left").columns.tolist()
+
+    spill_root = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(prefix=".join_", dir=spill_root) as tmp:
+        # 1. Partition both sides by key hash; left rows remember their position
+        right_parts = _Partitions(tmp, "right", partitions)
+        for chunk in iter_table_chunks(right_path, chunksize, **csv_kwargs):
+            right_parts.scatter(chunk, _buckets(chunk[right_on], partitions))
+
+        left_parts = _Partitions(tmp, "left", partitions)
+        total_rows = 0
+        for chunk in iter_table_chunks(left_path, chunksize, **csv_kwargs):
+            chunk[_ROW] = np.arange(total_rows, total_rows + len(chunk))
+            total_rows += len(chunk)
+            left_parts.scatter(chunk, _buckets(chunk[left_on], partitions))
+
+        # 2. Join partition by partition (a left merge keeps the left row order)
+        joined_parts = _Partitions(tmp, "joined", partitions)
+        for p in range(partitions):
+            frames = list(right_parts.iter(p))
+            right = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=right_cols)
+            for left in left_parts.iter(p):
+                joined_parts.append(p, pd.merge(left, right, left_on=left_on, right_on=right_on, how="left"))
+            right_parts.drop(p)
+            left_parts.drop(p)
+
+        # 3. Stitch the partitions back together in left-table order
+        with TableWriter(output_path, columns) as writer:
+            for window in _in_row_order(joined_parts, partitions, total_rows, chunksize):
+                writer.write_frame(window[columns])
+        return writer.rows_written
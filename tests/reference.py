@@ -0,0 +1,61 @@
+"""Brute-force references the search tests compare the indexes against."""
+from collections import Counter
+import numpy as np
+from search_index import FIELD_WEIGHTS, bm25, tokenize
+
+WORDS = [f"w{i}" for i in range(80)]
+
+
+def random_fields(rng):
+    """Zipf-ish text, so a few terms are in most documents and many in a handful."""
+    weights = 1.0 / np.arange(1, len(WORDS) + 1)
+    pick = lambda n: " ".join(rng.choice(WORDS, size=n, p=weights / weights.sum()))
+    return {"title": pick(int(rng.integers(1, 6))), "description": pick(int(rng.integers(0, 15))),
+            "transcript": pick(int(rng.integers(0, 60)))}
+
+
+def random_query(rng):
+    return " ".join(rng.choice(WORDS[:60], size=int(rng.integers(1, 5))))
+
+
+class BruteBM25:
+    """
+    BM25 of every live row by full scan. rows = [(video_id, fields, live)];
+    statistics (N, df, avgdl) count every row, live or not, like a segmented
+    index before a merge.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.counts = []
+        for _, fields, _ in rows:
+            c = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for term, tf in Counter(tokenize(fields.get(field))).items():
+                    c[term] += tf * weight
+            self.counts.append(c)
+        self.doc_len = [sum(c.values()) for c in self.counts]
+        self.avgdl = float(np.mean(self.doc_len)) if rows and any(self.doc_len) else 1.0
+
+    def scores(self, query):
+        """{video_id: score} of the live rows holding a query term."""
+        scores = {}
+        for term, n in Counter(tokenize(query)).items():
+            holders = [i for i, c in enumerate(self.counts) if term in c]
+            for i in holders:
+                vid, _, live = self.rows[i]
+                if live:
+                    tf = self.counts[i][term]
+                    score = float(bm25(tf, self.doc_len[i], len(holders), len(self.rows), self.avgdl))
+                    scores[vid] = scores.get(vid, 0.0) + n * score
+        return scores
+
+
+def assert_top_k(found, scores, k):
+    """`found` [(video_id, score)] is a valid top k of `scores` (ties at the cut may go either way)."""
+    expected = sorted(scores.values(), reverse=True)[:k]
+    assert len(found) == len(expected)
+    assert len({vid for vid, _ in found}) == len(found)
+    np.testing.assert_allclose([score for _, score in found], expected, rtol=1e-9)
+    for vid, score in found:
+        assert abs(scores[vid] - score) <= 1e-9 * max(1.0, abs(score))
@@ -0,0 +1,28 @@
+from checkpoint_journal import Journal, replay
+
+
+def test_append_after_a_torn_line_keeps_every_record(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with Journal(path) as journal:
+        journal.append({"id": 1})
+        journal.append({"id": 2})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 3, "transcr')   # crash mid-write
+    with Journal(path) as journal:
+        journal.append({"id": 4})
+        journal.append({"id": 5})
+    assert [r["id"] for r in replay(path)] == [1, 2, 4, 5]
+
+
+def test_replay_reads_past_an_undecodable_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"id": 1}\n{"id": 2, "tr\n{"id": 3}\n', encoding="utf-8")
+    assert [r["id"] for r in replay(str(path))] == [1, 3]
+
+
+def test_torn_line_without_any_newline(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"id": ' + "x" * 10000, encoding="utf-8")
+    with Journal(str(path)) as journal:
+        journal.append({"id": 1})
+    assert [r["id"] for r in replay(str(path))] == [1]
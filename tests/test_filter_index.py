@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from filter_index import SPARSE_FRACTION, FilterIndex, FilterIndexBuilder, to_epoch
+from reference import BruteBM25, assert_top_k, random_fields, random_query
+from segmented_index import SegmentedSearchIndex
+
+
+def build(tmp_path, rows):
+    builder = FilterIndexBuilder(str(tmp_path / "filter_index"))
+    builder.add_frame(pd.DataFrame(rows).astype(str))
+    builder.finish()
+    return FilterIndex(str(tmp_path / "filter_index"))
+
+
+def test_longer_value_does_not_match_its_prefix(tmp_path):
+    filters = build(tmp_path, [
+        {"id": "v1", "defaultLanguage": "en", "categoryId": "27"},
+        {"id": "v2", "defaultLanguage": "fr", "categoryId": "28"},
+    ])
+    assert filters.match_video_ids({"defaultLanguage": ["en-US"]}).tolist() == []
+    assert filters.match_video_ids({"categoryId": "270"}).tolist() == []
+    assert filters.match_video_ids({"defaultLanguage": ["en-US", "en"]}).tolist() == [b"v1"]
+    assert filters.match_video_ids({"categoryId": ["28"]}).tolist() == [b"v2"]
+
+
+def random_videos(rng, n):
+    channels = [f"UC{i:02d}" for i in range(40)]
+    weights = 1.0 / np.arange(1, len(channels) + 1)
+    published = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 5 * 365 * 86400, n), unit="s")
+    minutes, seconds = rng.integers(0, 90, n), rng.integers(0, 60, n)
+    views = rng.integers(0, 100_000, n).astype(object)
+    views[rng.random(n) < 0.1] = None
+    return pd.DataFrame({
+        "id": [f"v{i}" for i in range(n)],
+        "channel_id": rng.choice(channels, size=n, p=weights / weights.sum()),
+        "categoryId": rng.choice([str(c) for c in range(20, 30)], size=n),
+        "defaultLanguage": rng.choice(["en", "fr", "de", "es", None], size=n),
+        "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": [f"PT{m}M{s}S" for m, s in zip(minutes, seconds)],
+        "viewCount": views,
+        "likeCount": rng.integers(0, 5_000, n),
+    })
+
+
+def random_filters(rng, videos):
+    filters = {}
+    for field in rng.choice(["channel_id", "categoryId", "defaultLanguage", "publishedAt",
+                             "duration_seconds", "viewCount", "likeCount"], size=int(rng.integers(1, 4)), replace=False):
+        if field in ("channel_id", "categoryId", "defaultLanguage"):
+            known = videos[field].dropna().unique().tolist()
+            filters[field] = rng.choice(known + ["none"], size=int(rng.integers(1, 3))).tolist()
+        elif field == "publishedAt":
+            day = lambda: str((pd.Timestamp("2019-06-01") + pd.Timedelta(days=int(rng.integers(0, 6 * 365)))).date())
+            lo, hi = sorted([day(), day()])
+            filters[field] = (lo if rng.random() < 0.8 else None, hi if rng.random() < 0.8 else None)
+        else:
+            top = {"duration_seconds": 5400, "viewCount": 100_000, "likeCount": 5_000}[field]
+            lo, hi = sorted(rng.integers(0, top, 2).tolist())
+            filters[field] = (lo if rng.random() < 0.8 else None, hi if rng.random() < 0.8 else None)
+    return filters
+
+
+
+def pandas_match(videos, filters):
+    """Rows of `videos` satisfying `filters`, by plain pandas masks."""
+    minutes_seconds = videos["duration"].str.extract(r"PT(\d+)M(\d+)S").astype(int)
+    numeric = {
+        "publishedAt": (pd.to_datetime(videos["publishedAt"], utc=True) - pd.Timestamp(0, tz="UTC")).dt.total_seconds(),
+        "duration_seconds": minutes_seconds[0] * 60 + minutes_seconds[1],
+        "viewCount": pd.to_numeric(videos["viewCount"]),
+        "likeCount": videos["likeCount"].astype(float),
+    }
+    mask = pd.Series(True, index=videos.index)
+    for field, condition in filters.items():
+        if field not in numeric:
+            mask &= videos[field].isin(condition)
+            continue
+        lo, hi = (to_epoch(v) for v in condition) if field == "publishedAt" else condition
+        values = numeric[field]
+        mask &= values.notna()   # a missing value is in no range
+        if lo is not None:
+            mask &= values >= lo
+        if hi is not None:
+            mask &= values <= hi
+    return np.flatnonzero(mask.to_numpy())
+
+
+def build_random(tmp_path, videos, chunk=1000):
+    builder = FilterIndexBuilder(str(tmp_path / "filter_index"))
+    for start in range(0, len(videos), chunk):   # chunk by chunk, like build_filter_index
+        part = videos.iloc[start:start + chunk]
+        builder.add_frame(part.astype(object).where(part.notna(), None))
+    builder.finish()
+    return FilterIndex(str(tmp_path / "filter_index"))
+
+
+def test_match_equals_pandas_masks(tmp_path):
+    rng = np.random.default_rng(5)
+    videos = random_videos(rng, 3000)
+    filters = build_random(tmp_path, videos)
+    few = many = 0
+    for _ in range(150):
+        wanted = random_filters(rng, videos)
+        expected = pandas_match(videos, wanted)
+        assert filters.match(wanted).tolist() == expected.tolist(), wanted
+        few += 0 < len(expected) * SPARSE_FRACTION <= len(videos)
+        many += len(expected) * SPARSE_FRACTION > len(videos)
+    assert few and many   # both the row-by-row and the bitmap plans were exercised
+
+
+def test_filtered_search_equals_brute_force(tmp_path):
+    rng = np.random.default_rng(6)
+    videos = random_videos(rng, 400)
+    filters = build_random(tmp_path, videos, chunk=150)
+    rows = [(vid, random_fields(rng), True) for vid in videos["id"]]
+    index = SegmentedSearchIndex(str(tmp_path / "search_index"), create=True)
+    index.update([(vid, fields) for vid, fields, _ in rows])
+    brute = BruteBM25(rows)
+    for _ in range(60):
+        wanted = random_filters(rng, videos)
+        allowed = filters.match_video_ids(wanted)
+        query, keep = random_query(rng), set(allowed.tolist())
+        scores = {vid: s for vid, s in brute.scores(query).items() if vid.encode() in keep}
+        assert_top_k(index.search(query, 10, allowed=allowed), scores, 10)
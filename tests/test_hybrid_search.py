@@ -0,0 +1,48 @@
+import numpy as np
+import hybrid_search
+from embedders import HashingEmbedder
+from hybrid_search import HybridSearcher
+from reference import assert_top_k, random_fields, random_query
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex
+
+
+def build_hybrid(tmp_path, rng, videos=200):
+    """Both indexes over the same random videos; passages are 15-word pieces of the title and transcript."""
+    lexical = SegmentedSearchIndex(str(tmp_path / "search_index"), create=True)
+    vectors = SegmentedVectorIndex(str(tmp_path / "vector_index"), create=True, embedder=HashingEmbedder())
+    items, passages = [], []
+    for i in range(videos):
+        vid, fields = f"v{i}", random_fields(rng)
+        items.append((vid, fields))
+        words = (fields["title"] + " " + fields["transcript"]).split()
+        for start in range(0, len(words), 15):
+            passages.append((f"{vid}:{start}", vid, float(start), " ".join(words[start:start + 15])))
+    lexical.update(items)
+    vectors.update(passages)
+    return HybridSearcher(lexical, vectors)
+
+
+def test_early_termination_equals_full_depth_fusion(tmp_path, monkeypatch):
+    rng = np.random.default_rng(7)
+    hybrid = build_hybrid(tmp_path, rng)
+    allowed = np.array(sorted(f"v{i}".encode() for i in range(0, 200, 3)))
+    early = 0
+    try:
+        for _ in range(60):
+            query, k = random_query(rng), int(rng.integers(1, 12))
+            fusion = str(rng.choice(hybrid_search.FUSIONS))
+            only = allowed if rng.random() < 0.3 else None
+            found = hybrid.search(query, k, fusion=fusion, allowed=only)
+            stats = hybrid.stats
+            assert stats["settled"]
+            # The reference fuses the complete lists: the first round already fetches everything
+            with monkeypatch.context() as m:
+                m.setattr(hybrid_search, "MIN_DEPTH", 10_000)
+                m.setattr(hybrid_search, "MAX_DEPTH", 10_000)
+                full = hybrid.search(query, 10_000, fusion=fusion, allowed=only)
+            early += stats["candidates"] < len(full)
+            assert_top_k([(e["video_id"], e["score"]) for e in found],
+                         {e["video_id"]: e["score"] for e in full}, k)
+    finally:
+        hybrid.close()
+    assert early   # some searches settled before seeing every candidate
@@ -0,0 +1,40 @@
+import asyncio
+import pandas as pd
+from filter_index import build_filter_index
+from query_server import QueryService
+from segmented_index import SegmentedSearchIndex
+
+VIDEOS = [
+    {"id": "a", "title": "python basics", "channel_id": "C1", "channel_title": "One"},
+    {"id": "b", "title": "python classes", "channel_id": "C2", "channel_title": "Two"},
+    {"id": "c", "title": "python testing", "channel_id": "C1", "channel_title": "One"},
+]
+
+
+def make_service(tmp_path):
+    videos_path = str(tmp_path / "videos.csv")
+    pd.DataFrame(VIDEOS).to_csv(videos_path, index=False)
+    index = SegmentedSearchIndex(str(tmp_path / "search_index"), create=True)
+    index.update([(v["id"], {"title": v["title"], "description": "", "transcript": ""}) for v in VIDEOS])
+    build_filter_index(videos_path, str(tmp_path / "filter_index"))
+    return QueryService(index_path=str(tmp_path / "search_index"), vector_index_path=str(tmp_path / "none"),
+                        videos_path=videos_path, filter_index_path=str(tmp_path / "filter_index"),
+                        batch_window_ms=50)
+
+
+def test_filtered_and_unfiltered_queries_in_one_batch(tmp_path):
+    service = make_service(tmp_path)
+
+    async def run():
+        service._queue = asyncio.Queue()
+        batcher = asyncio.create_task(service._batcher())
+        try:
+            return await asyncio.gather(service.search("python", filters={"channel_id": ["C2"]}),
+                                        service.search("python"))
+        finally:
+            batcher.cancel()
+
+    (filtered, _), (unfiltered, _) = asyncio.run(run())
+    assert service.stats["batches"] == 1
+    assert [hit["video_id"] for hit in filtered] == ["b"]
+    assert sorted(hit["video_id"] for hit in unfiltered) == ["a", "b", "c"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import search_index
+from reference import BruteBM25, assert_top_k, random_fields, random_query
+from search_index import IndexBuilder, SearchIndex, decode_varints, encode_varints
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 32, 2 ** 63 - 1], dtype=np.uint64)
+    encoded, starts = encode_varints(values)
+    assert decode_varints(encoded).tolist() == values.tolist()
+    assert starts.tolist() == [0, 1, 2, 3, 5, 7, 12]
+
+
+@pytest.mark.parametrize("block, exact", [(1, 0), (4, 0), (128, 0), (128, search_index.EXACT_POSTINGS)])
+def test_search_matches_brute_force(tmp_path, monkeypatch, block, exact):
+    # Small blocks, no up-front decoding and several spilled runs merged a few terms at a time
+    monkeypatch.setattr(search_index, "BLOCK", block)
+    monkeypatch.setattr(search_index, "EXACT_POSTINGS", exact)
+    monkeypatch.setattr(search_index, "MERGE_POSTINGS", 500)
+    rng = np.random.default_rng(block + exact)
+    rows = [(f"v{i}", random_fields(rng), True) for i in range(400)]
+    builder = IndexBuilder(str(tmp_path / "index"), run_postings=2_000)
+    for vid, fields, _ in rows:
+        builder.add(vid, fields)
+    builder.finish()
+    index, brute = SearchIndex(str(tmp_path / "index")), BruteBM25(rows)
+
+    for _ in range(150):
+        query, k = random_query(rng), int(rng.integers(1, 20))
+        assert_top_k(index.search(query, k), brute.scores(query), k)
+
+
+def test_search_skips_deleted_docs_and_scores_only_given_docs(tmp_path):
+    rng = np.random.default_rng(7)
+    rows = [(f"v{i}", random_fields(rng), True) for i in range(200)]
+    builder = IndexBuilder(str(tmp_path / "index"))
+    for vid, fields, _ in rows:
+        builder.add(vid, fields)
+    builder.finish()
+    index, brute = SearchIndex(str(tmp_path / "index")), BruteBM25(rows)
+    deleted = rng.random(len(rows)) < 0.3
+    docs = np.flatnonzero(rng.random(len(rows)) < 0.2)
+
+    for _ in range(50):
+        query = random_query(rng)
+        scores = brute.scores(query)
+        live = {vid: scores[vid] for (vid, _, _), dead in zip(rows, deleted) if not dead and vid in scores}
+        assert_top_k(index.search(query, 10, deleted=deleted), live, 10)
+        allowed = {rows[d][0]: scores[rows[d][0]] for d in docs.tolist() if rows[d][0] in scores}
+        assert_top_k(index.search(query, 10, docs=docs), allowed, 10)
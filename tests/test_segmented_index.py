@@ -0,0 +1,73 @@
+import numpy as np
+from embedders import HashingEmbedder
+from reference import BruteBM25, assert_top_k, random_fields, random_query
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex
+
+
+def doc(text):
+    return {"title": text, "description": "", "transcript": ""}
+
+
+def test_allow_list_ids_are_not_cut_to_the_segment_id_width(tmp_path):
+    index = SegmentedSearchIndex(str(tmp_path / "search_index"), create=True)
+    index.update([("v6", doc("graph search")), ("v7", doc("graph theory"))])
+    segment = index.segments[0]
+    assert segment.rows_of(np.array([b"v60"])).tolist() == []
+    assert [vid for vid, _ in index.search("graph", 10, allowed=np.array([b"v60", b"v7"]))] == ["v7"]
+
+
+def build_segmented(tmp_path, rng, rounds=6, per_round=60):
+    """A BM25 index grown by several updates (re-adds and deletes included), and its rows for BruteBM25."""
+    index = SegmentedSearchIndex(str(tmp_path / "segmented"), create=True)
+    segments, ids = [], [f"v{i}" for i in range(150)]
+    for _ in range(rounds):
+        items = [(vid, random_fields(rng)) for vid in rng.choice(ids, size=per_round, replace=False).tolist()]
+        deleted = set(rng.choice(ids, size=8, replace=False).tolist()) - {vid for vid, _ in items}
+        index.update(items, deleted)
+        gone = deleted | {vid for vid, _ in items}
+        segments = [[(vid, fields, live and vid not in gone) for vid, fields, live in seg] for seg in segments]
+        segments = [seg for seg in segments if any(live for _, _, live in seg)]   # fully deleted: dropped
+        segments.append([(vid, fields, True) for vid, fields in items])
+    return index, [row for seg in segments for row in seg]
+
+
+def test_segmented_search_with_tombstones_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(3)
+    index, rows = build_segmented(tmp_path, rng)
+    assert len(index.segments) > 1 and not all(live for _, _, live in rows)
+    brute = BruteBM25(rows)
+    for _ in range(100):
+        query, k = random_query(rng), int(rng.integers(1, 15))
+        assert_top_k(index.search(query, k), brute.scores(query), k)
+
+    # A merge drops the deleted rows, and with them their share of the statistics
+    index._merge([seg.name for seg in index.segments])
+    assert len(index.segments) == 1
+    brute = BruteBM25([row for row in rows if row[2]])
+    for _ in range(50):
+        query, k = random_query(rng), int(rng.integers(1, 15))
+        assert_top_k(index.search(query, k), brute.scores(query), k)
+
+
+def test_segmented_vector_search_with_tombstones_matches_exact_scan(tmp_path):
+    rng = np.random.default_rng(4)
+    embedder = HashingEmbedder()
+    index = SegmentedVectorIndex(str(tmp_path / "vectors"), create=True, embedder=embedder)
+    passages = {}   # key -> (video_id, text) of the live passages
+    for _ in range(4):
+        videos = rng.choice([f"v{i}" for i in range(60)], size=20, replace=False).tolist()
+        items = [(f"{vid}:{p}", vid, float(p), random_query(rng) + " " + random_query(rng))
+                 for vid in videos for p in range(int(rng.integers(1, 4)))]
+        deleted = {f"v{i}" for i in rng.integers(0, 60, size=3).tolist()} - set(videos)
+        index.update(items, deleted)
+        passages = {key: value for key, value in passages.items() if value[0] not in deleted | set(videos)}
+        passages.update({key: (vid, text) for key, vid, _, text in items})
+
+    keys = list(passages)
+    vectors = embedder.embed([passages[key][1] for key in keys]).astype(np.float16).astype(np.float32)   # as stored
+    for _ in range(30):
+        query = random_query(rng)
+        exact = np.sort(vectors @ embedder.embed([query])[0])[::-1]
+        hits = index.search(query, 10)
+        assert all(hit["key"] in passages for hit in hits)
+        np.testing.assert_allclose([hit["score"] for hit in hits], exact[:10], rtol=1e-4, atol=1e-5)
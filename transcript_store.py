@@ -0,0 +1,541 @@
+"""
+Compressed transcript store: one record per video, random access by id.
+
+    store = TranscriptStore("transcript_store")
+    store.put_many([(video_id, text), ...])
+    store.flush()
+    store.get(video_id)                    # one hash probe, two preads, one decompress
+    for piece in store.stream(video_id):   # decompressed READ_CHUNK at a time
+        ...
+    for video_id, text in store.items():   # sequential scan in file order
+
+The store is a directory:
+
+    meta.json    codec, number of dictionaries, garbage bytes
+    dict-N.bin   trained dictionaries (N >= 1; records with dictionary 0 use none)
+    blobs.bin    records back to back: 1-byte id length, id, compressed text
+    index.npy    open-addressing hash table (linear probing, at most MAX_LOAD full) of
+                 id hash -> offset, length, raw length, dictionary; memory-mapped
+
+A transcript of a few KB is too short for a compressor to learn the
+vocabulary and phrasing every transcript shares, so records are compressed
+against one dictionary trained on a sample of them. With the optional
+`zstandard` package that is zstd with a COVER-trained dictionary; without it,
+raw deflate with a preset dictionary (zdict, at most 32 KB) of the word
+n-grams that recur in the most sampled transcripts. The codec is fixed when
+the store is created.
+
+put() appends to blobs.bin right away; flush() rewrites the index, so a crash
+in between leaves orphaned bytes, never an entry pointing at nothing.
+Replaced and deleted records become garbage that compact() reclaims (flush()
+runs it once garbage outweighs live data); it also re-encodes every record
+with a dictionary trained on the current contents.
+
+Several processes can write one store: a writer holds an flock on
+<path>.lock from its first put / delete until flush() returns (compact()
+holds it throughout), and on taking it catches up with the index, meta and
+blobs.bin size the other writers left. Readers keep the snapshot they opened,
+even across another process's compact(), until refresh().
+"""
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process lock, so keep to one writer at a time there
+    fcntl = None
+
+# -----------------------------
+# Config
+# -----------------------------
+STORE_PATH = "transcript_store"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+ZLIB_DICT_SIZE = 32 * 1024    # deflate's window: zlib never looks further back than this
+ZSTD_DICT_SIZE = 112 * 1024
+TRAIN_MIN = 32                # records needed before a dictionary is trained
+TRAIN_SAMPLES = 1000          # records sampled for training
+MAX_LOAD = 0.7                # index slots in use at most
+READ_CHUNK = 64 * 1024        # compressed bytes per step of stream() / items()
+
+ENTRY = np.dtype([("key", "<u8"), ("offset", "<u8"), ("length", "<u4"), ("raw", "<u4"), ("dictionary", "<u2")])
+
+
+def default_codec():
+    """"zstd" if the zstandard package is installed, else "zlib"."""
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return "zlib"
+    return "zstd"
+
+
+def id_key(video_id):
+    """64-bit index key of a video id (0 marks an empty slot, so it is never a key)."""
+    return int.from_bytes(hashlib.blake2b(video_id.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def train_zlib_dictionary(samples, size=ZLIB_DICT_SIZE, max_words=3):
+    """
+    Preset dictionary for deflate: word n-grams (up to `max_words` words)
+    scored by the number of samples containing them times their length,
+    skipping n-grams already inside the dictionary. The best end up last,
+    where back-references to them are shortest.
+    """
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        counts.update({" ".join(words[i:i + n]) for n in range(1, max_words + 1) for i in range(len(words) - n + 1)})
+    picked, used, joined = [], 0, ""
+    for _, gram in sorted(((count * len(gram), gram) for gram, count in counts.items() if count > 1), reverse=True):
+        data = gram + " "
+        if used + len(data.encode("utf-8")) > size:
+            if size - used < 16:
+                break
+            continue
+        if gram in joined:
+            continue
+        picked.append(data)
+        used += len(data.encode("utf-8"))
+        joined += data
+    return "".join(reversed(picked)).encode("utf-8")
+
+
+class _Codec:
+    """zstd or raw-deflate compression, each with an optional dictionary."""
+
+    def __init__(self, name):
+        if name not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown codec: {name}")
+        self.name = name
+        if name == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("This transcript store is zstd-compressed: pip install zstandard")
+            self._zstd = zstandard
+        self._compressors, self._decompressors = {}, {}
+
+    def train(self, samples):
+        """Dictionary bytes trained on `samples` (str), or None if there is too little to learn from."""
+        if self.name == "zlib":
+            return train_zlib_dictionary(samples) or None
+        try:
+            trained = self._zstd.train_dictionary(ZSTD_DICT_SIZE, [s.encode("utf-8") for s in samples])
+        except self._zstd.ZstdError:
+            return None
+        return trained.as_bytes()
+
+    def compress(self, data, dictionary_id, dictionary):
+        compressor = self._compressors.get(dictionary_id)
+        if compressor is None:
+            if self.name == "zstd":
+                kwargs = {"dict_data": self._zstd.ZstdCompressionDict(dictionary)} if dictionary else {}
+                compressor = self._zstd.ZstdCompressor(level=ZSTD_LEVEL, write_dict_id=False, **kwargs)
+            else:
+                # Priming deflate with 32 KB of dictionary per record is the slow part, so prime once and copy
+                compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, **({"zdict": dictionary} if dictionary else {}))
+            self._compressors[dictionary_id] = compressor
+        if self.name == "zstd":
+            return compressor.compress(data)
+        c = compressor.copy()
+        return c.compress(data) + c.flush()
+
+    def _decompressor(self, dictionary_id, dictionary):
+        base = self._decompressors.get(dictionary_id)
+        if base is None:
+            if self.name == "zstd":
+                kwargs = {"dict_data": self._zstd.ZstdCompressionDict(dictionary)} if dictionary else {}
+                base = self._zstd.ZstdDecompressor(**kwargs)
+            else:
+                base = zlib.decompressobj(-15, **({"zdict": dictionary} if dictionary else {}))
+            self._decompressors[dictionary_id] = base
+        return base
+
+    def decompressobj(self, dictionary_id, dictionary):
+        """A fresh incremental decompressor: .decompress(chunk) -> bytes."""
+        base = self._decompressor(dictionary_id, dictionary)
+        return base.decompressobj() if self.name == "zstd" else base.copy()
+
+    def decompress(self, data, dictionary_id, dictionary):
+        base = self._decompressor(dictionary_id, dictionary)
+        return base.decompress(data) if self.name == "zstd" else base.copy().decompress(data)
+
+
+def _build_table(entries):
+    """Hash table (power-of-two slots, linear probing) holding `entries`, filled a probe step at a time."""
+    slots = 8
+    while slots * MAX_LOAD < len(entries):
+        slots *= 2
+    table = np.zeros(slots, dtype=ENTRY)
+    mask = np.uint64(slots - 1)
+    position = (entries["key"] & mask).astype(np.int64)
+    waiting = np.arange(len(entries))
+    while len(waiting):
+        wanted = position[waiting]
+        free = table["key"][wanted] == 0
+        # Of several entries wanting the same free slot, the first takes it; the rest probe on
+        _, first = np.unique(wanted[free], return_index=True)
+        placed = waiting[free][first]
+        table[position[placed]] = entries[placed]
+        waiting = np.setdiff1d(waiting, placed, assume_unique=True)
+        position[waiting] = (position[waiting] + 1) & (slots - 1)
+    return table
+
+
+# -----------------------------
+# Store
+# -----------------------------
+class TranscriptStore:
+    def __init__(self, path=STORE_PATH, codec=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._blobs = self._fd = None
+        self._write_lock = None  # open <path>.lock while this writer has unflushed puts / deletes
+        self._pending = {}       # video_id -> entry tuple (None = deleted) since the last flush
+        self._replaced = set()   # index slots those writes supersede
+        with self._locked():
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                self.meta = {"codec": codec or default_codec(), "dictionaries": 0, "garbage": 0}
+                self._write_meta()
+            self._reload()
+        if codec is not None and codec != self.meta["codec"]:
+            raise ValueError(f"{path} is {self.meta['codec']}-compressed, not {codec}")
+
+    # --- sharing the store between processes ---
+    def _lock(self):
+        lock = open(self.path + ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    @staticmethod
+    def _unlock(lock):
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+    @contextmanager
+    def _locked(self):
+        lock = self._lock()
+        try:
+            yield
+        finally:
+            self._unlock(lock)
+
+    def _disk_state(self):
+        """Identity of what writers replace (index, meta, blobs.bin after a compact), or None mid-swap."""
+        try:
+            stats = [os.stat(os.path.join(self.path, n)) for n in ("index.npy", "meta.json", "blobs.bin")]
+        except FileNotFoundError:
+            return None
+        return [(st.st_ino, st.st_size, st.st_mtime_ns) for st in stats[:2]] + [stats[2].st_ino]
+
+    def _reload(self):
+        """Re-read meta, dictionaries and index from disk (under the lock); reopen blobs.bin if it was replaced."""
+        blobs_path = os.path.join(self.path, "blobs.bin")
+        if self._fd is None or not os.path.exists(blobs_path) or os.stat(blobs_path).st_ino != os.fstat(self._fd).st_ino:
+            if self._fd is not None:   # another process compacted the store
+                self._blobs.close()
+                os.close(self._fd)
+            self._blobs = open(blobs_path, "ab")
+            self._fd = os.open(blobs_path, os.O_RDONLY)
+            self._dictionaries = {0: None}
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.codec = _Codec(self.meta["codec"])
+        for n in range(1, self.meta["dictionaries"] + 1):
+            if n not in self._dictionaries:
+                with open(os.path.join(self.path, f"dict-{n}.bin"), "rb") as f:
+                    self._dictionaries[n] = f.read()
+        self._load_index()
+        self._size = os.fstat(self._blobs.fileno()).st_size
+        self._state = self._disk_state()
+
+    def _begin_write(self):
+        """Take the write lock (kept until flush) and catch up with what other writers flushed."""
+        if self._write_lock is not None:
+            return
+        self._write_lock = self._lock()
+        if self._disk_state() != self._state:
+            self._reload()
+        # The true append offset: other writers' records (or a crash's orphaned bytes) may follow ours
+        self._size = os.fstat(self._blobs.fileno()).st_size
+
+    def _end_write(self):
+        if self._write_lock is not None:
+            self._unlock(self._write_lock)
+            self._write_lock = None
+
+    def refresh(self):
+        """Switch to what other processes flushed or compacted since. Returns True when the view changed."""
+        if self._write_lock is not None or self._disk_state() == self._state:
+            return False
+        with self._locked():
+            self._reload()
+        return True
+
+    def _write_meta(self):
+        temp = os.path.join(self.path, "meta.json_temp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(temp, os.path.join(self.path, "meta.json"))
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, "index.npy")
+        if os.path.exists(index_path):
+            self._table = np.load(index_path, mmap_mode="r")
+        else:
+            self._table = np.zeros(8, dtype=ENTRY)
+        self._count = int(np.count_nonzero(self._table["key"]))
+
+    def close(self):
+        self.flush()
+        self._blobs.close()
+        os.close(self._fd)
+        self._blobs = self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, video_id):
+        return self._entry(video_id) is not None
+
+    # --- lookup ---
+    def _slot(self, video_id):
+        """Index slot of `video_id`'s flushed record, or -1."""
+        key, table = id_key(video_id), self._table
+        mask = len(table) - 1
+        slot = key & mask
+        expected = video_id.encode("utf-8")
+        while True:
+            found = int(table["key"][slot])
+            if found == 0:
+                return -1
+            if found == key:
+                # 64-bit keys can collide: the record header holds the full id
+                header = os.pread(self._fd, 1 + len(expected), int(table["offset"][slot]))
+                if header[0] == len(expected) and header[1:] == expected:
+                    return slot
+            slot = (slot + 1) & mask
+
+    def _entry(self, video_id):
+        """(key, offset, length, raw, dictionary) of the live record, or None."""
+        if video_id in self._pending:
+            return self._pending[video_id]
+        slot = self._slot(video_id)
+        return None if slot < 0 or slot in self._replaced else tuple(int(v) for v in self._table[slot].item())
+
+    def _payload_range(self, video_id, entry):
+        skip = 1 + len(video_id.encode("utf-8"))
+        return entry[1] + skip, entry[2] - skip
+
+    def get(self, video_id):
+        """The transcript of `video_id`, or None."""
+        entry = self._entry(video_id)
+        if entry is None:
+            return None
+        self._blobs.flush()
+        offset, length = self._payload_range(video_id, entry)
+        data = self.codec.decompress(os.pread(self._fd, length, offset), entry[4], self._dictionaries[entry[4]])
+        return data.decode("utf-8")
+
+    def get_many(self, video_ids):
+        """{video_id: transcript} for the ids that have one."""
+        found = {}
+        for video_id in video_ids:
+            text = self.get(video_id)
+            if text is not None:
+                found[video_id] = text
+        return found
+
+    def stream(self, video_id, chunk=READ_CHUNK):
+        """The transcript of `video_id` as str pieces, never holding all of it decompressed (nothing if absent)."""
+        entry = self._entry(video_id)
+        if entry is None:
+            return
+        self._blobs.flush()
+        offset, length = self._payload_range(video_id, entry)
+        decompressor = self.codec.decompressobj(entry[4], self._dictionaries[entry[4]])
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for start in range(0, length, chunk):
+            data = os.pread(self._fd, min(chunk, length - start), offset + start)
+            text = decoder.decode(decompressor.decompress(data))
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def items(self):
+        """(video_id, transcript) for every record, flushed ones in file order, then the pending ones."""
+        self._blobs.flush()
+        table = np.asarray(self._table)
+        live = np.flatnonzero(table["key"])
+        if self._replaced:
+            live = live[~np.isin(live, list(self._replaced))]
+        entries = table[live][np.argsort(table["offset"][live], kind="stable")]
+        # Through our descriptor, not the path: after another process's compact() the path is a different file
+        with open(os.dup(self._fd), "rb", buffering=READ_CHUNK) as f:
+            for offset, length, dictionary in zip(entries["offset"].tolist(), entries["length"].tolist(),
+                                                  entries["dictionary"].tolist()):
+                f.seek(offset)
+                record = f.read(length)
+                video_id = record[1:1 + record[0]].decode("utf-8")
+                data = self.codec.decompress(record[1 + record[0]:], dictionary, self._dictionaries[dictionary])
+                yield video_id, data.decode("utf-8")
+        for video_id, entry in list(self._pending.items()):
+            if entry is not None:
+                yield video_id, self.get(video_id)
+
+    def stats(self):
+        """Record count and raw / stored bytes of the flushed records."""
+        table = np.asarray(self._table)
+        live = table[table["key"] != 0]
+        return {"codec": self.meta["codec"], "dictionaries": self.meta["dictionaries"], "records": len(live),
+                "raw_bytes": int(live["raw"].sum()), "stored_bytes": int(live["length"].sum()),
+                "garbage_bytes": self.meta["garbage"]}
+
+    # --- writes ---
+    def _supersede(self, video_id):
+        """Account for the record `video_id` had before a put / delete; True if it had one."""
+        if video_id in self._pending:
+            old = self._pending[video_id]
+        else:
+            slot = self._slot(video_id)
+            old = None if slot < 0 or slot in self._replaced else tuple(int(v) for v in self._table[slot].item())
+            if old is not None:
+                self._replaced.add(slot)
+        if old is not None:
+            self.meta["garbage"] += old[2]
+        return old is not None
+
+    def put(self, video_id, text):
+        self.put_many([(video_id, text)])
+
+    def put_many(self, items):
+        """Store (video_id, text) pairs, replacing earlier records of the same ids."""
+        items = [(str(video_id), text) for video_id, text in items]
+        self._begin_write()
+        if self.meta["dictionaries"] == 0 and self._count + len(items) >= TRAIN_MIN:
+            samples = [text for _, text in items[:TRAIN_SAMPLES]]
+            if len(samples) < TRAIN_SAMPLES:
+                samples += [text for _, text in self._sample(TRAIN_SAMPLES - len(samples))]
+            self._add_dictionary(samples)
+        dictionary_id = self.meta["dictionaries"]
+        dictionary = self._dictionaries[dictionary_id]
+        for video_id, text in items:
+            name = video_id.encode("utf-8")
+            if len(name) > 255:
+                raise ValueError(f"video id longer than 255 bytes: {video_id[:40]}...")
+            raw = text.encode("utf-8")
+            record = bytes([len(name)]) + name + self.codec.compress(raw, dictionary_id, dictionary)
+            if not self._supersede(video_id):
+                self._count += 1
+            self._pending[video_id] = (id_key(video_id), self._size, len(record), len(raw), dictionary_id)
+            self._blobs.write(record)
+            self._size += len(record)
+
+    def delete(self, video_id):
+        self._begin_write()
+        if self._supersede(video_id):
+            self._count -= 1
+            self._pending[video_id] = None
+
+    def _add_dictionary(self, samples):
+        dictionary = self.codec.train(samples)
+        if dictionary is None:
+            return
+        n = self.meta["dictionaries"] + 1
+        temp = os.path.join(self.path, f"dict-{n}.bin_temp")
+        with open(temp, "wb") as f:
+            f.write(dictionary)
+        os.replace(temp, os.path.join(self.path, f"dict-{n}.bin"))
+        self._dictionaries[n] = dictionary
+        self.meta["dictionaries"] = n
+        self._write_meta()
+
+    def _sample(self, n):
+        """Up to `n` records spread evenly over the file."""
+        table = np.asarray(self._table)
+        live = table[table["key"] != 0]
+        if not len(live) or n <= 0:
+            return []
+        live = np.sort(live, order="offset")[np.unique(np.linspace(0, len(live) - 1, min(n, len(live))).astype(int))]
+        out = []
+        for offset, length, dictionary in zip(live["offset"].tolist(), live["length"].tolist(), live["dictionary"].tolist()):
+            record = os.pread(self._fd, length, offset)
+            data = self.codec.decompress(record[1 + record[0]:], dictionary, self._dictionaries[dictionary])
+            out.append((record[1:1 + record[0]].decode("utf-8"), data.decode("utf-8")))
+        return out
+
+    def flush(self):
+        """Make every put / delete so far durable and visible to new readers, and release the write lock."""
+        try:
+            if self._pending or self._replaced:
+                self._write_index()
+                if self.meta["garbage"] > self._size - self.meta["garbage"]:
+                    self._compact()
+        finally:
+            self._end_write()
+
+    def _write_index(self):
+        self._blobs.flush()
+        table = np.asarray(self._table)
+        keep = np.flatnonzero(table["key"])
+        if self._replaced:
+            keep = keep[~np.isin(keep, list(self._replaced))]
+        pending = np.array([e for e in self._pending.values() if e is not None], dtype=ENTRY)
+        entries = np.concatenate([table[keep], pending])
+        temp = os.path.join(self.path, "index.npy_temp")
+        with open(temp, "wb") as f:
+            np.save(f, _build_table(entries))
+        os.replace(temp, os.path.join(self.path, "index.npy"))
+        self._write_meta()
+        self._pending.clear()
+        self._replaced.clear()
+        self._load_index()
+        self._state = self._disk_state()
+
+    def compact(self):
+        """Rewrite the store without garbage, re-encoded with a dictionary trained on its current records."""
+        self._begin_write()
+        try:
+            if self._pending or self._replaced:
+                self._write_index()
+            self._compact()
+        finally:
+            self._end_write()
+
+    def _compact(self):
+        temp = self.path + "_compact"
+        shutil.rmtree(temp, ignore_errors=True)
+        with TranscriptStore(temp, codec=self.meta["codec"]) as fresh:
+            fresh._add_dictionary([text for _, text in self._sample(TRAIN_SAMPLES)])
+            batch = []
+            for item in self.items():
+                batch.append(item)
+                if len(batch) >= 1000:
+                    fresh.put_many(batch)
+                    batch = []
+            fresh.put_many(batch)
+        os.remove(temp + ".lock")
+        old = self.path + "_old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(self.path, old)
+        os.replace(temp, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+        self._reload()   # still holding the lock; other writers reopen when they next take it
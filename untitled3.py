@@ -5,122 +5,58 @@ Automatically generated by Colab.
 
 Original file is located at
     https://colab.research.google.com/drive/1ynO1nkhz48Gxqf8c25rYl1WNXr6mBuwu
-"""
-
-import pandas as pd
-
-# File paths
-file1 = "/content/live_overflow_videos.csv"
-file2 = "/content/neso_academy_transcripts.csv"
-
-# Load the datasets
-df1 = pd.read_csv(file1)
-df2 = pd.read_csv(file2)
-
-# Display column names
-print("Columns in live_overflow_videos.csv:")
-print(df1.columns.tolist(), "\n")
-
-print("Columns in neso_academy_transcripts.csv:")
-print(df2.columns.tolist(), "\n")
-
-# Remove empty rows
-df1_cleaned = df1.dropna(how='all')
-df2_cleaned = df2.dropna(how='all')
-
-# Save cleaned files
-output1 = "/content/live_overflow_videos_no_empty_rows.csv"
-output2 = "/content/neso_academy_no_empty_rowstranscripts.csv"
-
-df1_cleaned.to_csv(output1, index=False)
-df2_cleaned.to_csv(output2, index=False)
-
-print("Saved cleaned files:")
-print(output1)
-print(output2)
-
-import pandas as pd
-
-# Load your dataset
-file_path = "/content/live_overflow_videos_no_empty_rows.csv"
-df = pd.read_csv(file_path)
-
-# Function to convert ISO 8601 duration format (PT1H2M30S → seconds)
-def parse_duration_to_seconds(duration_str):
-    if pd.isna(duration_str):
-        return 0
-
-    duration_str = str(duration_str)
-
-    # Remove PT prefix if present
-    if duration_str.startswith('PT'):
-        duration_str = duration_str[2:]
 
-    hours = minutes = seconds = 0
-
-    # Extract hour component
-    if 'H' in duration_str:
-        hours = int(duration_str.split('H')[0])
-        duration_str = duration_str.split('H')[1]
-
-    # Extract minute component
-    if 'M' in duration_str:
-        minutes = int(duration_str.split('M')[0])
-        duration_str = duration_str.split('M')[1]
-
-    # Extract seconds component
-    if 'S' in duration_str:
-        seconds = int(duration_str.split('S')[0])
-
-    return hours * 3600 + minutes * 60 + seconds
-
-# Apply conversion
-df['duration_seconds'] = df['duration'].apply(parse_duration_to_seconds)
-
-# Save updated file
-output_file = "/content/live_overflow_videos_converted.csv"
-df.to_csv(output_file, index=False)
-
-print("Conversion completed! Saved to:", output_file)
-print(df[['duration', 'duration_seconds']].head())
+The notebook cells run as cached pipeline stages (see pipeline.py): each
+stage still writes its CSV, but a rerun only recomputes the stages whose
+inputs or code changed. Pass --rerun to recompute every stage.
+"""
 
+import sys
 import pandas as pd
+from pipeline import Pipeline
+from sharded_clean import clean_columns
+from normalize import (
+    bool_text_upper, clean_text_strip_urls, duration_to_seconds,
+    flag_transcript_true_false, flag_transcript_yes_no,
+)
 
-# Input file paths
-videos_file = "/content/live_overflow_videos_converted.csv"
-transcripts_file = "/content/neso_academy_no_empty_rowstranscripts.csv"
-
-# Output file path
-output_file = "/content/Neso_academy_compiled_data.csv"
-
-# Load datasets
-df_videos = pd.read_csv(videos_file)
-df_transcripts = pd.read_csv(transcripts_file)
+pipe = Pipeline("neso_academy")
 
-# Ensure required columns exist
-if "id" not in df_videos.columns:
-    raise ValueError("Column 'id' not found in live_overflow_videos_converted.csv")
+# File paths
+pipe.source("videos", "/content/live_overflow_videos.csv")
+pipe.source("transcripts", "/content/neso_academy_transcripts.csv")
+pipe.source("cleaned_youtube_data", "/content/cleaned_youtube_data.csv")
 
-if "id" not in df_transcripts.columns:
-    raise ValueError("Column 'id' not found in neso_academy_no_empty_rowstranscripts.csv")
+# ==============================
+# 1. Remove empty rows
+# ==============================
+@pipe.stage(inputs=["videos"], output="/content/live_overflow_videos_no_empty_rows.csv")
+def videos_no_empty_rows(df1):
+    print("Columns in live_overflow_videos.csv:")
+    print(df1.columns.tolist(), "\n")
+    return df1.dropna(how='all')
 
-if "transcript" not in df_transcripts.columns:
-    raise ValueError("Column 'transcript' not found in neso_academy_no_empty_rowstranscripts.csv")
 
-# Use only id + transcript from transcripts file
-df_transcripts = df_transcripts[["id", "transcript"]]
+@pipe.stage(inputs=["transcripts"], output="/content/neso_academy_no_empty_rowstranscripts.csv")
+def transcripts_no_empty_rows(df2):
+    print("Columns in neso_academy_transcripts.csv:")
+    print(df2.columns.tolist(), "\n")
+    return df2.dropna(how='all')
 
-# Merge: keep all rows from videos, add transcript where available
-merged_df = pd.merge(df_videos, df_transcripts, on="id", how="left")
 
-# Create is_transcript_available column (yes / no)
-def flag_transcript(x):
-    if pd.isna(x) or str(x).strip() in ["", "nan", "NaN", "None"]:
-        return "no"
-    return "yes"
+# ==============================
+# 2. Convert ISO 8601 duration format (PT1H2M30S → seconds)
+# ==============================
+@pipe.stage(inputs=["videos_no_empty_rows"], output="/content/live_overflow_videos_converted.csv")
+def videos_converted(df):
+    df['duration_seconds'] = duration_to_seconds(df['duration'])
+    print(df[['duration', 'duration_seconds']].head())
+    return df
 
-merged_df["is_transcript_available"] = merged_df["transcript"].apply(flag_transcript)
 
+# ==============================
+# 3. Attach transcripts (yes / no flag, fixed column order)
+# ==============================
 # Desired column order
 desired_column_order = [
     "id",
@@ -150,177 +86,103 @@ desired_column_order = [
     "duration_seconds",
 ]
 
-# Keep only columns that actually exist, in the specified order
-final_columns = [col for col in desired_column_order if col in merged_df.columns]
-
-# Plus any extra columns (if present) at the end, without breaking
-extra_columns = [col for col in merged_df.columns if col not in final_columns]
-final_columns += extra_columns
-
-merged_df = merged_df[final_columns]
 
-# Save to CSV
-merged_df.to_csv(output_file, index=False)
+@pipe.stage(inputs=["videos_converted", "transcripts_no_empty_rows"], output="/content/Neso_academy_compiled_data.csv")
+def compiled_data(df_videos, df_transcripts):
+    # Ensure required columns exist
+    if "id" not in df_videos.columns:
+        raise ValueError("Column 'id' not found in live_overflow_videos_converted.csv")
 
-print("Merged file saved as", output_file)
-print("Shape of merged data", merged_df.shape)
-print(merged_df[["id", "duration", "duration_seconds", "is_transcript_available"]].head())
-
-import pandas as pd
+    if "id" not in df_transcripts.columns:
+        raise ValueError("Column 'id' not found in neso_academy_no_empty_rowstranscripts.csv")
 
-file_path = "/content/cleaned_youtube_data.csv"
+    if "transcript" not in df_transcripts.columns:
+        raise ValueError("Column 'transcript' not found in neso_academy_no_empty_rowstranscripts.csv")
 
-df = pd.read_csv(file_path)
+    # Use only id + transcript from transcripts file
+    df_transcripts = df_transcripts[["id", "transcript"]]
 
-print("Total Columns:", len(df.columns))
-print("\nColumn Names:\n")
-for col in df.columns:
-    print(col)
-
-import pandas as pd
-
-# File paths
-file1 = "/content/Neso_academy_compiled_data.csv"
-file2 = "/content/cleaned_youtube_data.csv"
+    # Merge: keep all rows from videos, add transcript where available
+    merged_df = pd.merge(df_videos, df_transcripts, on="id", how="left")
 
-# Output file path
-output_file = "/content/mergedNeso_academy_compiled_data.csv"
+    # Create is_transcript_available column (yes / no)
+    merged_df["is_transcript_available"] = flag_transcript_yes_no(merged_df["transcript"])
 
-# Load data
-df1 = pd.read_csv(file1)
-df2 = pd.read_csv(file2)
+    # Keep only columns that actually exist, in the specified order
+    final_columns = [col for col in desired_column_order if col in merged_df.columns]
 
-print("Rows in Neso_academy_compiled_data:", len(df1))
-print("Rows in cleaned_youtube_data:", len(df2))
-
-# Merge: df2 first to prioritize cleaned data in case of duplicates
-merged_df = pd.concat([df2, df1], ignore_index=True)
-
-# Remove duplicates based on id (keep first occurrence → cleaned data preferred)
-before = len(merged_df)
-merged_df = merged_df.drop_duplicates(subset="id", keep="first")
-removed = before - len(merged_df)
-
-print("Duplicate rows removed:", removed)
-print("Final row count:", len(merged_df))
-
-# Save merged dataset
-merged_df.to_csv(output_file, index=False)
-
-print("\nMerged dataset saved as:", output_file)
-print("\nColumn names preserved:")
-print(merged_df.columns.tolist())
-
-# Display sample preview
-print("\nSample:")
-print(merged_df.head())
-
-import pandas as pd
+    # Plus any extra columns (if present) at the end, without breaking
+    extra_columns = [col for col in merged_df.columns if col not in final_columns]
+    final_columns += extra_columns
 
-# Input file path
-file_path = "/content/mergedNeso_academy_compiled_data.csv"
+    merged_df = merged_df[final_columns]
 
-# Load dataset
-df = pd.read_csv(file_path)
+    print("Shape of merged data", merged_df.shape)
+    print(merged_df[["id", "duration", "duration_seconds", "is_transcript_available"]].head())
+    return merged_df
 
-# Convert to Boolean TRUE/FALSE (uppercase text)
-df["is_transcript_available"] = df["is_transcript_available"].apply(
-    lambda x: "TRUE" if str(x).strip().lower() == "true" else "FALSE"
-)
 
-# Save updated dataset
-output_file = "/content/MergedNeso_academy_compiled_data.csv"
-df.to_csv(output_file, index=False)
+# ==============================
+# 4. Combine with cleaned_youtube_data (cleaned data preferred on duplicate ids)
+# ==============================
+@pipe.stage(inputs=["compiled_data", "cleaned_youtube_data"], output="/content/mergedNeso_academy_compiled_data.csv")
+def merged_with_cleaned(df1, df2):
+    print("Rows in Neso_academy_compiled_data:", len(df1))
+    print("Rows in cleaned_youtube_data:", len(df2))
 
-print("Column updated successfully!")
-print("Saved as:", output_file)
+    # Merge: df2 first to prioritize cleaned data in case of duplicates
+    merged_df = pd.concat([df2, df1], ignore_index=True)
 
-# Show a quick preview
-print(df[["id", "is_transcript_available"]].head())
+    # Remove duplicates based on id (keep first occurrence → cleaned data preferred)
+    before = len(merged_df)
+    merged_df = merged_df.drop_duplicates(subset="id", keep="first")
+    removed = before - len(merged_df)
 
-import pandas as pd
-import re
+    print("Duplicate rows removed:", removed)
+    print("Final row count:", len(merged_df))
+    print("\nColumn names preserved:")
+    print(merged_df.columns.tolist())
+    return merged_df
 
-# ==============================
-#  Paths
-# ==============================
-input_file = "/content/MergedNeso_academy_compiled_data.csv"
-output_file = "/content/Final_MergedNeso_academy_compiled_data.csv"
 
 # ==============================
-#  Helper functions
+# 5. Convert is_transcript_available to Boolean TRUE/FALSE (uppercase text)
 # ==============================
+@pipe.stage(inputs=["merged_with_cleaned"], output="/content/MergedNeso_academy_compiled_data.csv")
+def flags_uppercase(df):
+    df["is_transcript_available"] = bool_text_upper(df["is_transcript_available"])
+    print(df[["id", "is_transcript_available"]].head())
+    return df
 
-def clean_text(text):
-    if pd.isna(text):
-        return text
-    text = str(text)
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text)  # Remove URLs
-    text = re.sub(r"[^\w\s.,!?-]", "", text)  # Remove special chars
-    text = re.sub(r"\s+", " ", text).strip()
-    return text.lower()
-
-def parse_duration_to_seconds(duration_str):
-    if pd.isna(duration_str):
-        return 0
-    duration_str = str(duration_str).strip()
-    if duration_str.isdigit():
-        return int(duration_str)
-    if duration_str.startswith("PT"):
-        duration_str = duration_str[2:]
-    h = m = s = 0
-    if "H" in duration_str:
-        part = duration_str.split("H")
-        h = int(part[0]) if part[0] else 0
-        duration_str = part[1]
-    if "M" in duration_str:
-        part = duration_str.split("M")
-        m = int(part[0]) if part[0] else 0
-        duration_str = part[1]
-    if "S" in duration_str:
-        part = duration_str.split("S")
-        s = int(part[0]) if part[0] else 0
-    return h * 3600 + m * 60 + s
 
 # ==============================
-#  Load data
+# 6. Final cleaning: text, duplicate IDs, duration_seconds, TRUE/FALSE flag
 # ==============================
-df = pd.read_csv(input_file)
-print("Initial shape:", df.shape)
+@pipe.stage(inputs=["flags_uppercase"], output="/content/Final_MergedNeso_academy_compiled_data.csv")
+def final_cleaned(df):
+    print("Initial shape:", df.shape)
 
-# ==============================
-# Clean title + transcript text
-# ==============================
-for col in ["title", "transcript"]:
-    if col in df.columns:
-        df[col] = df[col].apply(clean_text)
+    # Clean title + transcript text
+    for col, values in clean_columns(df, ["title", "transcript"], clean_text_strip_urls).items():
+        df[col] = values
 
-# ==============================
-# Drop duplicate IDs
-# ==============================
-if "id" in df.columns:
-    df.drop_duplicates(subset="id", keep="first", inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    # Drop duplicate IDs
+    if "id" in df.columns:
+        df.drop_duplicates(subset="id", keep="first", inplace=True)
+        df.reset_index(drop=True, inplace=True)
 
-# ==============================
-# Ensure duration_seconds correct
-# ==============================
-if "duration" in df.columns:
-    df["duration_seconds"] = df["duration"].apply(parse_duration_to_seconds)
+    # Ensure duration_seconds correct
+    if "duration" in df.columns:
+        df["duration_seconds"] = duration_to_seconds(df["duration"], plain_seconds=True)
 
-# ==============================
-# Convert is_transcript_available → TRUE/FALSE
-# ==============================
-def flag_transcript(x):
-    return "TRUE" if isinstance(x, str) and x.strip() not in ["", "nan", "none"] else "FALSE"
+    # Convert is_transcript_available → TRUE/FALSE
+    if "transcript" in df.columns:
+        df["is_transcript_available"] = flag_transcript_true_false(df["transcript"])
 
-if "transcript" in df.columns:
-    df["is_transcript_available"] = df["transcript"].apply(flag_transcript)
+    print("\nFinal shape:", df.shape)
+    print(df.head()[["id", "is_transcript_available", "duration", "duration_seconds"]])
+    return df
 
-# ==============================
-#  Save final file
-# ==============================
-df.to_csv(output_file, index=False)
-print("\nSaved cleaned + converted dataset to:", output_file)
-print("\nFinal shape:", df.shape)
-print(df.head()[["id", "is_transcript_available", "duration", "duration_seconds"]])
\ No newline at end of file
+
+if __name__ == "__main__":
+    pipe.run(force="--rerun" in sys.argv)
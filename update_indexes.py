@@ -0,0 +1,138 @@
+import argparse
+import os
+import time
+from columnar_store import iter_table_chunks, table_columns
+import pandas as pd
+from filter_index import CATEGORICAL_FIELDS, NUMERIC_FIELDS, FilterIndexBuilder
+from near_duplicates import MinHasher, SignatureCache, collapse
+from search_index import FIELD_WEIGHTS
+from segmented_index import SegmentedSearchIndex, SegmentedVectorIndex, text_fingerprint, video_fingerprint
+from segments import PASSAGE_OVERLAP, PASSAGE_TOKENS, chunk_passages
+
+# --- Config ---
+input_csv = "final_merged_output.csv"   # videos + transcripts as YT_info.py appends them
+index_path = "search_index"             # BM25 segments
+vector_index_path = "vector_index"      # embedding segments
+filter_index_path = "filter_index"      # channel / date / duration / views facets
+catalog_path = "catalog.sqlite"         # snippet timings that anchor passages
+cache_path = "embedding_cache.sqlite"
+signatures_path = "minhash_signatures"  # MinHash signatures by transcript fingerprint
+duplicates_csv = "duplicates.csv"       # collapsed videos and what they duplicate, for review
+
+parser = argparse.ArgumentParser(description="Add new / changed videos to the search indexes and drop private ones")
+parser.add_argument("input", nargs="?", default=input_csv, help="table with id, title, description, transcript, privacyStatus")
+parser.add_argument("--no-vectors", action="store_true", help="update only the BM25 index")
+parser.add_argument("--no-merge", action="store_true", help="skip the segment merge policy this run")
+parser.add_argument("--no-dedup", action="store_true", help="index near-duplicate transcripts instead of collapsing them")
+args = parser.parse_args()
+
+
+def vector_items(video_id, title, transcript, segments):
+    """The title and transcript passages of one video, keyed like build_vector_index.py."""
+    items = []
+    if isinstance(title, str):
+        items.append((f"{video_id}:title", video_id, None, title))
+    if isinstance(transcript, str):
+        if segments is not None and not segments.matches(transcript):
+            segments = None
+        chunks = chunk_passages(transcript, segments, PASSAGE_TOKENS, PASSAGE_OVERLAP)
+        for i, (start, text) in enumerate(zip(chunks["start"].tolist(), chunks["text"])):
+            items.append((f"{video_id}:{i}", video_id, None if start != start else round(start, 3), text))
+    return items
+
+
+started = time.perf_counter()
+lexical = SegmentedSearchIndex(index_path, create=True)
+filters = FilterIndexBuilder(filter_index_path)   # rewritten every run; it is a few numeric columns
+lexical_fp = lexical.live_fingerprints()
+vectors = catalog = None
+if not args.no_vectors:
+    from embedding_cache import CachedEmbedder, EmbeddingCache
+
+    vectors = SegmentedVectorIndex(vector_index_path, create=True)
+    cache = EmbeddingCache(cache_path)
+    vectors.embedder = CachedEmbedder(vectors.embedder, cache)
+    vector_fp = vectors.live_fingerprints()
+    if os.path.exists(catalog_path):
+        from catalog import Catalog
+
+        catalog = Catalog(catalog_path)
+hasher = signature_cache = None
+if not args.no_dedup:
+    hasher, signature_cache = MinHasher(), SignatureCache(signatures_path)
+    dedup_ids, dedup_fps, dedup_signatures, rank_keys = [], [], [], []
+
+# Only videos whose indexed text changed are touched; everything else stays in its segment
+documents, passages, private, seen = [], [], set(), set()
+available = set(table_columns(args.input))
+facets = [c for c in ["duration"] + NUMERIC_FIELDS + CATEGORICAL_FIELDS if c in available]
+columns = ["id", "privacyStatus"] + list(FIELD_WEIGHTS) + facets
+if not args.no_dedup:
+    columns += [c for c in ["publishedAt", "viewCount"] if c in available and c not in columns]
+for chunk in iter_table_chunks(args.input, columns=columns, dtype=str):
+    filters.add_frame(chunk[["id"] + facets])
+    changed = []
+    for row in chunk.to_dict("records"):
+        vid = row.get("id")
+        if not isinstance(vid, str) or vid in seen:
+            continue
+        seen.add(vid)
+        status = row.get("privacyStatus")
+        if isinstance(status, str) and status != "public":
+            private.add(vid)
+            continue
+        if hasher is not None:
+            # Every public video is a dedup candidate, unchanged ones included (their signatures are cached)
+            fp = text_fingerprint(row.get("transcript"))
+            signature = signature_cache.get(vid, fp)
+            dedup_ids.append(vid)
+            dedup_fps.append(fp)
+            dedup_signatures.append(hasher.signature(row.get("transcript")) if signature is None else signature)
+            views = pd.to_numeric(row.get("viewCount"), errors="coerce")
+            published = row.get("publishedAt")
+            rank_keys.append((published if isinstance(published, str) else "~", -(0 if views != views else views)))
+        if lexical_fp.get(vid) != text_fingerprint(*(row.get(f) for f in FIELD_WEIGHTS)):
+            documents.append((vid, row))
+            changed.append(row)
+        elif vectors is not None and vid not in vector_fp:
+            changed.append(row)
+    if vectors is not None and changed:
+        timings = catalog.segments_for([row["id"] for row in changed]) if catalog is not None else {}
+        for row in changed:
+            items = vector_items(row["id"], row.get("title"), row.get("transcript"), timings.get(row["id"]))
+            if vector_fp.get(row["id"]) != video_fingerprint([text_fingerprint(key, text) for key, _, _, text in items]):
+                passages.extend(items)
+
+# Near-duplicate transcripts collapse into the earliest (then most viewed) copy before anything is
+# indexed or embedded; a duplicate that is already indexed gets tombstoned like a private video
+duplicates = {}
+if hasher is not None:
+    duplicates = collapse(dedup_ids, dedup_signatures, rank_keys) if dedup_ids else {}
+    signature_cache.save(dedup_ids, dedup_fps, dedup_signatures)
+    documents = [(vid, row) for vid, row in documents if vid not in duplicates]
+    passages = [item for item in passages if item[1] not in duplicates]
+    pd.DataFrame([(vid, kept, round(similarity, 3)) for vid, (kept, similarity) in sorted(duplicates.items())],
+                 columns=["id", "duplicate_of", "similarity"]).to_csv(duplicates_csv, index=False)
+    print(f"🧬 Near-duplicates: {len(duplicates)} of {len(dedup_ids)} videos collapsed into an earlier copy "
+          f"(see {duplicates_csv})")
+dropped = private | set(duplicates)
+
+added, removed = lexical.update(documents, dropped & set(lexical_fp))
+print(f"📚 BM25: {added} videos added or changed, {removed} replaced or dropped rows tombstoned "
+      f"({len(lexical.segments)} segments, {len(lexical)} videos)")
+if vectors is not None:
+    added, removed = vectors.update(passages, dropped & set(vector_fp))
+    print(f"🧭 Vectors: {added} passages and titles added or changed, {removed} replaced or dropped rows tombstoned "
+          f"({len(vectors.segments)} segments; {vectors.embedder.misses} newly embedded)")
+
+print(f"🏷️  Filters: {filters.finish()} videos in {filter_index_path}/")
+
+if not args.no_merge:
+    merges = lexical.maybe_merge() + (vectors.maybe_merge() if vectors is not None else 0)
+    if merges:
+        print(f"🧱 {merges} segment merges")
+if catalog is not None:
+    catalog.close()
+if vectors is not None:
+    cache.close()
+print(f"✅ Indexes updated from {args.input} in {time.perf_counter() - started:.1f}s")
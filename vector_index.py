@@ -0,0 +1,234 @@
+"""
+Dense vector index: one embedding per transcript passage and per video title,
+stored as a memory-mapped float16 or int8 matrix.
+
+    with VectorIndexWriter("vector_index", load_embedder("hashing"), dtype="int8") as writer:
+        writer.add("<video_id>:0", "<video_id>", 12.5, "passage text")
+    index = VectorIndex("vector_index")
+    index.search(["binary search tree", "merge sort"], k=10)
+
+On-disk layout (one directory):
+
+    meta.json      count, dim, dtype, embedder name / version
+    vectors.bin    count x dim matrix, float16 or int8, row-major
+    scales.bin     float32 per row (int8 only): row = int8 values * scale
+    starts.bin     float32 second each passage starts at (NaN for titles)
+    keys.npy       item key ("<video_id>:<passage>" or "<video_id>:title")
+    video_ids.npy  video id of every row
+
+Opening the index maps the files and reads nothing else, so it is instant
+and resident memory stays small: search() scans the matrix ROWS_PER_BLOCK
+rows at a time, scoring every query against a block with one matrix product
+and keeping each query's best k with argpartition.
+"""
+import json
+import os
+import shutil
+import numpy as np
+from embedders import DEFAULT_EMBEDDER, load_embedder
+
+# -----------------------------
+# Config
+# -----------------------------
+ROWS_PER_BLOCK = 65_536     # matrix rows scored per step (~16 MB of float16 at dim 128)
+EMBED_BATCH = 1_024         # texts embedded per call while building
+DTYPES = ("float16", "int8")
+FORMAT_VERSION = 1
+
+
+def quantize_int8(vectors):
+    """float32 rows -> (int8 rows, float32 per-row scale), symmetric: row ~= int8 * scale."""
+    peak = np.abs(vectors).max(axis=1)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    return np.rint(vectors / scales[:, None]).astype(np.int8), scales
+
+
+# -----------------------------
+# Building
+# -----------------------------
+class VectorIndexWriter:
+    """
+    Stream (key, video_id, start, text) items into a new index; the vectors go
+    straight to disk, so memory holds one batch. The finished directory
+    replaces `path` on close().
+    """
+
+    def __init__(self, path, embedder=None, dtype="float16", batch_size=EMBED_BATCH):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.path = path
+        self.embedder = embedder or load_embedder(DEFAULT_EMBEDDER)
+        self.dtype = dtype
+        self.batch_size = batch_size
+        self.count = 0
+        self._temp = path + "_temp"
+        shutil.rmtree(self._temp, ignore_errors=True)
+        os.makedirs(self._temp)
+        self._vectors = open(os.path.join(self._temp, "vectors.bin"), "wb")
+        self._scales = open(os.path.join(self._temp, "scales.bin"), "wb") if dtype == "int8" else None
+        self._starts = open(os.path.join(self._temp, "starts.bin"), "wb")
+        self._keys, self._video_ids = [], []
+        self._pending = []
+
+    def add(self, key, video_id, start, text):
+        self._pending.append((key, video_id, start, text))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        keys, video_ids, starts, texts = zip(*self._pending)
+        self._pending = []
+        self.add_vectors(keys, video_ids, starts, self.embedder.embed(list(texts)))
+
+    def add_vectors(self, keys, video_ids, starts, vectors):
+        """Append already embedded items (e.g. rows copied from another index)."""
+        self._flush()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dtype == "int8":
+            vectors, scales = quantize_int8(vectors)
+            self._scales.write(scales.tobytes())
+        else:
+            vectors = vectors.astype(np.float16)
+        self._vectors.write(np.ascontiguousarray(vectors).tobytes())
+        self._starts.write(np.array([np.nan if s is None else s for s in starts], dtype=np.float32).tobytes())
+        self._keys.extend(str(k) for k in keys)
+        self._video_ids.extend(str(v) for v in video_ids)
+        self.count += len(keys)
+
+    def close(self):
+        self._flush()
+        for f in (self._vectors, self._scales, self._starts):
+            if f is not None:
+                f.close()
+        np.save(os.path.join(self._temp, "keys.npy"), np.array(self._keys, dtype="S"))
+        np.save(os.path.join(self._temp, "video_ids.npy"), np.array(self._video_ids, dtype="S"))
+        with open(os.path.join(self._temp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "count": self.count, "dim": self.embedder.dim, "dtype": self.dtype,
+                       "embedder": self.embedder.name, "embedder_version": self.embedder.version}, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._temp, self.path)
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:   # keep the previous index if building failed
+            for f in (self._vectors, self._scales, self._starts):
+                if f is not None:
+                    f.close()
+            shutil.rmtree(self._temp, ignore_errors=True)
+
+
+# -----------------------------
+# Searching
+# -----------------------------
+class VectorIndex:
+    """Read-only, memory-mapped view of an index directory."""
+
+    def __init__(self, path, embedder=None):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: index format {self.meta.get('format')}, expected {FORMAT_VERSION}; rebuild it")
+        self.count, self.dim = self.meta["count"], self.meta["dim"]
+        self.vectors = self._map("vectors.bin", self.meta["dtype"], (self.count, self.dim))
+        self.scales = self._map("scales.bin", np.float32, (self.count,)) if self.meta["dtype"] == "int8" else None
+        self.starts = self._map("starts.bin", np.float32, (self.count,))
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.video_ids = np.load(os.path.join(path, "video_ids.npy"), mmap_mode="r")
+        self._embedder = embedder
+
+    def _map(self, name, dtype, shape):
+        if self.count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def embedder(self):
+        """The embedder the index was built with (created on first query)."""
+        if self._embedder is None:
+            self._embedder = load_embedder(self.meta["embedder"])
+        return self._embedder
+
+    def vectors_float32(self, start, end):
+        """Rows start:end as float32 (int8 rows times their scales)."""
+        block = self.vectors[start:end].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:end, None]
+        return block
+
+    def search_vectors(self, queries, k=10, rows=None, deleted=None):
+        """
+        Exact inner-product top `k` for each row of `queries` (nq x dim float32).
+        `rows` optionally restricts the scan to those row numbers (ascending);
+        rows flagged in the boolean array `deleted` score -inf.
+        Returns (rows, scores), both nq x k', best first; k' = min(k, candidates).
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        candidates = self.count if rows is None else len(rows)
+        k = min(k, candidates)
+        nq = len(queries)
+        best_rows = np.empty((nq, 0), dtype=np.int64)
+        best_scores = np.empty((nq, 0), dtype=np.float32)
+        if k <= 0:
+            return best_rows, best_scores
+
+        for start in range(0, candidates, ROWS_PER_BLOCK):
+            end = min(start + ROWS_PER_BLOCK, candidates)
+            ids = np.arange(start, end) if rows is None else np.asarray(rows[start:end], dtype=np.int64)
+            block = self.vectors[start:end] if rows is None else self.vectors[ids]
+            scores = queries @ block.astype(np.float32).T            # nq x block rows
+            if self.scales is not None:
+                scores *= self.scales[start:end] if rows is None else self.scales[ids]
+            if deleted is not None:
+                scores[:, deleted[ids]] = -np.inf
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                ids = ids[top]
+            else:
+                ids = np.broadcast_to(ids, scores.shape)
+            best_rows, best_scores = self._keep_best(best_rows, best_scores, ids, scores, k)
+
+        order = np.lexsort((best_rows, -best_scores), axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    @staticmethod
+    def _keep_best(rows_a, scores_a, rows_b, scores_b, k):
+        rows = np.concatenate([rows_a, rows_b], axis=1)
+        scores = np.concatenate([scores_a, scores_b], axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            rows, scores = np.take_along_axis(rows, top, axis=1), np.take_along_axis(scores, top, axis=1)
+        return rows, scores
+
+    def item(self, row):
+        start = float(self.starts[row])
+        return {
+            "key": self.keys[row].decode("utf-8"),
+            "video_id": self.video_ids[row].decode("utf-8"),
+            "start": None if start != start else start,
+        }
+
+    def search(self, queries, k=10):
+        """
+        Top `k` items per query text, best first: a list (one per query) of
+        [{"key", "video_id", "start", "score"}, ...]. A single string gives a single list.
+        """
+        single = isinstance(queries, str)
+        texts = [queries] if single else list(queries)
+        if not texts:
+            return []
+        rows, scores = self.search_vectors(self.embedder.embed(texts), k)
+        results = [[dict(self.item(r), score=float(s)) for r, s in zip(row_ids.tolist(), row_scores.tolist())]
+                   for row_ids, row_scores in zip(rows, scores)]
+        return results[0] if single else results